@@ -63,12 +63,21 @@ def create_app(config_name='default'):
     app.jinja_env.filters['get_status_icon'] = get_status_icon
 
     # Register context processors
-    from app.utils.helpers import notification_counts
+    # (importing the service also registers its cache invalidation hooks)
+    from app.services.notification_counts import get_notification_counts
+    from flask_login import current_user
+
+    # Stock ledger writer (registers its after_flush hook)
+    from app.services import stock_ledger  # noqa: F401
+
+    # Tag-versioned caches (registers the hooks that invalidate them on commit)
+    from app.utils import cache_helpers  # noqa: F401
 
     # Make helpers available in all templates
     @app.context_processor
     def utility_helpers():
-        data = notification_counts()
+        # Memoized per request and cached per user
+        data = get_notification_counts(current_user)
         # CSRF token is automatically handled by Flask-WTF's form.hidden_tag()
         return data
 
@@ -136,4 +145,8 @@ def create_app(config_name='default'):
     from app.scheduler import init_scheduler
     init_scheduler(app)
 
+    # Deliver queued notification emails in the background
+    from app.services.email_outbox import init_email_dispatcher
+    init_email_dispatcher(app)
+
     return app
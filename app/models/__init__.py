@@ -2,30 +2,39 @@ from app.models.base import BaseModel
 from app.models.master_data import Category, Item, ItemDetail, Warehouse
 from app.models.facilities import Unit, UnitDetail, Building
 from app.models.inventory import Stock, StockTransaction
+from app.models.stock_ledger import StockLedger, StockDailyRollup
 from app.models.user import User, UserWarehouse, UserUnit
 from app.models.distribution import Distribution
 from app.models.distribution_group import DistributionGroup
 from app.models.rejected_distribution import RejectedDistribution
 from app.models.logging import ActivityLog, AssetMovementLog
-from app.models.procurement import Procurement, ProcurementItem, UnitProcurement, UnitProcurementItem
+from app.models.procurement import (
+    Procurement, ProcurementItem, ProcurementReceipt, ProcurementReceiptSerial,
+    UnitProcurement, UnitProcurementItem
+)
 from app.models.asset_request import AssetRequest, AssetRequestItem
 from app.models.asset_loan import AssetLoan, AssetLoanItem
 from app.models.return_batch import ReturnBatch, ReturnItem
 from app.models.venue_loan import VenueLoan
 from app.models.asset_transfer import AssetTransfer
+from app.models.email_outbox import EmailOutbox
+from app.models.code_sequence import CodeSequence
 
 __all__ = [
     'BaseModel',
     'Category', 'Item', 'ItemDetail', 'Warehouse',
     'Unit', 'UnitDetail', 'Building',
-    'Stock', 'StockTransaction',
+    'Stock', 'StockTransaction', 'StockLedger', 'StockDailyRollup',
     'User', 'UserWarehouse', 'UserUnit',
     'Distribution', 'DistributionGroup', 'RejectedDistribution',
     'ActivityLog', 'AssetMovementLog',
-    'Procurement', 'ProcurementItem', 'UnitProcurement', 'UnitProcurementItem',
+    'Procurement', 'ProcurementItem', 'ProcurementReceipt', 'ProcurementReceiptSerial',
+    'UnitProcurement', 'UnitProcurementItem',
     'AssetRequest', 'AssetRequestItem',
     'AssetLoan', 'AssetLoanItem',
     'ReturnBatch', 'ReturnItem',
     'VenueLoan',
-    'AssetTransfer'
+    'AssetTransfer',
+    'EmailOutbox',
+    'CodeSequence'
 ]
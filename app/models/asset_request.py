@@ -63,7 +63,8 @@ class AssetRequest(BaseModel):
     received_at = db.Column(db.DateTime)
 
     # Proof of receipt (uploaded by unit staff)
-    verification_photo = db.Column(db.LargeBinary)  # BLOB to store proof photo as bytes
+    verification_photo_sha256 = db.Column(db.String(64))  # Proof photo in the blob store (app/services/blob_store.py)
+    verification_photo_size = db.Column(db.Integer)  # Photo size in bytes
 
     # Notes
     request_notes = db.Column(db.Text)
@@ -0,0 +1,19 @@
+from app import db
+from app.models.base import BaseModel
+
+
+class CodeSequence(BaseModel):
+    """
+    Counter behind a family of generated codes.
+
+    One row per code prefix (e.g. 'item_code:JAR', 'serial_unit:JAR-001',
+    'return_batch:WH001-250101'); app/services/code_sequences.py reserves
+    numbers with a single UPDATE ... RETURNING.
+    """
+    __tablename__ = 'code_sequences'
+
+    name = db.Column(db.String(150), unique=True, nullable=False)
+    last_value = db.Column(db.BigInteger, default=0, nullable=False)  # Last number handed out
+
+    def __repr__(self):
+        return f'<CodeSequence {self.name}={self.last_value}>'
@@ -39,7 +39,8 @@ class Distribution(BaseModel):
 
     # Task type and verification fields
     task_type = db.Column(db.String(50), default='installation')  # installation, delivery
-    verification_photo = db.Column(db.LargeBinary)  # BLOB to store verification photo as bytes
+    verification_photo_sha256 = db.Column(db.String(64))  # Verification photo in the blob store (app/services/blob_store.py)
+    verification_photo_size = db.Column(db.Integer)  # Photo size in bytes
     verification_notes = db.Column(db.Text)  # Notes from field staff
     verified_by = db.Column(db.Integer, db.ForeignKey('users.id'))  # Warehouse staff who verified
     verified_at = db.Column(db.DateTime)  # When warehouse staff verified
@@ -91,12 +92,14 @@ class Distribution(BaseModel):
         self.status = 'maintenance'
         self.save()
 
-    def submit_verification(self, photo_bytes=None, notes=None):
-        """Submit verification by field staff"""
+    def submit_verification(self, photo=None, notes=None):
+        """Submit verification by field staff (photo: digest in the blob store)"""
         if self.verification_status == 'verified':
             return False, 'Tugas ini sudah diverifikasi'
         self.verification_status = 'submitted'
-        self.verification_photo = photo_bytes  # Store photo as BLOB
+        if photo:
+            self.verification_photo_sha256 = photo
+            self.verification_photo_size = None  # Recorded once the photo is processed
         self.verification_notes = notes
         self.save()
         return True, 'Verifikasi berhasil dikirim'
@@ -26,7 +26,8 @@ class DistributionGroup(BaseModel):
     notes = db.Column(db.Text)  # Notes from creator
 
     # Proof of receipt (uploaded by unit staff) - one photo for the entire batch
-    verification_photo = db.Column(db.LargeBinary)  # BLOB to store proof photo as bytes
+    verification_photo_sha256 = db.Column(db.String(64))  # Proof photo in the blob store (app/services/blob_store.py)
+    verification_photo_size = db.Column(db.Integer)  # Photo size in bytes
     verification_received_by = db.Column(db.Integer, db.ForeignKey('users.id'))  # Unit staff who uploaded photo
     verification_received_at = db.Column(db.DateTime)  # When photo was uploaded
     verification_notes = db.Column(db.Text)  # Notes from unit staff when uploading photo
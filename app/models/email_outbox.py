@@ -0,0 +1,33 @@
+from datetime import datetime
+from app import db
+from app.models.base import BaseModel
+
+
+class EmailOutbox(BaseModel):
+    """
+    Queued outgoing email.
+
+    Notifications only insert rows here; app/services/email_outbox.py
+    delivers them in the background over pooled SMTP connections and
+    retries failures with exponential backoff.
+    """
+    __tablename__ = 'email_outbox'
+
+    recipients = db.Column(db.Text, nullable=False)  # JSON list of addresses
+    subject = db.Column(db.String(255), nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    sender = db.Column(db.String(255))  # None = MAIL_DEFAULT_SENDER
+
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_at = db.Column(db.DateTime)  # When a dispatcher claimed the row
+    sent_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('idx_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f'<EmailOutbox {self.id} {self.status} {self.subject}>'
@@ -22,19 +22,24 @@ class Stock(BaseModel):
     )
 
     def add_stock(self, quantity):
-        """Add stock quantity"""
-        self.quantity += quantity
-        self.updated_at = datetime.utcnow()
-        self.save()
+        """Add stock quantity (atomic upsert, see app/services/stock_mutations.py)"""
+        from sqlalchemy.orm.attributes import set_committed_value
+        from app.services.stock_mutations import add_stock
+
+        set_committed_value(self, 'quantity', add_stock(self.item_id, self.warehouse_id, quantity))
+        db.session.commit()
 
     def remove_stock(self, quantity):
-        """Remove stock quantity"""
-        if self.quantity >= quantity:
-            self.quantity -= quantity
-            self.updated_at = datetime.utcnow()
-            self.save()
-            return True
-        return False
+        """Remove stock quantity if enough is left (atomic conditional update)"""
+        from sqlalchemy.orm.attributes import set_committed_value
+        from app.services.stock_mutations import remove_stock
+
+        new_quantity = remove_stock(self.item_id, self.warehouse_id, quantity)
+        if new_quantity is None:
+            return False
+        set_committed_value(self, 'quantity', new_quantity)
+        db.session.commit()
+        return True
 
     def is_low_stock(self, threshold=10):
         """Check if stock is below threshold"""
@@ -54,6 +59,9 @@ class StockTransaction(BaseModel):
     quantity = db.Column(db.Integer, nullable=False)
     transaction_date = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     note = db.Column(db.Text)
+    # Set on the rows logged when a procurement is completed; the ledger
+    # records the procurement itself instead of these rows
+    procurement_id = db.Column(db.Integer, db.ForeignKey('procurements.id'), nullable=True)
 
     # Relationships
     item = db.relationship('Item')
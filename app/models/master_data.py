@@ -33,9 +33,27 @@ class Item(BaseModel):
     item_details = db.relationship('ItemDetail', back_populates='item', lazy='dynamic')
     stocks = db.relationship('Stock', back_populates='item', lazy='dynamic')
 
+    # Filled by app.services.item_counts.load_item_counts for list pages;
+    # while unset the properties below query per item
+    _status_counts = None
+    _stock_total = None
+
+    def _count_statuses(self, *statuses):
+        """Count item details in the given statuses (all when none given)"""
+        if self._status_counts is not None:
+            if not statuses:
+                return sum(self._status_counts.values())
+            return sum(self._status_counts.get(status, 0) for status in statuses)
+        query = self.item_details
+        if statuses:
+            query = query.filter(ItemDetail.status.in_(statuses))
+        return query.count()
+
     @property
     def total_stock(self):
         """Get total stock across all warehouses"""
+        if self._stock_total is not None:
+            return self._stock_total
         from app.models.inventory import Stock
         result = db.session.query(db.func.sum(Stock.quantity)).filter(Stock.item_id == self.id).scalar()
         return result or 0
@@ -43,43 +61,42 @@ class Item(BaseModel):
     @property
     def total_details(self):
         """Get total item details (serial numbers) count"""
-        return self.item_details.count()
+        return self._count_statuses()
 
     @property
     def available_details(self):
         """Get total available item details count"""
-        return self.item_details.filter_by(status='available').count()
+        return self._count_statuses('available')
 
     @property
     def used_details(self):
         """Get total used item details count"""
-        return self.item_details.filter_by(status='used').count()
+        return self._count_statuses('used')
 
     @property
     def in_unit_details(self):
         """Get total item details in unit count"""
-        return self.item_details.filter_by(status='in_unit').count()
+        return self._count_statuses('in_unit')
 
     @property
     def processing_details(self):
         """Get total processing item details count"""
-        return self.item_details.filter_by(status='processing').count()
+        return self._count_statuses('processing')
 
     @property
     def maintenance_details(self):
         """Get total maintenance item details count"""
-        return self.item_details.filter_by(status='maintenance').count()
+        return self._count_statuses('maintenance')
 
     @property
     def returned_details(self):
         """Get total returned item details count (includes maintenance status)"""
-        return self.item_details.filter(db.or_(
-            ItemDetail.status == 'returned',
-            ItemDetail.status == 'maintenance'
-        )).count()
+        return self._count_statuses('returned', 'maintenance')
 
     def get_total_stock(self, warehouse_id=None):
         """Get total stock across all warehouses or specific warehouse"""
+        if not warehouse_id and self._stock_total is not None:
+            return self._stock_total
         from app.models.inventory import Stock
         query = db.session.query(db.func.sum(Stock.quantity)).filter(Stock.item_id == self.id)
         if warehouse_id:
@@ -96,7 +113,7 @@ class ItemDetail(BaseModel):
 
     item_id = db.Column(db.Integer, db.ForeignKey('items.id'), nullable=False)
     serial_number = db.Column(db.String(100), unique=True, nullable=False)
-    serial_unit = db.Column(db.String(100))  # Serial unit internal untuk tracking aset
+    serial_unit = db.Column(db.String(100), unique=True)  # Serial unit internal untuk tracking aset
     status = db.Column(db.String(50), default='available')  # available, processing, maintenance, used, in_unit, returned
     specification_notes = db.Column(db.Text)
     warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.id'))
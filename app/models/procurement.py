@@ -216,16 +216,13 @@ class ProcurementItem(BaseModel):
     item_id = db.Column(db.Integer, db.ForeignKey('items.id'), nullable=True)
     quantity = db.Column(db.Integer, nullable=False)
 
-    # Serial numbers storage (JSON array)
-    # Format: ["SN001", "SN002", "SN003"]
-    serial_numbers = db.Column(db.Text)  # Store as JSON string
-
     # Receipt tracking
     actual_quantity = db.Column(db.Integer, default=0)  # Total jumlah yang diterima (akumulatif)
 
-    # Receipt history (JSON array of receipts for partial receiving)
-    # Format: [{"receipt_number": "INV-001", "quantity": 2, "serials": ["SN1", "SN2"], "date": "2024-01-01", "received_by": 1}, ...]
-    receipt_history = db.Column(db.Text)  # Store as JSON string
+    # Deliveries and their serials live in procurement_receipts and
+    # procurement_receipt_serials (the former serial_numbers and
+    # receipt_history JSON columns are migrated by
+    # migrations/create_procurement_receipt_tables.py)
 
     # Temporary new item data (if item doesn't exist)
     new_item_name = db.Column(db.String(200))
@@ -235,6 +232,13 @@ class ProcurementItem(BaseModel):
     # Relationships
     procurement = db.relationship('Procurement', backref='items')
     item = db.relationship('Item', backref='procurement_items')
+    receipts = db.relationship(
+        'ProcurementReceipt', backref='procurement_item', cascade='all, delete-orphan',
+        order_by='(ProcurementReceipt.received_at, ProcurementReceipt.id)'
+    )
+
+    # Per-serial outcomes of the last add_receipt_to_history() call (not persisted)
+    last_receipt_outcomes = None
 
     @property
     def total_received(self):
@@ -251,12 +255,15 @@ class ProcurementItem(BaseModel):
         """Check if all requested items have been received"""
         return self.total_received >= self.quantity
 
+    def get_serial_numbers(self):
+        """Serial numbers received so far, in receipt order"""
+        from app.services.procurement_receiving import received_serial_numbers
+        return received_serial_numbers(self.id)
+
     def get_receipt_history(self):
-        """Get receipt history as list"""
-        import json
-        if self.receipt_history:
-            return json.loads(self.receipt_history)
-        return []
+        """Get receipt history as list (oldest delivery first)"""
+        from app.services.procurement_receiving import receipt_history
+        return receipt_history(self.id)
 
     def add_receipt_to_history(self, quantity_received, serial_numbers_list, serial_units_list, user_id):
         """Add a delivery update to the history (single invoice, multiple deliveries)
@@ -266,86 +273,88 @@ class ProcurementItem(BaseModel):
             serial_numbers_list: List of serial numbers (manual for networking, auto-generated for non-networking)
             serial_units_list: List of serial units (always auto-generated for ALL items)
             user_id: ID of user receiving the goods
+
+        Nothing is committed here; Procurement.receive_goods commits the
+        whole receipt once. Per-serial outcomes are left in
+        last_receipt_outcomes.
         """
-        import json
-        from app.models.master_data import ItemDetail
+        from app.services.procurement_receiving import (
+            CREATED, pair_serials, receive_serials, already_received, record_receipt
+        )
 
-        # Get existing history
-        history = self.get_receipt_history()
+        pairs = pair_serials(quantity_received, serial_numbers_list, serial_units_list)
 
         # Check for duplicate serial numbers within this procurement item
-        existing_serials = json.loads(self.serial_numbers) if self.serial_numbers else []
-        duplicates = []
-        for sn in serial_numbers_list:
-            if sn in existing_serials:
-                duplicates.append(sn)
+        duplicates = already_received(self.id, [sn for sn, _ in pairs])
 
         if duplicates:
             return False, f'Serial number sudah terdaftar di pengiriman sebelumnya: {", ".join(duplicates[:5])}{"..." if len(duplicates) > 5 else ""}'
 
-        # Create ItemDetail records immediately upon receipt
-        # Get procurement object
-        from app.models.procurement import Procurement
-        procurement = Procurement.query.filter(
-            Procurement.items.any(id=self.id)
-        ).first()
-
-        items_created = 0
-        for i in range(quantity_received):
-            serial_number = serial_numbers_list[i] if i < len(serial_numbers_list) else serial_units_list[i]
-            serial_unit = serial_units_list[i] if i < len(serial_units_list) else serial_number
-
-            # Check if ItemDetail with this serial_number already exists globally
-            existing_detail = ItemDetail.query.filter_by(serial_number=serial_number).first()
-            if existing_detail:
-                continue
-
-            # Check if ItemDetail with this serial_unit already exists globally
-            existing_unit = ItemDetail.query.filter_by(serial_unit=serial_unit).first()
-            if existing_unit:
-                continue
-
-            # Create new ItemDetail with status 'available' (in warehouse, not yet distributed)
-            item_detail = ItemDetail(
-                item_id=self.item_id,
-                serial_number=serial_number,  # Manual for networking, auto-generated for non-networking
-                serial_unit=serial_unit,  # Always auto-generated
-                status='available',
-                warehouse_id=None,  # Will be assigned when distributed/added to stock
-                specification_notes=f'Diterima melalui procurement #{procurement.id if procurement else "N/A"}'
-            )
-            item_detail.save()
-            items_created += 1
-
-        # Add new delivery record
-        new_delivery = {
-            'date': datetime.utcnow().isoformat(),
-            'quantity': quantity_received,
-            'serials': serial_numbers_list,
-            'serial_units': serial_units_list,
-            'received_by': user_id,
-            'cumulative_total': (self.actual_quantity or 0) + quantity_received,
-            'item_details_created': items_created
-        }
-        history.append(new_delivery)
-
-        # Save history
-        self.receipt_history = json.dumps(history)
+        # Create ItemDetail records immediately upon receipt: one duplicate
+        # check and one multi-row insert, committed by the caller
+        self.last_receipt_outcomes = receive_serials(self.item_id, self.procurement_id, pairs)
+        items_created = sum(1 for o in self.last_receipt_outcomes if o['status'] == CREATED)
 
         # Update actual_quantity (akumulatif)
         self.actual_quantity = (self.actual_quantity or 0) + quantity_received
 
-        # Update serial_numbers (merge existing with new)
-        all_serials = existing_serials + serial_numbers_list
-        self.serial_numbers = json.dumps(all_serials)
+        # Add new delivery record with its serials
+        record_receipt(self, user_id, quantity_received, items_created, pairs)
 
-        self.save()
         return True, f'Penerimaan berhasil dicatat. {items_created} ItemDetail dibuat. Total: {self.actual_quantity} unit.'
 
     def __repr__(self):
         return f'<ProcurementItem #{self.id} {self.item.name if self.item else "N/A"} Qty:{self.quantity}>'
 
 
+class ProcurementReceipt(BaseModel):
+    """One delivery received for a procurement item (partial receiving)"""
+    __tablename__ = 'procurement_receipts'
+
+    procurement_item_id = db.Column(db.Integer, db.ForeignKey('procurement_items.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)  # Jumlah diterima pada pengiriman ini
+    cumulative_total = db.Column(db.Integer, nullable=False)  # Total diterima setelah pengiriman ini
+    item_details_created = db.Column(db.Integer, default=0, nullable=False)
+    received_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # Relationships
+    receiver = db.relationship('User', foreign_keys=[received_by])
+
+    __table_args__ = (
+        db.Index('idx_procurement_receipts_item_received', 'procurement_item_id', 'received_at'),
+    )
+
+    def __repr__(self):
+        return f'<ProcurementReceipt #{self.id} Item:{self.procurement_item_id} Qty:{self.quantity}>'
+
+
+class ProcurementReceiptSerial(BaseModel):
+    """Serial number / serial unit received in a procurement receipt"""
+    __tablename__ = 'procurement_receipt_serials'
+
+    receipt_id = db.Column(db.Integer, db.ForeignKey('procurement_receipts.id', ondelete='CASCADE'), nullable=False)
+    # Denormalized from the receipt so a serial is unique per procurement item
+    procurement_item_id = db.Column(db.Integer, db.ForeignKey('procurement_items.id'), nullable=False)
+    serial_number = db.Column(db.String(100), nullable=False)
+    serial_unit = db.Column(db.String(100))
+    position = db.Column(db.Integer, nullable=False)  # Order within the receipt
+
+    # Relationships
+    receipt = db.relationship('ProcurementReceipt', backref=db.backref(
+        'serials', cascade='all, delete-orphan', passive_deletes=True,
+        order_by='ProcurementReceiptSerial.position'
+    ))
+
+    __table_args__ = (
+        db.UniqueConstraint('procurement_item_id', 'serial_number', name='uq_procurement_receipt_serials_item_serial'),
+        db.Index('idx_procurement_receipt_serials_receipt', 'receipt_id', 'position'),
+    )
+
+    def __repr__(self):
+        return f'<ProcurementReceiptSerial {self.serial_number} Receipt:{self.receipt_id}>'
+
+
 class Procurement(BaseModel):
     """Procurement model for tracking purchase requests and orders"""
     __tablename__ = 'procurements'
@@ -403,6 +412,9 @@ class Procurement(BaseModel):
     receiver = db.relationship('User', foreign_keys=[received_by], backref='received_procurements')
     completer = db.relationship('User', foreign_keys=[completed_by], backref='completed_procurements')
 
+    # Per-serial outcomes of the last receive_goods() call, keyed by procurement item id (not persisted)
+    receipt_outcomes = None
+
     @property
     def procurement_code(self):
         """Generate procurement code like PC-000001"""
@@ -501,9 +513,12 @@ class Procurement(BaseModel):
         if self.receipt_number and self.receipt_number != receipt_number:
             return False, f'Nomor invoice harus sama dengan yang sudah terdaftar ({self.receipt_number}). Gunakan invoice yang sama.'
 
+        from app.services.procurement_receiving import summarize_outcomes
+
         # Process each item
         results = []
         all_success = True
+        self.receipt_outcomes = {}
         for item_data in items_data:
             procurement_item_id = item_data.get('procurement_item_id')
             quantity_received = item_data.get('quantity_received')
@@ -541,108 +556,85 @@ class Procurement(BaseModel):
                 continue
 
             # Add to receipt history
-            success, message = procurement_item.add_receipt_to_history(quantity_received, serial_numbers, serial_units, user_id)
+            try:
+                success, message = procurement_item.add_receipt_to_history(quantity_received, serial_numbers, serial_units, user_id)
+            except Exception:
+                db.session.rollback()
+                raise
             if success:
-                results.append(f'{procurement_item.item.name if procurement_item.item else "Item"}: {quantity_received} unit diterima')
+                self.receipt_outcomes[procurement_item.id] = procurement_item.last_receipt_outcomes
+                skipped = summarize_outcomes(procurement_item.last_receipt_outcomes)
+                results.append(f'{procurement_item.item.name if procurement_item.item else "Item"}: {quantity_received} unit diterima' + (f' ({skipped})' if skipped else ''))
             else:
                 results.append(f'{procurement_item.item.name if procurement_item.item else "Item"}: {message}')
                 all_success = False
 
+        # One commit for every item detail and history entry of this receipt
         self.save()
 
         if all_success:
+            skipped = ' '.join(filter(None, (summarize_outcomes(o) for o in self.receipt_outcomes.values())))
             if self.is_fully_received:
-                return True, f'Semua barang berhasil diterima. Semua item sudah lengkap! Siap untuk diselesaikan.'
+                message = f'Semua barang berhasil diterima. Semua item sudah lengkap! Siap untuk diselesaikan.'
             else:
-                return True, f'Barang berhasil diterima. Masih ada item yang belum lengkap.'
+                message = f'Barang berhasil diterima. Masih ada item yang belum lengkap.'
+            return True, f'{message} {skipped}' if skipped else message
         else:
             return False, 'Sebagian barang gagal diterima: ' + '; '.join(results)
 
     def complete(self, user_id, warehouse_id=1):
-        """Mark procurement as completed and add stock with item details"""
-        from app.models.inventory import Stock, StockTransaction
-        from app.models.master_data import ItemDetail
-        import json
+        """Mark procurement as completed and add stock with item details
+
+        Runs as one transaction: the procurement row is locked with
+        SELECT ... FOR UPDATE and its status re-checked, so of two
+        concurrent completions only one adds stock. Item details, stock
+        rows and stock transactions are written with one statement each.
+        """
+        from flask import current_app
+        from sqlalchemy import select
+        from app.services.procurement_receiving import (
+            assign_received_details, add_received_stock, log_received_transactions
+        )
 
         # Validasi: harus status received dan semua barang sudah diterima
         if not self.is_fully_received:
             return False, f'Pengadaan belum bisa diselesaikan. Masih ada item yang belum lengkap.'
 
         try:
-            items_created = 0
-            items_skipped = 0
-            total_quantity_added = 0
+            # Lock the procurement row and reload it (and its items) as committed
+            db.session.execute(
+                select(Procurement).where(Procurement.id == self.id).with_for_update()
+                .execution_options(populate_existing=True)
+            ).scalar_one()
+            db.session.execute(
+                select(ProcurementItem).where(ProcurementItem.procurement_id == self.id)
+                .execution_options(populate_existing=True)
+            ).scalars().all()
+
+            if self.status != 'received':
+                db.session.rollback()
+                return False, 'Pengadaan sudah diselesaikan atau tidak dalam status diterima.'
+            if not self.is_fully_received:
+                db.session.rollback()
+                return False, f'Pengadaan belum bisa diselesaikan. Masih ada item yang belum lengkap.'
 
-            print(f"=== DEBUG PROCUREMENT COMPLETE ===")
-            print(f"Procurement ID: {self.id}")
-            print(f"Items count: {len(self.items) if self.items else 0}")
-
-            # Process each procurement item
             for procurement_item in self.items:
-                print(f"\n--- Processing ProcurementItem #{procurement_item.id} ---")
-                print(f"Item ID: {procurement_item.item_id}")
-                print(f"Requested Quantity: {procurement_item.quantity}")
-                print(f"Actual Quantity (received): {procurement_item.actual_quantity}")
-                print(f"Serial Numbers: {procurement_item.serial_numbers}")
-
                 if not procurement_item.item_id:
+                    db.session.rollback()
                     return False, f'Item {procurement_item.new_item_name if procurement_item.new_item_name else "Unknown"} harus diisi sebelum menyelesaikan pengadaan'
 
-                # Get serial numbers
-                serial_numbers = json.loads(procurement_item.serial_numbers) if procurement_item.serial_numbers else []
-                print(f"Parsed serial numbers count: {len(serial_numbers)}")
-
-                # Update warehouse_id for existing ItemDetails (created during receive_goods)
-                # ItemDetails were created with warehouse_id=None, now assign them to the warehouse
-                items_updated = 0
-                for serial_number in serial_numbers:
-                    existing_detail = ItemDetail.query.filter_by(serial_number=serial_number).first()
-                    if existing_detail and existing_detail.warehouse_id is None:
-                        existing_detail.warehouse_id = warehouse_id
-                        existing_detail.save()
-                        items_updated += 1
-                        items_created += 1  # Count as "processed" for message
-                    elif existing_detail and existing_detail.warehouse_id == warehouse_id:
-                        items_created += 1  # Already in correct warehouse
-                    elif existing_detail:
-                        items_skipped += 1  # Already in different warehouse
-
-                print(f"ItemDetails updated: {items_updated}, skipped: {items_skipped}")
-
-                # Add to stock - count by actual serial numbers received
-                stock = Stock.query.filter_by(
-                    item_id=procurement_item.item_id,
-                    warehouse_id=warehouse_id
-                ).first()
-
-                if not stock:
-                    stock = Stock(item_id=procurement_item.item_id, warehouse_id=warehouse_id, quantity=0)
-                    stock.save()
-
-                # Use actual count of serial numbers received
-                quantity_to_add = procurement_item.actual_quantity if procurement_item.actual_quantity else len(serial_numbers)
-                print(f"Quantity to add to stock: {quantity_to_add}")
-                total_quantity_added += quantity_to_add
-
-                old_quantity = stock.quantity
-                stock.add_stock(quantity_to_add)
-                print(f"Stock updated: {old_quantity} -> {stock.quantity}")
-
-                # Log transaction
-                transaction = StockTransaction(
-                    item_id=procurement_item.item_id,
-                    warehouse_id=warehouse_id,
-                    transaction_type='IN',
-                    quantity=quantity_to_add,
-                    note=f'Pengadaan #{self.id} - {procurement_item.total_received} unit'
-                )
-                transaction.save()
-
-            print(f"\n=== COMPLETE ===")
-            print(f"ItemDetails created: {items_created}")
-            print(f"ItemDetails skipped: {items_skipped}")
-            print(f"Total quantity added to stock: {total_quantity_added}")
-            print(f"===============================\n")
+            # Assign ItemDetails created during receive_goods (warehouse_id=None)
+            # to the warehouse in one statement over the received serials
+            items_created, items_skipped = assign_received_details(self.id, warehouse_id)
+
+            # Add actual received quantities to stock and log them
+            add_received_stock(self.id, warehouse_id)
+            log_received_transactions(self.id, warehouse_id)
+            total_quantity_added = sum(item.actual_quantity or 0 for item in self.items)
+
+            # Record the warehouse that actually received the goods; the
+            # stock ledger credits the procurement to it
+            self.warehouse_id = warehouse_id
 
             # Update procurement status
             self.status = 'completed'
@@ -660,9 +652,8 @@ class Procurement(BaseModel):
 
             return True, f'Pengadaan berhasil diselesaikan. {", ".join(message_parts)}.'
         except Exception as e:
-            import traceback
-            print(f"ERROR in complete(): {str(e)}")
-            print(traceback.format_exc())
+            db.session.rollback()
+            current_app.logger.exception(f'Completing procurement #{self.id} failed')
             return False, f'Error menyelesaikan pengadaan: {str(e)}'
 
     def delete(self):
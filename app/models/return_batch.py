@@ -83,34 +83,9 @@ class ReturnBatch(BaseModel):
     @staticmethod
     def generate_batch_code(warehouse_id):
         """Generate unique batch code for return"""
-        from app.models import Warehouse
-
-        warehouse = Warehouse.query.get(warehouse_id)
-        # Use warehouse ID since warehouse model doesn't have a 'code' field
-        warehouse_code = f'WH{warehouse_id:03d}' if warehouse else 'WH000'
-
-        # Get today's date in YYMMDD format
-        today = datetime.now().strftime('%y%m%d')
-
-        # Find existing batches for today
-        existing_batches = ReturnBatch.query.filter(
-            ReturnBatch.batch_code.like(f'RET-{warehouse_code}-{today}%')
-        ).all()
-
-        # Extract sequence numbers and find the highest
-        sequences = []
-        for batch in existing_batches:
-            try:
-                parts = batch.batch_code.split('-')
-                if len(parts) == 4:
-                    sequences.append(int(parts[3]))
-            except (ValueError, IndexError):
-                pass
-
-        next_seq = max(sequences) + 1 if sequences else 1
-
-        # Generate batch code: RET-{WAREHOUSE_CODE}-{YYMMDD}-{SEQUENCE}
-        return f'RET-{warehouse_code}-{today}-{next_seq:03d}'
+        from app.services.code_sequences import generate_return_batch_code
+
+        return generate_return_batch_code(warehouse_id)
 
 
 class ReturnItem(BaseModel):
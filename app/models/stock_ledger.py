@@ -0,0 +1,72 @@
+from datetime import datetime
+from app import db
+from app.models.base import BaseModel
+
+
+class StockLedger(BaseModel):
+    """
+    Append-only ledger with one row per stock movement.
+
+    Rows are written by app/services/stock_ledger.py whenever a stock
+    transaction is logged, a return batch is confirmed, a procurement is
+    completed, a distribution batch is approved or a direct distribution
+    is installed. (movement_type, source_id, source_line_id) identifies the
+    source row, so recording the same movement twice is a no-op.
+    """
+    __tablename__ = 'stock_ledger'
+
+    occurred_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    movement_type = db.Column(db.String(30), nullable=False)  # stock_in, stock_out, return_batch, procurement, distribution_group, direct_distribution
+    direction = db.Column(db.String(3), nullable=False)  # IN | OUT
+    quantity = db.Column(db.Integer, nullable=False)
+
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.id'), nullable=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('items.id'), nullable=True)
+    item_detail_id = db.Column(db.Integer, db.ForeignKey('item_details.id'), nullable=True)
+    unit_id = db.Column(db.Integer, db.ForeignKey('units.id'), nullable=True)
+
+    # Source row (e.g. return batch id + return item id)
+    source_id = db.Column(db.Integer, nullable=False)
+    source_line_id = db.Column(db.Integer, default=0, nullable=False)
+    reference = db.Column(db.String(100))  # Batch code / procurement code of the source
+    note = db.Column(db.Text)
+
+    # Relationships
+    warehouse = db.relationship('Warehouse')
+    item = db.relationship('Item')
+    item_detail = db.relationship('ItemDetail')
+    unit = db.relationship('Unit')
+
+    __table_args__ = (
+        db.UniqueConstraint('movement_type', 'source_id', 'source_line_id', name='uq_stock_ledger_source'),
+        db.Index('idx_stock_ledger_warehouse_occurred', 'warehouse_id', 'occurred_at'),
+        db.Index('idx_stock_ledger_occurred', 'occurred_at', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<StockLedger {self.movement_type} {self.direction} {self.quantity}>'
+
+
+class StockDailyRollup(BaseModel):
+    """
+    Stock movements pre-aggregated per WIB day, warehouse and item.
+
+    Maintained by the same statement that appends to stock_ledger, so the
+    dashboard charts read O(days) rows instead of O(movements). Unknown
+    warehouse/item ids are stored as 0 to keep the unique key total.
+    """
+    __tablename__ = 'stock_daily_rollups'
+
+    day = db.Column(db.Date, nullable=False)  # WIB calendar day
+    warehouse_id = db.Column(db.Integer, default=0, nullable=False)
+    item_id = db.Column(db.Integer, default=0, nullable=False)
+    quantity_in = db.Column(db.Integer, default=0, nullable=False)
+    quantity_out = db.Column(db.Integer, default=0, nullable=False)
+    movement_count = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('day', 'warehouse_id', 'item_id', name='uq_stock_daily_rollup'),
+    )
+
+    def __repr__(self):
+        return f'<StockDailyRollup {self.day} W:{self.warehouse_id} I:{self.item_id} +{self.quantity_in}/-{self.quantity_out}>'
@@ -60,11 +60,8 @@ class User(UserMixin, BaseModel):
 
     def has_warehouse_access(self, warehouse_id):
         """Check if user has access to specific warehouse"""
-        if self.is_admin():
-            return True
-
-        # Check if warehouse is in user's assignments
-        return any(uw.warehouse_id == warehouse_id for uw in self.user_warehouses.all())
+        from app.services.access_scope import get_access_scope
+        return get_access_scope(self).has_warehouse_access(warehouse_id)
 
     def get_assigned_units(self):
         """Get list of units this user is assigned to"""
@@ -79,11 +76,8 @@ class User(UserMixin, BaseModel):
 
     def has_unit_access(self, unit_id):
         """Check if user has access to specific unit"""
-        if self.is_admin():
-            return True
-
-        # Check if unit is in user's assignments
-        return any(uu.unit_id == unit_id for uu in self.user_units.all())
+        from app.services.access_scope import get_access_scope
+        return get_access_scope(self).has_unit_access(unit_id)
 
     def should_receive_email_notifications(self):
         """Check if user should receive email notifications.
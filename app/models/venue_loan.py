@@ -113,11 +113,12 @@ class VenueLoan(BaseModel):
         if get_wib_now() < self.start_datetime:
             return False, 'Waktu mulai belum tercapai'
 
-        self.status = 'active'
-        self.save()
+        from app.services.venue_loans import set_room_items_status
 
         # Update all items in the room to loaned status
-        self._update_room_items_status('loaned', f'Dipinjam - {self.borrower_unit.name}')
+        self.status = 'active'
+        set_room_items_status([self.id], 'loaned', note_prefix='Dipinjam - ')
+        self.save()
 
         return True, 'Peminjaman dimulai, barang berstatus Dipinjam'
 
@@ -144,8 +145,10 @@ class VenueLoan(BaseModel):
         if self.status != 'active':
             return False, 'Hanya peminjaman dengan status aktif yang dapat diselesaikan'
 
+        from app.services.venue_loans import set_room_items_status
+
         # Restore all items in the room to used status
-        self._update_room_items_status('used')
+        set_room_items_status([self.id], 'used')
 
         self.status = 'completed'
         if user_id:
@@ -155,23 +158,5 @@ class VenueLoan(BaseModel):
 
         return True, 'Peminjaman selesai, status barang dikembalikan ke terpakai'
 
-    def _update_room_items_status(self, new_status, notes=None):
-        """Update all items in the room to a new status"""
-        from app.models import Distribution, ItemDetail
-
-        # Get all distributions in this room
-        distributions = Distribution.query.filter_by(unit_detail_id=self.unit_detail_id).all()
-
-        for dist in distributions:
-            if dist.item_detail:
-                dist.item_detail.status = new_status
-                # Optionally add notes
-                if notes:
-                    if not dist.item_detail.specification_notes:
-                        dist.item_detail.specification_notes = notes
-                    else:
-                        dist.item_detail.specification_notes += f' | {notes}'
-                dist.item_detail.save()
-
     def __repr__(self):
         return f'<VenueLoan #{self.id} {self.event_name} Status:{self.status}>'
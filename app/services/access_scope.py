@@ -0,0 +1,147 @@
+"""
+Per-request access scope.
+
+Which warehouses and units a user may see used to be re-derived all over
+the request: load_user() fetched the User, then views, query helpers and
+notification counts each ran user_warehouses.all(),
+UserWarehouse.query...first() or UserUnit.query...all() again (stock.index
+alone did it six times).
+
+An AccessScope (user id, role, warehouse ids, unit ids plus the user's
+columns) is now resolved once per request and memoized on flask.g, and
+cached across requests for ACCESS_SCOPE_TIMEOUT seconds. load_user()
+rebuilds current_user from it, so an authenticated request with a warm
+cache spends no queries on identity or scoping. app/views/users.py calls
+invalidate_access_scope() after changing a user or its assignments.
+"""
+
+from flask import current_app, g, has_request_context
+from flask_login import current_user
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db, cache
+from app.models import User, UserUnit, UserWarehouse
+
+# Never cached: loaded on access only (check_password)
+UNCACHED_COLUMNS = ('password_hash',)
+
+
+class AccessScope:
+    """What a user may access; ids are in assignment order"""
+    __slots__ = ('user_id', 'role', 'warehouse_ids', 'unit_ids', 'user_columns')
+
+    def __init__(self, user_id, role, warehouse_ids, unit_ids, user_columns):
+        self.user_id = user_id
+        self.role = role
+        self.warehouse_ids = warehouse_ids
+        self.unit_ids = unit_ids
+        self.user_columns = user_columns
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+    @property
+    def warehouse_id(self):
+        """First assigned warehouse (None for admins and unassigned users)"""
+        if self.is_admin or not self.warehouse_ids:
+            return None
+        return self.warehouse_ids[0]
+
+    @property
+    def unit_id(self):
+        """First assigned unit (None when unassigned)"""
+        return self.unit_ids[0] if self.unit_ids else None
+
+    def has_warehouse_access(self, warehouse_id):
+        return self.is_admin or warehouse_id in self.warehouse_ids
+
+    def has_unit_access(self, unit_id):
+        return self.is_admin or unit_id in self.unit_ids
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f'<AccessScope user={self.user_id} {self.role} warehouses={self.warehouse_ids} units={self.unit_ids}>'
+
+
+def _cache_key(user_id):
+    return f'access_scope_{user_id}'
+
+
+def _load(user_id):
+    """Build a scope from the database (two queries); None if the user does not exist"""
+    columns = [c for c in User.__table__.columns if c.name not in UNCACHED_COLUMNS]
+    row = db.session.execute(select(*columns).where(User.id == user_id)).mappings().first()
+    if row is None:
+        return None
+
+    assignments = union_all(
+        select(literal('w').label('kind'), UserWarehouse.warehouse_id.label('target_id'),
+               UserWarehouse.id.label('position')).where(UserWarehouse.user_id == user_id),
+        select(literal('u'), UserUnit.unit_id, UserUnit.id).where(UserUnit.user_id == user_id),
+    ).subquery()
+    warehouse_ids, unit_ids = [], []
+    for kind, target_id in db.session.execute(
+        select(assignments.c.kind, assignments.c.target_id).order_by(assignments.c.position)
+    ):
+        (warehouse_ids if kind == 'w' else unit_ids).append(target_id)
+
+    return AccessScope(user_id, row['role'], tuple(warehouse_ids), tuple(unit_ids), dict(row))
+
+
+def get_access_scope(user=None):
+    """
+    Access scope of a user (default: current_user), or None for anonymous
+    users and unknown ids. Accepts a User or a user id.
+    """
+    if user is None:
+        if not current_user.is_authenticated:
+            return None
+        user = current_user
+    user_id = user if isinstance(user, int) else user.id
+
+    memo = g.setdefault('_access_scopes', {}) if has_request_context() else {}
+    if user_id in memo:
+        return memo[user_id]
+
+    scope = cache.get(_cache_key(user_id))
+    if scope is None:
+        scope = _load(user_id)
+        if scope is not None:
+            cache.set(_cache_key(user_id), scope,
+                      timeout=current_app.config.get('ACCESS_SCOPE_TIMEOUT', 60))
+
+    memo[user_id] = scope
+    return scope
+
+
+def invalidate_access_scope(user_id):
+    """Forget a user's cached scope (call after committing changes to the user or its assignments)"""
+    cache.delete(_cache_key(user_id))
+    if has_request_context():
+        g.get('_access_scopes', {}).pop(user_id, None)
+
+
+def load_user(user_id):
+    """
+    current_user for Flask-Login, rebuilt from the cached scope.
+
+    The User is attached to the session as persistent without a query;
+    password_hash stays unloaded and is fetched only if accessed.
+    """
+    scope = get_access_scope(user_id)
+    if scope is None:
+        return None
+
+    user = User.__mapper__.class_manager.new_instance()
+    for name, value in scope.user_columns.items():
+        set_committed_value(user, name, value)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
@@ -0,0 +1,170 @@
+"""
+Content-addressed blob store for uploaded photos.
+
+Verification/proof photos used to be BYTEA columns on distributions,
+distribution_groups and asset_requests, so every query on those tables
+carried up to 500KB per row. A photo is now written once under its
+SHA-256 digest and the row only keeps the digest and size.
+
+The local backend lays files out as <BLOB_STORE_FOLDER>/ab/cd/<digest>.
+Writes go through a temporary file and os.replace(), so readers never
+see partial files, and identical photos are stored once. Because a
+digest always names the same bytes, served photos can be cached
+forever (ETag = digest, Cache-Control: immutable). Files derived from a
+blob (display copy, thumbnails; see image_pipeline.py) live under
+variants/ab/cd/<digest>/ and never change either.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+from flask import current_app, send_file
+
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+VARIANT_PATTERN = re.compile(r'^[a-z]{2,10}$')
+CHUNK_SIZE = 64 * 1024
+
+# Leading bytes -> mimetype of the image formats accepted for upload
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+PHOTO_MAX_AGE = 365 * 24 * 3600
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class LocalBlobStore:
+    """Blobs as files in a local directory, sharded by digest prefix"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, digest):
+        if not DIGEST_PATTERN.match(digest or ''):
+            raise ValueError('Invalid blob digest')
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put(self, data):
+        """Store data; returns its digest (existing content is not rewritten)"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if os.path.exists(path):
+            return digest
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, data)
+        return digest
+
+    def put_file(self, src_path):
+        """
+        Move a spooled file into the store; returns (digest, size).
+
+        src_path must be on the same filesystem (see spool_dir()).
+        """
+        sha256 = hashlib.sha256()
+        size = 0
+        with open(src_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                sha256.update(chunk)
+                size += len(chunk)
+        digest = sha256.hexdigest()
+
+        path = self.path(digest)
+        if os.path.exists(path):
+            os.remove(src_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(src_path, path)
+        return digest, size
+
+    def open(self, digest):
+        return open(self.path(digest), 'rb')
+
+    def spool_dir(self):
+        """Directory for temporary files that are moved into the store"""
+        folder = os.path.join(self.root, 'tmp')
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def variant_path(self, digest, variant):
+        """Derived file (e.g. a thumbnail) of a blob: variants/ab/cd/<digest>/<variant>.jpg"""
+        if not DIGEST_PATTERN.match(digest or '') or not VARIANT_PATTERN.match(variant or ''):
+            raise ValueError('Invalid blob digest or variant')
+        return os.path.join(self.root, 'variants', digest[:2], digest[2:4], digest, f'{variant}.jpg')
+
+    def has_variant(self, digest, variant):
+        return os.path.exists(self.variant_path(digest, variant))
+
+    def put_variant(self, digest, variant, data):
+        path = self.variant_path(digest, variant)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, data)
+
+
+BACKENDS = {
+    'local': LocalBlobStore,
+}
+
+
+def get_blob_store(app=None):
+    """Blob store configured by BLOB_STORE_BACKEND / BLOB_STORE_FOLDER"""
+    app = app or current_app._get_current_object()
+    store = app.extensions.get('blob_store')
+    if store is None:
+        backend = BACKENDS[app.config.get('BLOB_STORE_BACKEND', 'local')]
+        store = app.extensions['blob_store'] = backend(app.config['BLOB_STORE_FOLDER'])
+    return store
+
+
+def guess_image_mimetype(head):
+    for signature, mimetype in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+
+def photo_response(digest, variant=None):
+    """
+    Serve a stored photo (or one of its variants) so browsers cache it for good.
+
+    The ETag is the digest (plus the variant name) and Cache-Control is
+    immutable; conditional requests (If-None-Match) get 304. Returns None
+    when the file is missing from the store.
+    """
+    store = get_blob_store()
+    path = store.variant_path(digest, variant) if variant else store.path(digest)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'rb') as f:
+        mimetype = guess_image_mimetype(f.read(12))
+
+    response = send_file(path, mimetype=mimetype, as_attachment=False, conditional=True,
+                         etag=f'{digest}-{variant}' if variant else digest, max_age=PHOTO_MAX_AGE)
+    # Photos sit behind login; browsers may keep them, shared caches may not
+    response.cache_control.private = True
+    response.cache_control.public = False
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,101 @@
+"""
+Code sequences for generated identifiers.
+
+Item codes (JAR-001), serial units (JAR-001-001) and return batch codes
+(RET-WH001-250101-001) used to be derived from the highest existing code
+(LIKE 'prefix%' ORDER BY code DESC, or loading the day's batches and
+taking max() in Python). Two concurrent requests read the same maximum
+and produced the same code.
+
+Every family now draws numbers from a counter row in code_sequences.
+allocate() reserves N consecutive numbers with one
+UPDATE ... RETURNING (row-locked by PostgreSQL, so allocations never
+overlap) on its own short transaction, like a PostgreSQL sequence: a
+caller that rolls back leaves a gap instead of holding the counter
+locked. The first allocation of a prefix continues after the highest
+code already in the table.
+"""
+
+from datetime import datetime
+from sqlalchemy import BigInteger, cast, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app import db
+from app.models import Category, CodeSequence, Item, ItemDetail, ReturnBatch, Warehouse
+
+
+def allocate(name, count=1, start_after=None):
+    """
+    Reserve `count` consecutive numbers of sequence `name`; returns the first.
+
+    start_after(connection) is only called when the sequence does not
+    exist yet and returns the number to continue after.
+    """
+    if count < 1:
+        raise ValueError('count must be at least 1')
+
+    table = CodeSequence.__table__
+    now = datetime.utcnow()
+    with db.engine.begin() as connection:
+        last = connection.execute(
+            update(table).where(table.c.name == name).values(
+                last_value=table.c.last_value + count, updated_at=now
+            ).returning(table.c.last_value)
+        ).scalar()
+
+        if last is None:
+            initial = start_after(connection) if start_after else 0
+            stmt = pg_insert(table).values(
+                name=name, last_value=initial + count, created_at=now, updated_at=now
+            )
+            # A concurrent first allocation may have created the row meanwhile
+            last = connection.execute(stmt.on_conflict_do_update(
+                index_elements=['name'],
+                set_={'last_value': table.c.last_value + count, 'updated_at': now}
+            ).returning(table.c.last_value)).scalar_one()
+
+    return last - count + 1
+
+
+def _max_suffix(column, prefix):
+    """start_after() for codes '<prefix><digits>': the highest existing number"""
+    def start_after(connection):
+        suffix = func.substr(column, len(prefix) + 1)
+        return connection.execute(
+            select(func.max(cast(suffix, BigInteger))).where(
+                column.startswith(prefix, autoescape=True),
+                suffix.op('~')('^[0-9]+$')
+            )
+        ).scalar() or 0
+    return start_after
+
+
+def generate_item_code(category_id):
+    """Generate item code based on category code (PREFIX-001)"""
+    category = db.session.get(Category, category_id) if category_id else None
+    if not category or not category.code:
+        # Fallback if category has no code
+        return f"NEW-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+
+    prefix = category.code.upper()
+    number = allocate(f'item_code:{prefix}', start_after=_max_suffix(Item.item_code, f'{prefix}-'))
+    return f"{prefix}-{number:03d}"
+
+
+def allocate_serial_units(item_code, count):
+    """`count` new serial units for an item (ITEMCODE-001, ITEMCODE-002, ...)"""
+    first = allocate(
+        f'serial_unit:{item_code}', count,
+        start_after=_max_suffix(ItemDetail.serial_unit, f'{item_code}-')
+    )
+    return [f"{item_code}-{number:03d}" for number in range(first, first + count)]
+
+
+def generate_return_batch_code(warehouse_id):
+    """Return batch code RET-{WAREHOUSE_CODE}-{YYMMDD}-{SEQUENCE}"""
+    warehouse = db.session.get(Warehouse, warehouse_id) if warehouse_id else None
+    # Use warehouse ID since warehouse model doesn't have a 'code' field
+    warehouse_code = f'WH{warehouse_id:03d}' if warehouse else 'WH000'
+    prefix = f"RET-{warehouse_code}-{datetime.now().strftime('%y%m%d')}-"
+
+    number = allocate(f'return_batch:{prefix}', start_after=_max_suffix(ReturnBatch.batch_code, prefix))
+    return f'{prefix}{number:03d}'
@@ -0,0 +1,286 @@
+"""
+Email outbox and background dispatcher.
+
+Notifications call enqueue_email(), which only inserts an email_outbox
+row, so request latency no longer depends on the mail server. A
+dispatcher thread per process claims pending rows in batches
+(FOR UPDATE SKIP LOCKED, so several processes can run side by side),
+sends them over a pool of reused, authenticated SMTP connections and
+reschedules failures with exponential backoff until EMAIL_MAX_ATTEMPTS.
+Rows left in 'sending' by a crashed process are reclaimed after
+EMAIL_SENDING_TIMEOUT.
+"""
+
+import json
+import logging
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask_mail import Message
+from sqlalchemy import and_, or_, select, update
+from app import db
+from app.models import EmailOutbox
+from app.utils.mail_helper import open_smtp_connection
+
+logger = logging.getLogger(__name__)
+
+_dispatcher = None
+
+
+def enqueue_email(recipients, subject, html, sender=None):
+    """Queue an email for background delivery and wake the dispatcher"""
+    entry = EmailOutbox(
+        recipients=json.dumps(list(recipients)),
+        subject=subject[:255],
+        html=html,
+        sender=sender
+    )
+    db.session.add(entry)
+    db.session.commit()
+
+    if _dispatcher is not None:
+        _dispatcher.wake.set()
+    return entry
+
+
+class SMTPConnectionPool:
+    """
+    Reusable authenticated SMTP connections.
+
+    Idle connections are checked with NOOP before reuse when they have
+    been idle for a while, and closed after MAIL_POOL_IDLE_TIMEOUT since
+    servers drop them anyway.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.check_after = config.get('MAIL_POOL_CHECK_AFTER', 30)
+        self.idle_timeout = config.get('MAIL_POOL_IDLE_TIMEOUT', 120)
+        self._idle = queue.LifoQueue()
+        self.opened = 0  # Connections opened so far (handshakes paid)
+
+    def acquire(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                self.opened += 1
+                return open_smtp_connection(self.config)
+
+            if time.monotonic() - last_used < self.check_after:
+                return conn
+            try:
+                if conn.noop()[0] == 250:
+                    return conn
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self.discard(conn)
+
+    def release(self, conn):
+        self._idle.put((conn, time.monotonic()))
+
+    def discard(self, conn):
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def close_idle(self, all_connections=False):
+        """Close connections idle longer than the idle timeout (or all)"""
+        keep = []
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if all_connections or time.monotonic() - last_used > self.idle_timeout:
+                self.discard(conn)
+            else:
+                keep.append((conn, last_used))
+        for item in reversed(keep):
+            self._idle.put(item)
+
+
+def _is_permanent(error):
+    """5xx replies will not succeed on retry"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+class EmailDispatcher:
+    """Delivers queued emails in the background of one process"""
+
+    def __init__(self, app):
+        self.app = app
+        config = app.config
+        self.batch_size = config.get('EMAIL_BATCH_SIZE', 50)
+        self.interval = config.get('EMAIL_DISPATCH_INTERVAL', 5)
+        self.max_attempts = config.get('EMAIL_MAX_ATTEMPTS', 6)
+        self.retry_base = config.get('EMAIL_RETRY_BASE_SECONDS', 30)
+        self.retry_max = config.get('EMAIL_RETRY_MAX_SECONDS', 3600)
+        self.sending_timeout = config.get('EMAIL_SENDING_TIMEOUT', 600)
+        self.pool = SMTPConnectionPool(config)
+        self.executor = ThreadPoolExecutor(
+            max_workers=config.get('EMAIL_SMTP_POOL_SIZE', 2),
+            thread_name_prefix='smtp'
+        )
+        self.wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='email-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self.wake.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+        self.executor.shutdown(wait=True)
+        self.pool.close_idle(all_connections=True)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            with self.app.app_context():
+                try:
+                    self.drain()
+                except Exception:
+                    logger.exception('Email dispatcher cycle failed')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            self.pool.close_idle()
+
+    def drain(self):
+        """Deliver batches until nothing is due; returns the number of rows handled"""
+        total = 0
+        while not self._stopped.is_set():
+            handled = self.dispatch_once()
+            if not handled:
+                break
+            total += handled
+        return total
+
+    def claim_batch(self):
+        """Mark up to batch_size due rows as 'sending' and return them"""
+        now = datetime.utcnow()
+        due = select(EmailOutbox.id).where(or_(
+            and_(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now),
+            and_(EmailOutbox.status == 'sending',
+                 EmailOutbox.locked_at < now - timedelta(seconds=self.sending_timeout))
+        )).order_by(
+            EmailOutbox.next_attempt_at, EmailOutbox.id
+        ).limit(self.batch_size).with_for_update(skip_locked=True)
+
+        rows = db.session.execute(
+            update(EmailOutbox).where(
+                EmailOutbox.id.in_(due.scalar_subquery())
+            ).values(
+                status='sending', locked_at=now, attempts=EmailOutbox.attempts + 1
+            ).returning(
+                EmailOutbox.id, EmailOutbox.recipients, EmailOutbox.subject,
+                EmailOutbox.html, EmailOutbox.sender, EmailOutbox.attempts
+            ).execution_options(synchronize_session=False)
+        ).all()
+        db.session.commit()
+        return rows
+
+    def _send(self, envelope):
+        """Send one prepared message on a pooled connection (runs in the SMTP pool)"""
+        sender, send_to, body = envelope
+        try:
+            conn = self.pool.acquire()
+        except Exception as e:
+            return e
+        try:
+            conn.sendmail(sender, send_to, body)
+        except smtplib.SMTPRecipientsRefused as e:
+            # Connection is still usable after a refused recipient
+            self.pool.release(conn)
+            return e
+        except Exception as e:
+            self.pool.discard(conn)
+            return e
+        self.pool.release(conn)
+        return None
+
+    def dispatch_once(self):
+        rows = self.claim_batch()
+        if not rows:
+            return 0
+
+        default_sender = self.app.config.get('MAIL_DEFAULT_SENDER')
+        envelopes = []
+        for row in rows:
+            # Built here: Message needs the app context the SMTP threads lack
+            msg = Message(
+                subject=row.subject,
+                recipients=json.loads(row.recipients),
+                html=row.html,
+                sender=row.sender or default_sender
+            )
+            envelopes.append((msg.sender, list(msg.send_to), msg.as_string()))
+
+        errors = list(self.executor.map(self._send, envelopes))
+        self._record_results(rows, errors)
+        return len(rows)
+
+    def _record_results(self, rows, errors):
+        now = datetime.utcnow()
+        sent_ids = [row.id for row, error in zip(rows, errors) if error is None]
+        if sent_ids:
+            db.session.execute(
+                update(EmailOutbox).where(EmailOutbox.id.in_(sent_ids)).values(
+                    status='sent', sent_at=now, locked_at=None, last_error=None
+                ).execution_options(synchronize_session=False)
+            )
+
+        for row, error in zip(rows, errors):
+            if error is None:
+                continue
+            if _is_permanent(error) or row.attempts >= self.max_attempts:
+                values = {'status': 'failed'}
+                logger.error(f'Email {row.id} to {row.recipients} failed permanently: {error}')
+            else:
+                delay = min(self.retry_base * 2 ** (row.attempts - 1), self.retry_max)
+                values = {'status': 'pending', 'next_attempt_at': now + timedelta(seconds=delay)}
+                logger.warning(f'Email {row.id} failed (attempt {row.attempts}), retrying in {delay}s: {error}')
+            db.session.execute(
+                update(EmailOutbox).where(EmailOutbox.id == row.id).values(
+                    locked_at=None, last_error=str(error)[:2000], **values
+                ).execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+
+        if sent_ids:
+            logger.info(f'Sent {len(sent_ids)} queued emails')
+
+
+def init_email_dispatcher(app):
+    """Start the background dispatcher of this process"""
+    import os
+    global _dispatcher
+
+    if os.environ.get('DISABLE_EMAIL_DISPATCHER') == '1' or app.config.get('TESTING'):
+        logger.info('Email dispatcher disabled - queued emails stay in email_outbox')
+        return None
+
+    if _dispatcher is None:
+        _dispatcher = EmailDispatcher(app)
+        _dispatcher.start()
+        logger.info('Email dispatcher started')
+    return _dispatcher
@@ -0,0 +1,276 @@
+"""
+Image pipeline for uploaded photos.
+
+Proof photos used to be read into memory and compressed (LANCZOS resize
+plus a JPEG quality loop) inside the request, holding the GIL and a
+database connection for hundreds of milliseconds per upload, and the
+compression code was copied into two views.
+
+Now spool_photo() streams the upload to a temporary file, checks that
+it really is an image and moves it into the blob store as the original;
+the request only records the digest and returns. process_photo()
+renders the variants in a process pool:
+
+- 'full': at most 1920px, re-encoded to fit 500KB (the old
+  compress_image() rules), fetched on demand;
+- 'md' (480px) and 'sm' (160px) thumbnails for detail and list pages.
+
+A photo is pending until its variants exist; once 'full' is rendered
+its size is recorded as verification_photo_size of the records showing
+the photo. Job state lives in the cache like report jobs, so every web
+worker can answer. Photos stored before this pipeline get their
+variants on first view.
+"""
+
+import functools
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from flask import current_app, send_file
+from PIL import Image
+from sqlalchemy import update
+from app import db, cache
+from app.services.blob_store import (
+    CHUNK_SIZE, LocalBlobStore, get_blob_store, guess_image_mimetype, photo_response
+)
+
+logger = logging.getLogger(__name__)
+
+# Rendered largest first; each smaller variant is resized from the previous one
+VARIANTS = {
+    'full': {'max_dimension': 1920, 'quality': 85, 'max_size_kb': 500},
+    'md': {'max_dimension': 480, 'quality': 80},
+    'sm': {'max_dimension': 160, 'quality': 75},
+}
+
+ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'webp'}
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}  # As detected by Pillow
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024  # 10MB limit
+
+JOB_KEY_PREFIX = 'image_job:'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class UploadError(ValueError):
+    """Rejected upload; the message is shown to the user"""
+
+
+def _check_image(path):
+    """Raise UploadError unless the file is an image in one of ALLOWED_FORMATS"""
+    with open(path, 'rb') as f:
+        head = f.read(12)
+    if guess_image_mimetype(head) == 'application/octet-stream':
+        raise UploadError('File bukan gambar yang valid.')
+    try:
+        # verify() parses the whole file without decoding the pixels
+        with Image.open(path) as img:
+            image_format = img.format
+            img.verify()
+    except Exception:
+        raise UploadError('File gambar rusak atau tidak dapat dibaca.')
+    if image_format not in ALLOWED_FORMATS:
+        raise UploadError('Format file tidak didukung. Gunakan JPG, PNG, GIF, atau WebP.')
+
+
+def spool_photo(file_storage, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Stream an uploaded photo into the blob store.
+
+    Returns the digest of the original. Raises UploadError for missing,
+    oversized or unsupported files and for files that are not images.
+    """
+    filename = (file_storage.filename or '').lower() if file_storage else ''
+    if not filename:
+        raise UploadError('Harap upload foto sebagai bukti penerimaan.')
+    if not any(filename.endswith('.' + ext) for ext in ALLOWED_EXTENSIONS):
+        raise UploadError('Format file tidak didukung. Gunakan JPG, PNG, GIF, atau WebP.')
+
+    store = get_blob_store()
+    fd, tmp_path = tempfile.mkstemp(dir=store.spool_dir(), prefix='upload-')
+    try:
+        size = 0
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: file_storage.stream.read(CHUNK_SIZE), b''):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadError(f'Ukuran file terlalu besar. Maksimal {max_bytes // (1024 * 1024)}MB.')
+                f.write(chunk)
+        if not size:
+            raise UploadError('File foto kosong.')
+        _check_image(tmp_path)
+        digest, _ = store.put_file(tmp_path)
+        return digest
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _to_rgb(img):
+    """Flatten transparency onto white (JPEG has no alpha channel)"""
+    if img.mode in ('RGBA', 'LA', 'P'):
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        return background
+    return img if img.mode == 'RGB' else img.convert('RGB')
+
+
+def _encode_jpeg(img, quality, max_size_kb=None, min_quality=50):
+    """JPEG bytes; with max_size_kb the quality is lowered in steps of 5 until it fits"""
+    output = BytesIO()
+    img.save(output, format='JPEG', quality=quality, optimize=True)
+    while max_size_kb and output.tell() > max_size_kb * 1024 and quality > min_quality:
+        quality -= 5
+        output = BytesIO()
+        img.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def render_variants(root, digest, variants=VARIANTS):
+    """
+    Render the variants of blob `digest` (runs in a worker process).
+
+    'full' is written last, so once it exists every variant does.
+    Returns {variant: size in bytes}.
+    """
+    store = LocalBlobStore(root)
+    rendered = {}
+    with Image.open(store.path(digest)) as source:
+        largest = max(spec['max_dimension'] for spec in variants.values())
+        source.draft('RGB', (largest, largest))  # JPEG: decode at reduced scale when possible
+        img = _to_rgb(source)
+
+        for name, spec in sorted(variants.items(), key=lambda v: -v[1]['max_dimension']):
+            img.thumbnail((spec['max_dimension'], spec['max_dimension']), Image.Resampling.LANCZOS)
+            rendered[name] = _encode_jpeg(img, spec['quality'], spec.get('max_size_kb'))
+
+    for name in sorted(rendered, key=lambda n: n == 'full'):
+        store.put_variant(digest, name, rendered[name])
+    return {name: len(data) for name, data in rendered.items()}
+
+
+def _get_executor(app):
+    """Process-wide worker pool, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: never fork a process that runs scheduler/dispatcher threads
+            _executor = ProcessPoolExecutor(
+                max_workers=app.config.get('IMAGE_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+    return _executor
+
+
+def photo_status(digest):
+    """'ready', 'pending', 'failed' or 'missing' (variants never requested)"""
+    if get_blob_store().has_variant(digest, 'full'):
+        return 'ready'
+    state = cache.get(JOB_KEY_PREFIX + digest)
+    return state['status'] if state else 'missing'
+
+
+def process_photo(digest):
+    """Render the variants of a stored photo unless done or in flight; returns the status"""
+    status = photo_status(digest)
+    if status == 'ready':
+        return status
+
+    key = JOB_KEY_PREFIX + digest
+    timeout = current_app.config.get('IMAGE_JOB_TIMEOUT', 3600)
+    state = {'status': 'pending', 'queued_at': time.time()}
+
+    # cache.add is atomic, so concurrent requests queue one render only
+    if not cache.add(key, state, timeout=timeout):
+        existing = cache.get(key)
+        stale_after = current_app.config.get('IMAGE_JOB_STALE_AFTER', 300)
+        if existing and (existing['status'] == 'failed' or time.time() - existing['queued_at'] < stale_after):
+            return existing['status']
+        cache.set(key, state, timeout=timeout)
+
+    app = current_app._get_current_object()
+    future = _get_executor(app).submit(render_variants, get_blob_store(app).root, digest)
+    future.add_done_callback(functools.partial(_render_finished, app, digest))
+    return 'pending'
+
+
+def _record_photo_size(digest, size):
+    """Set verification_photo_size of the records showing photo `digest`"""
+    from app.models import AssetRequest, Distribution, DistributionGroup
+
+    for model in (AssetRequest, Distribution, DistributionGroup):
+        db.session.execute(update(model).where(
+            model.verification_photo_sha256 == digest
+        ).values(
+            verification_photo_size=size,
+            updated_at=model.updated_at  # Metadata only, not a change of the record
+        ))
+    db.session.commit()
+
+
+def _render_finished(app, digest, future):
+    with app.app_context():
+        error = future.exception()
+        if error is None:
+            cache.delete(JOB_KEY_PREFIX + digest)
+            sizes = future.result()
+            logger.info(f'Photo {digest[:12]} variants rendered: {sizes}')
+            try:
+                _record_photo_size(digest, sizes['full'])
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f'Photo {digest[:12]} size could not be recorded: {e}')
+            finally:
+                db.session.remove()
+        else:
+            logger.error(f'Photo {digest[:12]} could not be processed: {error}')
+            cache.set(JOB_KEY_PREFIX + digest,
+                      {'status': 'failed', 'queued_at': time.time(), 'error': str(error)},
+                      timeout=app.config.get('IMAGE_JOB_TIMEOUT', 3600))
+
+
+def photo_variant_response(digest, variant='full'):
+    """
+    Serve a rendered variant of a photo (see blob_store.photo_response).
+
+    Returns None while the variant does not exist yet, after queueing
+    its rendering when needed.
+    """
+    if variant not in VARIANTS:
+        variant = 'full'
+    response = photo_response(digest, variant)
+    if response is None:
+        process_photo(digest)
+    return response
+
+
+PLACEHOLDER_SVG = '''<?xml version="1.0" encoding="UTF-8"?>
+<svg width="400" height="300" xmlns="http://www.w3.org/2000/svg">
+    <rect width="400" height="300" fill="#f3f4f6"/>
+    <text x="200" y="140" font-family="Arial, sans-serif" font-size="16" fill="#9ca3af" text-anchor="middle">
+        <tspan x="200" dy="0">{title}</tspan>
+        <tspan x="200" dy="25" font-size="14">{subtitle}</tspan>
+    </text>
+    <rect x="150" y="160" width="100" height="100" fill="none" stroke="#d1d5db" stroke-width="2" rx="8"/>
+    <text x="200" y="220" font-family="Arial, sans-serif" font-size="40" fill="#d1d5db" text-anchor="middle">📷</text>
+</svg>'''
+
+
+def placeholder_response(pending=False):
+    """Placeholder image for photos that are missing or still being processed (never cached)"""
+    if pending:
+        svg = PLACEHOLDER_SVG.format(title='Foto sedang diproses', subtitle='Photo is being processed')
+    else:
+        svg = PLACEHOLDER_SVG.format(title='Foto tidak tersedia', subtitle='No proof photo uploaded')
+    response = send_file(BytesIO(svg.encode('utf-8')), mimetype='image/svg+xml', as_attachment=False)
+    response.cache_control.no_store = True
+    return response
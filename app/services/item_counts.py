@@ -0,0 +1,76 @@
+"""
+Batched status counters for Item list pages.
+
+Item.total_stock and the Item.*_details properties each run their own
+query, so a list page rendering those columns costs several queries per
+row. load_item_counts() computes the per-status serial counts and stock
+sums of a whole page of items in one statement and attaches them to the
+instances; the properties then read the attached values instead of
+querying. The attached values are a snapshot taken when the page was
+loaded.
+"""
+
+from sqlalchemy import func, literal, select, union_all
+from app import db
+from app.models import ItemDetail, Stock
+
+# Status key used for the stock sum rows of the combined statement
+STOCK_KEY = '__stock__'
+
+
+def load_item_counts(items):
+    """
+    Attach status counts and stock totals to a page of items.
+
+    Runs one GROUP BY item_id, status statement (unioned with the stock
+    sums per item) for all items that have not been loaded yet. Returns
+    the items so the call can wrap a query result.
+    """
+    pending = {item.id: item for item in items if item._status_counts is None}
+    if not pending:
+        return items
+
+    ids = list(pending)
+    detail_counts = select(
+        ItemDetail.item_id,
+        ItemDetail.status,
+        func.count(ItemDetail.id)
+    ).where(
+        ItemDetail.item_id.in_(ids)
+    ).group_by(ItemDetail.item_id, ItemDetail.status)
+
+    stock_sums = select(
+        Stock.item_id,
+        literal(STOCK_KEY),
+        func.coalesce(func.sum(Stock.quantity), 0)
+    ).where(
+        Stock.item_id.in_(ids)
+    ).group_by(Stock.item_id)
+
+    counts = {item_id: {} for item_id in ids}
+    stock = dict.fromkeys(ids, 0)
+    for item_id, status, value in db.session.execute(union_all(detail_counts, stock_sums)):
+        if status == STOCK_KEY:
+            stock[item_id] = int(value)
+        else:
+            counts[item_id][status] = int(value)
+
+    for item_id, item in pending.items():
+        item._status_counts = counts[item_id]
+        item._stock_total = stock[item_id]
+
+    return items
+
+
+def serialize_item(item):
+    """JSON representation of an Item with its stock and status counts"""
+    data = item.to_dict()
+    data['total_stock'] = item.total_stock
+    data['total_details'] = item.total_details
+    data['available_details'] = item.available_details
+    data['used_details'] = item.used_details
+    data['in_unit_details'] = item.in_unit_details
+    data['processing_details'] = item.processing_details
+    data['maintenance_details'] = item.maintenance_details
+    data['returned_details'] = item.returned_details
+    return data
@@ -0,0 +1,100 @@
+"""
+Filtered, keyset-paginated listing of an item's serial numbers.
+
+Shared by the items.details page and /api/items/<id>/item-details. Every
+filter (status, warehouse/unit location, serial substring) is applied in
+SQL; the serial search uses the pg_trgm index on
+item_details.serial_number and the unit filter joins distributions.
+"""
+
+from app import db
+from app.models import ItemDetail, Distribution
+
+# Page size of the serial number list
+ITEM_DETAILS_PAGE_SIZE = 50
+
+
+def _escape_like(value):
+    """Escape LIKE wildcards so user input is matched literally"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def parse_location(value):
+    """
+    Parse a 'warehouse:<id>' / 'unit:<id>' location filter.
+
+    Returns (type, id) or (None, None) for empty or malformed values.
+    """
+    if not value or ':' not in value:
+        return None, None
+    filter_type, filter_id = value.split(':', 1)
+    if filter_type not in ('warehouse', 'unit'):
+        return None, None
+    try:
+        return filter_type, int(filter_id)
+    except ValueError:
+        return None, None
+
+
+def item_details_query(item_id, status=None, location=None, search=None):
+    """
+    Build the filtered ItemDetail query for an item.
+
+    Warehouse, distribution, unit and room are eager loaded so rendering
+    a page costs no extra queries.
+    """
+    query = ItemDetail.query.filter(ItemDetail.item_id == item_id)
+
+    if status:
+        if status == 'used_in_unit':
+            # Gabungkan status 'used' dan 'in_unit'
+            query = query.filter(ItemDetail.status.in_(['used', 'in_unit']))
+        else:
+            query = query.filter(ItemDetail.status == status)
+
+    location_type, location_id = parse_location(location)
+    if location_type == 'warehouse':
+        query = query.filter(ItemDetail.warehouse_id == location_id)
+    elif location_type == 'unit':
+        # item_detail_id is unique on distributions, so the join never duplicates rows
+        query = query.join(
+            Distribution, Distribution.item_detail_id == ItemDetail.id
+        ).filter(Distribution.unit_id == location_id)
+
+    if search:
+        query = query.filter(
+            ItemDetail.serial_number.ilike(f'%{_escape_like(search)}%', escape='\\')
+        )
+
+    return query.options(
+        db.joinedload(ItemDetail.warehouse),
+        db.joinedload(ItemDetail.distribution).joinedload(Distribution.unit),
+        db.joinedload(ItemDetail.distribution).joinedload(Distribution.unit_detail),
+    )
+
+
+def item_details_page(query, after=None, per_page=ITEM_DETAILS_PAGE_SIZE):
+    """
+    Keyset-paginate an ItemDetail query by id.
+
+    Returns (details, next_after); next_after is None on the last page.
+    """
+    if after:
+        query = query.filter(ItemDetail.id > after)
+
+    details = query.order_by(ItemDetail.id).limit(per_page + 1).all()
+    next_after = details[per_page - 1].id if len(details) > per_page else None
+    return details[:per_page], next_after
+
+
+def serialize_item_detail(detail):
+    """JSON representation of an ItemDetail with its location names"""
+    data = detail.to_dict()
+    distribution = detail.distribution
+    data['warehouse_name'] = detail.warehouse.name if detail.warehouse else None
+    data['unit_name'] = detail.unit_name
+    data['room_name'] = (
+        distribution.unit_detail.room_name
+        if distribution and distribution.unit_detail else None
+    )
+    return data
@@ -0,0 +1,326 @@
+"""
+Map feature engine for the /api/map endpoints.
+
+Each layer is turned into GeoJSON features by a single SQL statement:
+PostGIS builds every Feature with json_build_object/ST_AsGeoJSON, related
+names (item, serial number) are joined in the same statement, and the
+rows are streamed to the response as raw JSON text instead of being
+decoded into Python objects and re-encoded by jsonify.
+
+Every layer can be bounded to a viewport (bbox or XYZ tile); the envelope
+filter is served by the GiST indexes on the geometry columns, and at low
+zoom levels points are clustered on a grid so the payload size follows
+the viewport rather than the size of the inventory.
+"""
+
+import math
+from geoalchemy2 import Geography
+from sqlalchemy import func, literal, cast, case, Text, JSON
+from app import db
+from app.models import Warehouse, Unit, Distribution, ItemDetail, Item, Building
+
+# Points are clustered server-side below this zoom level
+CLUSTER_MAX_ZOOM = 15
+
+# Number of cluster grid cells along one side of a 256px tile (~64px cells)
+CLUSTER_CELLS_PER_TILE = 4
+
+# Upper bound for the number of nearby results per layer
+NEARBY_MAX_LIMIT = 100
+
+
+def _feature(geom, properties):
+    """Build a GeoJSON Feature expression for one row"""
+    return func.json_build_object(
+        'type', 'Feature',
+        'geometry', func.ST_AsGeoJSON(geom).cast(JSON),
+        'properties', func.json_build_object(*properties)
+    )
+
+
+def _point_properties(geom):
+    """Latitude/longitude properties shared by every point layer"""
+    return (
+        'latitude', func.ST_Y(geom),
+        'longitude', func.ST_X(geom),
+    )
+
+
+def _finish_layer(stmt, geom, layer, properties, order_by, layer_key, envelope, zoom):
+    """
+    Turn a layer's base statement into its final feature statement.
+
+    The viewport envelope is applied as an index-assisted ST_Intersects
+    filter; below CLUSTER_MAX_ZOOM the points are grid-clustered instead
+    of being returned one by one.
+    """
+    if envelope is not None:
+        stmt = stmt.where(func.ST_Intersects(geom, envelope))
+
+    if zoom is not None and zoom < CLUSTER_MAX_ZOOM:
+        return cluster_features_query(
+            stmt.with_only_columns(
+                geom.label('geom'), _feature(geom, properties).cast(Text).label('feature')
+            ), layer, zoom, layer_key
+        )
+
+    return stmt.with_only_columns(
+        _feature(geom, properties).cast(Text)
+    ).order_by(order_by)
+
+
+def warehouse_features_query(layer_key='type', envelope=None, zoom=None):
+    """Select one GeoJSON feature (as text) per warehouse with a geometry"""
+    properties = (
+        'id', Warehouse.id,
+        'name', Warehouse.name,
+        'address', Warehouse.address,
+        layer_key, literal('warehouse'),
+    ) + _point_properties(Warehouse.geom)
+
+    stmt = db.select(Warehouse.id).where(Warehouse.geom.isnot(None))
+
+    return _finish_layer(stmt, Warehouse.geom, 'warehouse', properties,
+                         Warehouse.id, layer_key, envelope, zoom)
+
+
+def unit_features_query(layer_key='type', envelope=None, zoom=None):
+    """Select one GeoJSON feature (as text) per unit with a geometry"""
+    properties = (
+        'id', Unit.id,
+        'name', Unit.name,
+        'address', Unit.address,
+        layer_key, literal('unit'),
+    ) + _point_properties(Unit.geom)
+
+    stmt = db.select(Unit.id).where(Unit.geom.isnot(None))
+
+    return _finish_layer(stmt, Unit.geom, 'unit', properties,
+                         Unit.id, layer_key, envelope, zoom)
+
+
+def distribution_features_query(user, layer_key='type', envelope=None, zoom=None):
+    """
+    Select one GeoJSON feature (as text) per distribution visible to the user.
+
+    Item and serial names are outer-joined in the same statement so no
+    per-row lazy loading happens.
+    """
+    from app.utils.helpers import get_user_warehouse_id
+
+    properties = (
+        'id', Distribution.id,
+        'serial_number', ItemDetail.serial_number,
+        'item_name', Item.name,
+        'status', Distribution.status,
+        'address', Distribution.address,
+        layer_key, literal('distribution'),
+    ) + _point_properties(Distribution.geom)
+
+    stmt = db.select(
+        Distribution.id
+    ).select_from(
+        Distribution
+    ).outerjoin(
+        ItemDetail, Distribution.item_detail_id == ItemDetail.id
+    ).outerjoin(
+        Item, ItemDetail.item_id == Item.id
+    ).where(
+        Distribution.geom.isnot(None)
+    )
+
+    # Filter by user role (admin and other roles see every distribution)
+    if user.is_warehouse_staff():
+        stmt = stmt.where(Distribution.warehouse_id == get_user_warehouse_id(user))
+    elif user.is_field_staff():
+        stmt = stmt.where(Distribution.field_staff_id == user.id)
+
+    return _finish_layer(stmt, Distribution.geom, 'distribution', properties,
+                         Distribution.id, layer_key, envelope, zoom)
+
+
+def cluster_cell_size(zoom):
+    """Grid cell size in degrees used to cluster points at a zoom level"""
+    return 360.0 / (2 ** zoom) / CLUSTER_CELLS_PER_TILE
+
+
+def cluster_features_query(points_stmt, layer, zoom, layer_key='type'):
+    """
+    Group the points selected by ``points_stmt`` (a ``geom`` column and the
+    point's own ``feature`` as text) into grid cells and select one feature
+    per non-empty cell.
+
+    A cell holding several points becomes a cluster feature with
+    ``cluster: true`` and ``point_count`` at the centroid of its points;
+    a cell holding one point keeps that point's own feature (id, name,
+    popup properties).
+    """
+    points = points_stmt.subquery()
+    cell = func.ST_SnapToGrid(points.c.geom, cluster_cell_size(zoom))
+    center = func.ST_Centroid(func.ST_Collect(points.c.geom))
+
+    properties = (
+        'cluster', literal(True),
+        'point_count', func.count(),
+        layer_key, literal(layer),
+    ) + _point_properties(center)
+
+    return db.select(
+        case(
+            (func.count() == 1, func.min(points.c.feature)),
+            else_=_feature(center, properties).cast(Text)
+        )
+    ).group_by(cell)
+
+
+def tile_bounds(z, x, y):
+    """
+    Return (min_lng, min_lat, max_lng, max_lat) of a Web Mercator XYZ tile.
+
+    Raises ValueError for coordinates outside the tile grid.
+    """
+    n = 2 ** z
+    if z < 0 or not (0 <= x < n) or not (0 <= y < n):
+        raise ValueError('Invalid tile coordinates')
+
+    def tile_lat(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return (x / n * 360.0 - 180.0, tile_lat(y + 1), (x + 1) / n * 360.0 - 180.0, tile_lat(y))
+
+
+def parse_bbox(value):
+    """
+    Parse a Leaflet ``toBBoxString()`` value: "min_lng,min_lat,max_lng,max_lat".
+
+    Raises ValueError if the value is malformed.
+    """
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError('bbox must have 4 comma separated values')
+    min_lng, min_lat, max_lng, max_lat = parts
+    if min_lng > max_lng or min_lat > max_lat:
+        raise ValueError('bbox minimum is greater than maximum')
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def make_envelope(bounds):
+    """Build an SRID 4326 envelope expression from (min_lng, min_lat, max_lng, max_lat)"""
+    return func.ST_MakeEnvelope(*bounds, 4326)
+
+
+def iter_feature_rows(stmt, chunk_size=1000):
+    """Yield feature JSON strings from a server-side cursor"""
+    result = db.session.execute(
+        stmt.execution_options(stream_results=True, yield_per=chunk_size)
+    )
+    for (feature_json,) in result:
+        yield feature_json
+
+
+def stream_feature_collection(*statements, flush_every=500):
+    """
+    Stream a FeatureCollection built from one or more feature statements.
+
+    Statements are executed one after another; features are written out in
+    chunks of ``flush_every`` so the full collection never has to exist in
+    memory.
+    """
+    yield '{"type":"FeatureCollection","features":['
+    buffer = []
+    first = True
+    for stmt in statements:
+        for feature_json in iter_feature_rows(stmt):
+            if first:
+                first = False
+                buffer.append(feature_json)
+            else:
+                buffer.append(',' + feature_json)
+            if len(buffer) >= flush_every:
+                yield ''.join(buffer)
+                buffer = []
+    buffer.append(']}')
+    yield ''.join(buffer)
+
+
+def _nearby_layer(geom, columns, point, radius_m, limit, joins=(), clause=None):
+    """
+    Select rows of one layer within radius_m of point, nearest first.
+
+    ST_DWithin on geography and the ``<->`` KNN ordering are both served by
+    the GiST index on ``(geom::geography)``, so only the nearest ``limit``
+    candidates are read from the index instead of scanning the table.
+    """
+    geog = cast(geom, Geography)
+    stmt = db.select(
+        *columns,
+        func.ST_Distance(geog, point).label('distance_m')
+    ).select_from(geom.class_)
+    for target, onclause in joins:
+        stmt = stmt.outerjoin(target, onclause)
+    stmt = stmt.where(
+        geom.isnot(None),
+        func.ST_DWithin(geog, point, radius_m)
+    )
+    if clause is not None:
+        stmt = stmt.where(clause)
+    return stmt.order_by(geog.op('<->')(point)).limit(limit)
+
+
+def nearby_features(latitude, longitude, radius_km, limit, user):
+    """
+    Find the nearest warehouses, units, distributions (with the item
+    installed there) and buildings around a point.
+
+    Returns a dict of layer name -> list of result dicts sorted by distance.
+    """
+    from app.utils.helpers import get_user_warehouse_id
+
+    point = cast(func.ST_SetSRID(func.ST_MakePoint(longitude, latitude), 4326), Geography)
+    radius_m = radius_km * 1000
+    limit = max(1, min(limit, NEARBY_MAX_LIMIT))
+
+    if user.is_admin():
+        distribution_clause = None
+    elif user.is_warehouse_staff():
+        distribution_clause = Distribution.warehouse_id == get_user_warehouse_id(user)
+    else:
+        distribution_clause = Distribution.field_staff_id == user.id
+
+    layers = {
+        'warehouses': _nearby_layer(
+            Warehouse.geom, [Warehouse.id, Warehouse.name, Warehouse.address],
+            point, radius_m, limit
+        ),
+        'units': _nearby_layer(
+            Unit.geom, [Unit.id, Unit.name, Unit.address],
+            point, radius_m, limit
+        ),
+        'distributions': _nearby_layer(
+            Distribution.geom,
+            [Distribution.id, Distribution.status, Distribution.address,
+             ItemDetail.serial_number, Item.name.label('item_name')],
+            point, radius_m, limit,
+            joins=(
+                (ItemDetail, Distribution.item_detail_id == ItemDetail.id),
+                (Item, ItemDetail.item_id == Item.id),
+            ),
+            clause=distribution_clause
+        ),
+        'buildings': _nearby_layer(
+            Building.geom, [Building.id, Building.code, Building.name, Building.address],
+            point, radius_m, limit
+        ),
+    }
+
+    results = {}
+    for name, stmt in layers.items():
+        rows = db.session.execute(stmt).mappings().all()
+        results[name] = [
+            {
+                **{key: value for key, value in row.items() if key != 'distance_m'},
+                'distance_km': round(row['distance_m'] / 1000, 4)
+            }
+            for row in rows
+        ]
+    return results
@@ -0,0 +1,155 @@
+"""
+Mapbox Vector Tile (MVT) rendering for the map layers.
+
+Tiles are produced by PostGIS (ST_AsMVTGeom + ST_AsMVT) in one statement
+per tile and cached as raw protobuf bytes. Cache keys embed a per-layer
+version token derived from the cache tags (app/utils/cache_helpers.py)
+of the tables the layer is rendered from. Tags are bumped after the
+writing transaction commits, so unchanged tiles keep being served from
+cache and a tile rendered from pre-commit rows is never cached under
+the new version.
+"""
+
+import hashlib
+from flask import current_app
+from sqlalchemy import func, literal_column
+from app import db, cache
+from app.models import Warehouse, Unit, Distribution, ItemDetail, Item, Building
+from app.services.map_features import tile_bounds, make_envelope
+
+# Highest zoom level served by the tile endpoint
+MAX_TILE_ZOOM = 22
+
+# Layers served by the tile endpoint
+TILE_LAYERS = ('warehouses', 'units', 'distributions', 'buildings')
+
+# MVT extent and buffer (PostGIS defaults)
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+
+
+# Tables each layer's geometry and attributes come from (cache tags).
+# Item names and serial numbers are attributes of the distributions layer.
+LAYER_TAGS = {
+    'warehouses': ('warehouses',),
+    'units': ('units',),
+    'distributions': ('distributions', 'item_details', 'items'),
+    'buildings': ('buildings',),
+}
+
+
+def get_layer_version(layer):
+    """Get the current version token of a tile layer (changes when one of its tags is bumped)"""
+    from app.utils.cache_helpers import get_tag_versions
+
+    versions = sorted(get_tag_versions(LAYER_TAGS[layer]).items())
+    return hashlib.sha1(repr(versions).encode('utf-8')).hexdigest()[:16]
+
+
+def bump_layer_version(layer):
+    """Invalidate the tiles of a layer (committed writes already do this)"""
+    from app.utils.cache_helpers import invalidate_tags
+    invalidate_tags(*LAYER_TAGS[layer])
+
+
+def _distribution_scope(user):
+    """Return (cache scope key, extra WHERE clause) for the distributions layer"""
+    from app.utils.helpers import get_user_warehouse_id
+
+    if user.is_warehouse_staff():
+        warehouse_id = get_user_warehouse_id(user)
+        return f"w{warehouse_id}", Distribution.warehouse_id == warehouse_id
+    if user.is_field_staff():
+        return f"f{user.id}", Distribution.field_staff_id == user.id
+    # Admin and other roles see every distribution
+    return 'all', None
+
+
+def _layer_source(layer, user):
+    """
+    Describe a tile layer.
+
+    Returns (geom column, property columns, joins, scope key, extra filter).
+    """
+    if layer == 'warehouses':
+        return Warehouse.geom, [Warehouse.id, Warehouse.name], [], 'all', None
+
+    if layer == 'units':
+        return Unit.geom, [Unit.id, Unit.name, Unit.status], [], 'all', None
+
+    if layer == 'buildings':
+        columns = [Building.id, Building.code, Building.name, Building.floor_count]
+        return Building.zone_geom, columns, [], 'all', None
+
+    if layer == 'distributions':
+        columns = [
+            Distribution.id,
+            Distribution.status,
+            ItemDetail.serial_number,
+            Item.name.label('item_name'),
+        ]
+        joins = [
+            (ItemDetail, Distribution.item_detail_id == ItemDetail.id),
+            (Item, ItemDetail.item_id == Item.id),
+        ]
+        scope, clause = _distribution_scope(user)
+        return Distribution.geom, columns, joins, scope, clause
+
+    raise ValueError(f"Unknown tile layer: {layer}")
+
+
+def tile_query(layer, z, x, y, user):
+    """
+    Build the single statement that renders one MVT tile for a layer.
+
+    Returns (statement, scope key).
+    """
+    geom, columns, joins, scope, clause = _layer_source(layer, user)
+
+    tile_envelope = func.ST_TileEnvelope(z, x, y)
+    mvt_geom = func.ST_AsMVTGeom(
+        func.ST_Transform(geom, 3857), tile_envelope, TILE_EXTENT, TILE_BUFFER
+    ).label('geom')
+
+    rows = db.select(mvt_geom, *columns).select_from(geom.class_)
+    for target, onclause in joins:
+        rows = rows.outerjoin(target, onclause)
+    rows = rows.where(
+        geom.isnot(None),
+        # Index-assisted prefilter in the column's own SRID
+        func.ST_Intersects(geom, make_envelope(tile_bounds(z, x, y)))
+    )
+    if clause is not None:
+        rows = rows.where(clause)
+
+    tile = rows.subquery('tile')
+    stmt = db.select(
+        func.ST_AsMVT(literal_column('tile.*'), layer, TILE_EXTENT, 'geom')
+    ).select_from(tile)
+
+    return stmt, scope
+
+
+def render_tile(layer, z, x, y, user):
+    """
+    Return (tile bytes, version token, scope key) for a tile, serving it
+    from cache when the layer has not changed since it was rendered.
+
+    Raises ValueError for unknown layers or invalid tile coordinates.
+    """
+    if layer not in TILE_LAYERS:
+        raise ValueError(f"Unknown tile layer: {layer}")
+    if z > MAX_TILE_ZOOM:
+        raise ValueError('Zoom level too high')
+    tile_bounds(z, x, y)  # validates x/y against z
+
+    stmt, scope = tile_query(layer, z, x, y, user)
+    version = get_layer_version(layer)
+    cache_key = f"map_tile_{layer}_{scope}_{version}_{z}_{x}_{y}"
+
+    data = cache.get(cache_key)
+    if data is None:
+        data = bytes(db.session.execute(stmt).scalar() or b'')
+        cache.set(cache_key, data, timeout=current_app.config.get('MAP_TILE_CACHE_TIMEOUT', 3600))
+
+    return data, version, scope
@@ -0,0 +1,151 @@
+"""
+Notification badge counts for the sidebar.
+
+All badge counts for a user are computed by one statement per role,
+memoized on flask.g for the rest of the request and cached per user.
+Cached entries are keyed by the cache tags of the tables the badges are
+computed from (app/utils/cache_helpers.py), which are bumped after any
+commit touching them, so badges are never stale for longer than one
+commit.
+"""
+
+from flask import g, current_app
+from sqlalchemy import func, select
+from app import db, cache
+from app.models import AssetRequest, Procurement, DistributionGroup, Distribution
+from app.services.access_scope import get_access_scope
+from app.utils.cache_helpers import tagged_key
+
+# Safety net TTL; invalidation is event driven
+NOTIFICATION_COUNTS_TIMEOUT = 300
+
+# Tables the badges are computed from (the user tables decide the role and scope)
+NOTIFICATION_TAGS = ('asset_requests', 'procurements', 'distribution_groups',
+                     'distributions', 'users', 'user_warehouses', 'user_units')
+
+EMPTY_COUNTS = {
+    'pending_request_count': 0,
+    'verified_request_count': 0,
+    'draft_distribution_count': 0,
+    'pending_distribution_count': 0,
+    'pending_procurement_count': 0
+}
+
+
+def _count(model, *criteria):
+    """Scalar COUNT(*) subquery over model"""
+    return select(func.count()).select_from(model).where(*criteria).scalar_subquery()
+
+
+def _admin_counts(user):
+    """Admin: pending requests, pending procurements, draft batches"""
+    row = db.session.execute(select(
+        _count(AssetRequest, AssetRequest.status == 'pending'),
+        _count(Procurement, Procurement.status == 'pending'),
+        _count(DistributionGroup, DistributionGroup.is_draft == True)
+    )).one()
+
+    return {
+        **EMPTY_COUNTS,
+        'pending_request_count': row[0],
+        'pending_procurement_count': row[1],
+        'draft_distribution_count': row[2],
+    }
+
+
+def _warehouse_staff_counts(user):
+    """Warehouse staff: draft batches of their warehouse, approved procurements"""
+    warehouse_id = get_access_scope(user).warehouse_id
+
+    # If no warehouse assigned, no notifications
+    if warehouse_id is None:
+        return dict(EMPTY_COUNTS)
+
+    row = db.session.execute(select(
+        _count(DistributionGroup,
+               DistributionGroup.warehouse_id == warehouse_id,
+               DistributionGroup.is_draft == True),
+        _count(Procurement, Procurement.status == 'approved')
+    )).one()
+
+    return {
+        **EMPTY_COUNTS,
+        'draft_distribution_count': row[0],
+        'pending_procurement_count': row[1],
+    }
+
+
+def _unit_staff_counts(user):
+    """Unit staff: pending/verified requests and batches ready to be received"""
+    unit_ids = list(get_access_scope(user).unit_ids)
+
+    requests = select(
+        func.count().filter(AssetRequest.status == 'pending').label('pending'),
+        func.count().filter(AssetRequest.status == 'verified').label('verified')
+    ).where(
+        AssetRequest.unit_id.in_(unit_ids),
+        AssetRequest.status.in_(['pending', 'verified'])
+    ).subquery()
+
+    # Approved batches with at least one delivery still waiting for the unit
+    ready_batches = select(
+        func.count(func.distinct(DistributionGroup.id))
+    ).join(
+        Distribution, Distribution.distribution_group_id == DistributionGroup.id
+    ).where(
+        DistributionGroup.is_draft == False,
+        DistributionGroup.status == 'approved',
+        Distribution.unit_id.in_(unit_ids),
+        Distribution.verification_status == 'pending',
+        Distribution.status.in_(['installing', 'in_transit'])
+    ).scalar_subquery()
+
+    row = db.session.execute(
+        select(requests.c.pending, requests.c.verified, ready_batches)
+    ).one()
+
+    return {
+        **EMPTY_COUNTS,
+        'pending_request_count': row[0],
+        'verified_request_count': row[1],
+        'pending_distribution_count': row[2],
+    }
+
+
+def _compute_counts(user):
+    """Compute badge counts with the single statement for the user's role"""
+    if user.is_admin():
+        return _admin_counts(user)
+    if user.is_warehouse_staff():
+        return _warehouse_staff_counts(user)
+    if user.is_unit_staff():
+        return _unit_staff_counts(user)
+    return dict(EMPTY_COUNTS)
+
+
+def get_notification_counts(user):
+    """
+    Get the sidebar badge counts for a user.
+
+    Memoized per request on flask.g and cached per user across requests.
+    """
+    if not user or not user.is_authenticated:
+        return dict(EMPTY_COUNTS)
+
+    memo = g.get('_notification_counts')
+    if memo is not None:
+        return memo
+
+    cache_key = tagged_key('notification_counts', NOTIFICATION_TAGS, user.id, user.role)
+    counts = cache.get(cache_key)
+    if counts is None:
+        try:
+            counts = _compute_counts(user)
+            cache.set(cache_key, counts, timeout=NOTIFICATION_COUNTS_TIMEOUT)
+        except Exception:
+            current_app.logger.exception('Failed to compute notification counts')
+            counts = dict(EMPTY_COUNTS)
+
+    g._notification_counts = counts
+    return counts
+
@@ -1,6 +1,7 @@
 from flask import render_template, current_app, url_for
-from flask_mail import Message
-from app import mail
+from app import db
+from app.services.email_outbox import enqueue_email
+from app.services.recipient_directory import role_recipients, unit_recipients, user_recipient
 import os
 
 
@@ -22,8 +23,34 @@ def get_distribution_code(distribution):
         return f'DIST-{distribution.id:06d}'
 
 
+def render_email(template, **kwargs):
+    """Render an email template with absolute links"""
+    # Create a simple URL function for templates
+    base_url = get_base_url()
+    def email_url(endpoint, **values):
+        if endpoint == 'procurement.index':
+            return f"{base_url}/procurement/"
+        elif endpoint == 'procurement.detail' and 'id' in values:
+            return f"{base_url}/procurement/{values['id']}"
+        elif endpoint == 'procurement.receive' and 'id' in values:
+            return f"{base_url}/procurement/{values['id']}/receive"
+        elif endpoint == 'stock.index':
+            return f"{base_url}/stock/"
+        elif endpoint == 'distributions.index':
+            return f"{base_url}/distributions/"
+        elif endpoint == 'distributions.detail' and 'id' in values:
+            return f"{base_url}/distributions/{values['id']}"
+        elif endpoint == 'asset_requests.detail' and 'id' in values:
+            return f"{base_url}/asset-requests/{values['id']}"
+        return f"{base_url}/"
+
+    kwargs['url_for'] = email_url
+    kwargs['base_url'] = base_url
+    return render_template(f'emails/{template}.html', **kwargs)
+
+
 def send_email(to, subject, template, **kwargs):
-    """Send email using Flask-Mail
+    """Queue an email for background delivery (see app/services/email_outbox.py)
 
     Args:
         to: Recipient email address
@@ -31,46 +58,14 @@ def send_email(to, subject, template, **kwargs):
         template: Template name (without .html extension)
         **kwargs: Context variables for template
     """
-    try:
-        # Create a simple URL function for templates
-        base_url = get_base_url()
-        def email_url(endpoint, **values):
-            if endpoint == 'procurement.index':
-                return f"{base_url}/procurement/"
-            elif endpoint == 'procurement.detail' and 'id' in values:
-                return f"{base_url}/procurement/{values['id']}"
-            elif endpoint == 'procurement.receive' and 'id' in values:
-                return f"{base_url}/procurement/{values['id']}/receive"
-            elif endpoint == 'stock.index':
-                return f"{base_url}/stock/"
-            elif endpoint == 'distributions.index':
-                return f"{base_url}/distributions/"
-            elif endpoint == 'distributions.detail' and 'id' in values:
-                return f"{base_url}/distributions/{values['id']}"
-            elif endpoint == 'asset_requests.detail' and 'id' in values:
-                return f"{base_url}/asset-requests/{values['id']}"
-            return f"{base_url}/"
-
-        kwargs['url_for'] = email_url
-        kwargs['base_url'] = base_url
-
-        msg = Message(
-            subject=subject,
-            recipients=[to],
-            html=render_template(f'emails/{template}.html', **kwargs)
-        )
-        mail.send(msg)
-        current_app.logger.info(f'Email sent to {to}: {subject}')
-        return True
-    except Exception as e:
-        current_app.logger.error(f'Failed to send email to {to}: {str(e)}')
-        import traceback
-        current_app.logger.error(traceback.format_exc())
-        return False
+    return send_email_to_multiple([to], subject, template, **kwargs)
 
 
 def send_email_to_multiple(recipients, subject, template, **kwargs):
-    """Send email to multiple recipients
+    """Queue an email to multiple recipients for background delivery
+
+    The template is rendered now, while the models it reads are loaded;
+    delivery happens in the email dispatcher.
 
     Args:
         recipients: List of email addresses
@@ -79,38 +74,12 @@ def send_email_to_multiple(recipients, subject, template, **kwargs):
         **kwargs: Context variables for template
     """
     try:
-        # Create a simple URL function for templates
-        base_url = get_base_url()
-        def email_url(endpoint, **values):
-            if endpoint == 'procurement.index':
-                return f"{base_url}/procurement/"
-            elif endpoint == 'procurement.detail' and 'id' in values:
-                return f"{base_url}/procurement/{values['id']}"
-            elif endpoint == 'procurement.receive' and 'id' in values:
-                return f"{base_url}/procurement/{values['id']}/receive"
-            elif endpoint == 'stock.index':
-                return f"{base_url}/stock/"
-            elif endpoint == 'distributions.index':
-                return f"{base_url}/distributions/"
-            elif endpoint == 'distributions.detail' and 'id' in values:
-                return f"{base_url}/distributions/{values['id']}"
-            elif endpoint == 'asset_requests.detail' and 'id' in values:
-                return f"{base_url}/asset-requests/{values['id']}"
-            return f"{base_url}/"
-
-        kwargs['url_for'] = email_url
-        kwargs['base_url'] = base_url
-
-        msg = Message(
-            subject=subject,
-            recipients=recipients,
-            html=render_template(f'emails/{template}.html', **kwargs)
-        )
-        mail.send(msg)
-        current_app.logger.info(f'Email sent to {len(recipients)} recipients: {subject}')
+        enqueue_email(recipients, subject, render_email(template, **kwargs))
+        current_app.logger.info(f'Email queued for {len(recipients)} recipients: {subject}')
         return True
     except Exception as e:
-        current_app.logger.error(f'Failed to send email: {str(e)}')
+        db.session.rollback()
+        current_app.logger.error(f'Failed to queue email: {str(e)}')
         import traceback
         current_app.logger.error(traceback.format_exc())
         return False
@@ -120,18 +89,13 @@ def send_email_to_multiple(recipients, subject, template, **kwargs):
 
 def notify_procurement_created(procurement):
     """Notify admin when warehouse staff creates a procurement request"""
-    from app.models import User
+    # Active, opted-in admins (cached recipient directory)
+    recipients = list(role_recipients('admin'))
 
-    # Get all admin users who should receive notifications
-    admins = User.query.filter_by(role='admin').all()
-    admins = [admin for admin in admins if admin.should_receive_email_notifications()]
-
-    if not admins:
+    if not recipients:
         current_app.logger.warning('No active admin found to send procurement notification')
         return False
 
-    recipients = [admin.email for admin in admins]
-
     return send_email_to_multiple(
         recipients=recipients,
         subject=f'[SAPA Ditsintek] Pengadaan Baru Diajukan - {procurement.procurement_code}',
@@ -173,18 +137,13 @@ def notify_procurement_rejected(procurement, rejection_reason=None):
 
 def notify_procurement_goods_received(procurement):
     """Notify admin when warehouse staff receives goods"""
-    from app.models import User
-
-    # Get all admin users who should receive notifications
-    admins = User.query.filter_by(role='admin').all()
-    admins = [admin for admin in admins if admin.should_receive_email_notifications()]
+    # Active, opted-in admins (cached recipient directory)
+    recipients = list(role_recipients('admin'))
 
-    if not admins:
+    if not recipients:
         current_app.logger.warning('No active admin found to send notification')
         return False
 
-    recipients = [admin.email for admin in admins]
-
     return send_email_to_multiple(
         recipients=recipients,
         subject=f'[SAPA Ditsintek] Barang Diterima - {procurement.procurement_code}',
@@ -195,8 +154,6 @@ def notify_procurement_goods_received(procurement):
 
 def notify_procurement_completed(procurement):
     """Notify warehouse staff and admin when procurement is completed"""
-    from app.models import User
-
     # Notify warehouse staff (creator)
     creator = procurement.created_by_user
     recipients = []
@@ -205,10 +162,9 @@ def notify_procurement_completed(procurement):
         recipients.append(creator.email)
 
     # Also notify all admins
-    admins = User.query.filter_by(role='admin').all()
-    for admin in admins:
-        if admin.should_receive_email_notifications() and admin.email not in recipients:
-            recipients.append(admin.email)
+    for email in role_recipients('admin'):
+        if email not in recipients:
+            recipients.append(email)
 
     if not recipients:
         current_app.logger.warning('No active users found to send notification')
@@ -226,21 +182,16 @@ def notify_procurement_completed(procurement):
 
 def notify_distribution_created(distribution):
     """Notify admin when warehouse staff creates distribution request"""
-    from app.models import User
-
     if not distribution:
         return False
 
-    # Get all admin users who should receive notifications
-    admins = User.query.filter_by(role='admin').all()
-    admins = [admin for admin in admins if admin.should_receive_email_notifications()]
+    # Active, opted-in admins (cached recipient directory)
+    recipients = list(role_recipients('admin'))
 
-    if not admins:
+    if not recipients:
         current_app.logger.warning('No active admin found to send distribution notification')
         return False
 
-    recipients = [admin.email for admin in admins]
-
     # Get distribution code
     distribution_code = get_distribution_code(distribution)
 
@@ -255,24 +206,12 @@ def notify_distribution_created(distribution):
 
 def notify_distribution_sent(distribution):
     """Notify unit staff when admin sends distribution"""
-    from app.models import User
-    from app.models import UserUnit
-
-    # Get users assigned to this unit
-    unit_users = []
-    if distribution.unit:
-        unit_users = User.query.join(
-            UserUnit, User.id == UserUnit.user_id
-        ).filter(
-            UserUnit.unit_id == distribution.unit.id
-        ).all()
-        unit_users = [user for user in unit_users if user.should_receive_email_notifications()]
-
-    if not unit_users:
-        current_app.logger.warning(f'No active users found for unit {distribution.unit.name}')
-        return False
+    # Active, opted-in users assigned to this unit
+    recipients = list(unit_recipients(distribution.unit_id)) if distribution.unit_id else []
 
-    recipients = [user.email for user in unit_users]
+    if not recipients:
+        current_app.logger.warning(f'No active users found for unit {distribution.unit_id}')
+        return False
 
     # Get distribution code
     distribution_code = get_distribution_code(distribution)
@@ -288,18 +227,13 @@ def notify_distribution_sent(distribution):
 
 def notify_distribution_received(distribution):
     """Notify admin when unit staff receives distribution"""
-    from app.models import User
+    # Active, opted-in admins (cached recipient directory)
+    recipients = list(role_recipients('admin'))
 
-    # Get all admin users who should receive notifications
-    admins = User.query.filter_by(role='admin').all()
-    admins = [admin for admin in admins if admin.should_receive_email_notifications()]
-
-    if not admins:
+    if not recipients:
         current_app.logger.warning('No active admin found to send distribution notification')
         return False
 
-    recipients = [admin.email for admin in admins]
-
     # Get distribution code
     distribution_code = get_distribution_code(distribution)
 
@@ -337,18 +271,13 @@ def notify_distribution_rejected(distribution, rejection_reason=None):
 
 def notify_asset_request_created(asset_request):
     """Notify admin when unit staff creates asset request"""
-    from app.models import User
-
-    # Get all admin users who should receive notifications
-    admins = User.query.filter_by(role='admin').all()
-    admins = [admin for admin in admins if admin.should_receive_email_notifications()]
+    # Active, opted-in admins (cached recipient directory)
+    recipients = list(role_recipients('admin'))
 
-    if not admins:
+    if not recipients:
         current_app.logger.warning('No active admin found to send asset request notification')
         return False
 
-    recipients = [admin.email for admin in admins]
-
     return send_email_to_multiple(
         recipients=recipients,
         subject=f'[SAPA Ditsintek] Permohonan Aset Baru - #{asset_request.id}',
@@ -404,18 +333,13 @@ def notify_asset_request_distributing(asset_request):
 
 def notify_asset_request_verified_to_warehouse(asset_request):
     """Notify warehouse staff when admin verifies asset request"""
-    from app.models import User
+    # Active, opted-in warehouse staff (cached recipient directory)
+    recipients = list(role_recipients('warehouse_staff'))
 
-    # Get all warehouse staff who should receive notifications
-    warehouse_staff = User.query.filter_by(role='warehouse_staff').all()
-    warehouse_staff = [ws for ws in warehouse_staff if ws.should_receive_email_notifications()]
-
-    if not warehouse_staff:
+    if not recipients:
         current_app.logger.warning('No active warehouse staff found to send notification')
         return False
 
-    recipients = [ws.email for ws in warehouse_staff]
-
     return send_email_to_multiple(
         recipients=recipients,
         subject=f'[SAPA Ditsintek] Permohonan Aset Terverifikasi - Silakan Distribusikan - #{asset_request.id}',
@@ -426,21 +350,14 @@ def notify_asset_request_verified_to_warehouse(asset_request):
 
 def notify_asset_request_completed(asset_request, warehouse_staff_id=None):
     """Notify admin and relevant warehouse staff when unit confirms receipt"""
-    from app.models import User
-
-    recipients = []
-
     # Add admin
-    admins = User.query.filter_by(role='admin').all()
-    for admin in admins:
-        if admin.should_receive_email_notifications():
-            recipients.append(admin.email)
+    recipients = list(role_recipients('admin'))
 
     # Add the warehouse staff who handled the distribution
     if warehouse_staff_id:
-        warehouse_staff = User.query.get(warehouse_staff_id)
-        if warehouse_staff and warehouse_staff.should_receive_email_notifications() and warehouse_staff.email not in recipients:
-            recipients.append(warehouse_staff.email)
+        email = user_recipient(warehouse_staff_id)
+        if email and email not in recipients:
+            recipients.append(email)
 
     if not recipients:
         current_app.logger.warning('No active users found to send completion notification')
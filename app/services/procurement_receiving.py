@@ -0,0 +1,340 @@
+"""
+Bulk goods receiving for procurements.
+
+Receiving a delivery used to look every unit up twice (by serial_number
+and by serial_unit) and commit one ItemDetail at a time. receive_serials()
+resolves a whole delivery with one duplicate-check query over both
+columns and one multi-row INSERT ... ON CONFLICT DO NOTHING, inside the
+caller's transaction, and reports what happened to every serial.
+
+Deliveries are recorded in procurement_receipts with their serials in
+procurement_receipt_serials (unique per procurement item), so receipt
+history, "already received" checks and completion are indexed queries
+instead of decoding JSON lists. Completion (Procurement.complete) moves
+the received item details, upserts stock and logs the stock
+transactions with one statement each, in a single transaction.
+"""
+
+from datetime import datetime
+from sqlalchemy import any_, bindparam, func, insert, literal, or_, select, update, Integer, String
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from app import db
+from app.models import (
+    ItemDetail, ProcurementItem, ProcurementReceipt, ProcurementReceiptSerial, Stock, StockTransaction
+)
+
+# Per-serial outcomes
+CREATED = 'created'
+DUPLICATE_SERIAL_NUMBER = 'duplicate_serial_number'
+DUPLICATE_SERIAL_UNIT = 'duplicate_serial_unit'
+DUPLICATE_IN_DELIVERY = 'duplicate_in_delivery'
+
+OUTCOME_LABELS = {
+    CREATED: 'Dibuat',
+    DUPLICATE_SERIAL_NUMBER: 'Serial number sudah terdaftar',
+    DUPLICATE_SERIAL_UNIT: 'Serial unit sudah terdaftar',
+    DUPLICATE_IN_DELIVERY: 'Ganda dalam pengiriman ini',
+}
+
+# Rows per INSERT statement (keeps bind parameters far below PostgreSQL's limit)
+INSERT_CHUNK = 1000
+
+
+def pair_serials(quantity, serial_numbers, serial_units):
+    """
+    (serial_number, serial_unit) per received unit.
+
+    A missing serial number falls back to the serial unit and vice versa,
+    as items without a required serial number use the serial unit for both.
+    """
+    pairs = []
+    for i in range(quantity):
+        serial_number = serial_numbers[i] if i < len(serial_numbers) else serial_units[i]
+        serial_unit = serial_units[i] if i < len(serial_units) else serial_number
+        pairs.append((serial_number, serial_unit))
+    return pairs
+
+
+def _string_array(name, values):
+    """One array bind parameter (= ANY(:name)) instead of one bind per value"""
+    return any_(bindparam(name, list(values), type_=ARRAY(String)))
+
+
+def find_existing(serial_numbers, serial_units):
+    """Serial numbers and serial units among the given ones that already exist"""
+    rows = db.session.execute(
+        select(ItemDetail.serial_number, ItemDetail.serial_unit).where(or_(
+            ItemDetail.serial_number == _string_array('serial_numbers', serial_numbers),
+            ItemDetail.serial_unit == _string_array('serial_units', serial_units)
+        ))
+    ).all()
+    return {row.serial_number for row in rows}, {row.serial_unit for row in rows}
+
+
+def already_received(procurement_item_id, serial_numbers):
+    """Serial numbers among the given ones received earlier for this procurement item"""
+    if not serial_numbers:
+        return []
+    return list(db.session.execute(
+        select(ProcurementReceiptSerial.serial_number).where(
+            ProcurementReceiptSerial.procurement_item_id == procurement_item_id,
+            ProcurementReceiptSerial.serial_number == _string_array('serial_numbers', serial_numbers)
+        ).order_by(ProcurementReceiptSerial.serial_number)
+    ).scalars())
+
+
+def _insert_chunked(stmt_for_rows, rows):
+    """Run a multi-row INSERT per chunk; returns the RETURNING values"""
+    returned = set()
+    for start in range(0, len(rows), INSERT_CHUNK):
+        returned.update(db.session.execute(stmt_for_rows(rows[start:start + INSERT_CHUNK])).scalars())
+    return returned
+
+
+def _insert_details(rows):
+    """
+    Insert item detail rows, skipping rows that conflict on the unique
+    serial number or serial unit; returns the inserted serial numbers
+    """
+    return _insert_chunked(lambda chunk: pg_insert(ItemDetail).values(chunk).on_conflict_do_nothing(
+    ).returning(ItemDetail.serial_number), rows)
+
+
+def receive_serials(item_id, procurement_id, pairs):
+    """
+    Create 'available' ItemDetails for a delivery in one round trip.
+
+    pairs is a list of (serial_number, serial_unit). Nothing is committed;
+    the caller owns the transaction. Returns one outcome dict per pair, in
+    order: {'serial_number', 'serial_unit', 'status'} with status one of
+    the constants above. Units that lose a race against a concurrent
+    receipt of the same serial number or serial unit are reported as
+    duplicates too.
+    """
+    if not pairs:
+        return []
+
+    existing_numbers, existing_units = find_existing(
+        {sn for sn, _ in pairs}, {su for _, su in pairs if su}
+    )
+
+    now = datetime.utcnow()
+    notes = f'Diterima melalui procurement #{procurement_id if procurement_id else "N/A"}'
+    outcomes = []
+    rows = []
+    seen_numbers = set()
+    seen_units = set()
+    for serial_number, serial_unit in pairs:
+        if serial_number in existing_numbers:
+            status = DUPLICATE_SERIAL_NUMBER
+        elif serial_unit and serial_unit in existing_units:
+            status = DUPLICATE_SERIAL_UNIT
+        elif serial_number in seen_numbers or (serial_unit and serial_unit in seen_units):
+            status = DUPLICATE_IN_DELIVERY
+        else:
+            status = CREATED
+            seen_numbers.add(serial_number)
+            seen_units.add(serial_unit)
+            rows.append({
+                'item_id': item_id,
+                'serial_number': serial_number,
+                'serial_unit': serial_unit or None,
+                'status': 'available',
+                'warehouse_id': None,  # Assigned when distributed/added to stock
+                'specification_notes': notes,
+                'created_at': now,
+                'updated_at': now,
+            })
+        outcomes.append({'serial_number': serial_number, 'serial_unit': serial_unit, 'status': status})
+
+    if rows:
+        inserted = _insert_details(rows)
+        lost = [o for o in outcomes if o['status'] == CREATED and o['serial_number'] not in inserted]
+        if lost:
+            # Committed by a concurrent receipt meanwhile: find out which value clashed
+            taken_numbers, _ = find_existing({o['serial_number'] for o in lost}, set())
+            for outcome in lost:
+                outcome['status'] = (DUPLICATE_SERIAL_NUMBER if outcome['serial_number'] in taken_numbers
+                                     else DUPLICATE_SERIAL_UNIT)
+
+    return outcomes
+
+
+def record_receipt(procurement_item, user_id, quantity, items_created, pairs):
+    """
+    Add a delivery to the receipt history of a procurement item.
+
+    actual_quantity must already include this delivery. Serials already
+    recorded for the item are skipped by the unique constraint. Nothing is
+    committed.
+    """
+    now = datetime.utcnow()
+    receipt = ProcurementReceipt(
+        procurement_item_id=procurement_item.id,
+        quantity=quantity,
+        cumulative_total=procurement_item.actual_quantity or 0,
+        item_details_created=items_created,
+        received_by=user_id,
+        received_at=now
+    )
+    db.session.add(receipt)
+    db.session.flush()
+
+    rows = [{
+        'receipt_id': receipt.id,
+        'procurement_item_id': procurement_item.id,
+        'serial_number': serial_number,
+        'serial_unit': serial_unit,
+        'position': position,
+        'created_at': now,
+        'updated_at': now,
+    } for position, (serial_number, serial_unit) in enumerate(pairs)]
+    if rows:
+        _insert_chunked(lambda chunk: pg_insert(ProcurementReceiptSerial).values(chunk).on_conflict_do_nothing(
+            constraint='uq_procurement_receipt_serials_item_serial'
+        ).returning(ProcurementReceiptSerial.id), rows)
+    return receipt
+
+
+def received_serial_numbers(procurement_item_id):
+    """Serial numbers received for a procurement item, in receipt order"""
+    return list(db.session.execute(
+        select(ProcurementReceiptSerial.serial_number).where(
+            ProcurementReceiptSerial.procurement_item_id == procurement_item_id
+        ).order_by(ProcurementReceiptSerial.receipt_id, ProcurementReceiptSerial.position)
+    ).scalars())
+
+
+def receipt_history(procurement_item_id):
+    """
+    Deliveries of a procurement item, oldest first, as dicts:
+    {date, quantity, serials, serial_units, received_by, cumulative_total,
+    item_details_created}.
+    """
+    receipts = db.session.execute(
+        select(ProcurementReceipt).where(
+            ProcurementReceipt.procurement_item_id == procurement_item_id
+        ).order_by(ProcurementReceipt.received_at, ProcurementReceipt.id)
+    ).scalars().all()
+    if not receipts:
+        return []
+
+    serials = {}
+    for row in db.session.execute(
+        select(
+            ProcurementReceiptSerial.receipt_id,
+            ProcurementReceiptSerial.serial_number,
+            ProcurementReceiptSerial.serial_unit
+        ).where(
+            ProcurementReceiptSerial.procurement_item_id == procurement_item_id
+        ).order_by(ProcurementReceiptSerial.receipt_id, ProcurementReceiptSerial.position)
+    ):
+        serials.setdefault(row.receipt_id, []).append(row)
+
+    return [{
+        'date': receipt.received_at.isoformat(),
+        'quantity': receipt.quantity,
+        'serials': [row.serial_number for row in serials.get(receipt.id, [])],
+        'serial_units': [row.serial_unit for row in serials.get(receipt.id, [])],
+        'received_by': receipt.received_by,
+        'cumulative_total': receipt.cumulative_total,
+        'item_details_created': receipt.item_details_created,
+    } for receipt in receipts]
+
+
+def assign_received_details(procurement_id, warehouse_id):
+    """
+    Put the item details received for a procurement into a warehouse.
+
+    Details still without a warehouse are moved in one UPDATE. Returns
+    (processed, skipped): processed counts details now in the warehouse,
+    skipped those already assigned to another one. Nothing is committed.
+    """
+    received = select(ProcurementReceiptSerial.serial_number).join(
+        ProcurementItem, ProcurementItem.id == ProcurementReceiptSerial.procurement_item_id
+    ).where(ProcurementItem.procurement_id == procurement_id)
+
+    processed, total = db.session.execute(
+        select(
+            func.count().filter(or_(
+                ItemDetail.warehouse_id.is_(None), ItemDetail.warehouse_id == warehouse_id
+            )),
+            func.count()
+        ).where(ItemDetail.serial_number.in_(received))
+    ).one()
+
+    db.session.execute(
+        update(ItemDetail).where(
+            ItemDetail.serial_number.in_(received),
+            ItemDetail.warehouse_id.is_(None)
+        ).values(
+            warehouse_id=warehouse_id, updated_at=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+    )
+    return processed, total - processed
+
+
+def add_received_stock(procurement_id, warehouse_id):
+    """
+    Add the received quantities of a procurement to stock in one upsert.
+
+    Quantities are summed per item (a procurement may list an item more
+    than once) and added to existing stock rows with
+    ON CONFLICT (item_id, warehouse_id) DO UPDATE. Nothing is committed.
+    """
+    now = datetime.utcnow()
+    received = select(
+        ProcurementItem.item_id,
+        literal(warehouse_id, Integer),
+        func.sum(func.coalesce(ProcurementItem.actual_quantity, 0)),
+        literal(now),
+        literal(now)
+    ).where(
+        ProcurementItem.procurement_id == procurement_id
+    ).group_by(ProcurementItem.item_id)
+
+    stmt = pg_insert(Stock).from_select(
+        ['item_id', 'warehouse_id', 'quantity', 'created_at', 'updated_at'], received
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        constraint='unique_item_warehouse',
+        set_={'quantity': Stock.quantity + stmt.excluded.quantity, 'updated_at': stmt.excluded.updated_at}
+    ))
+
+
+def log_received_transactions(procurement_id, warehouse_id):
+    """
+    One IN stock transaction per procurement item, in one INSERT.
+
+    The rows carry procurement_id, so the stock ledger keeps recording
+    the procurement itself rather than these rows. Nothing is committed.
+    """
+    now = datetime.utcnow()
+    quantity = func.coalesce(ProcurementItem.actual_quantity, 0)
+    db.session.execute(insert(StockTransaction).from_select(
+        ['item_id', 'warehouse_id', 'transaction_type', 'quantity', 'transaction_date',
+         'note', 'procurement_id', 'created_at', 'updated_at'],
+        select(
+            ProcurementItem.item_id,
+            literal(warehouse_id, Integer),
+            literal('IN'),
+            quantity,
+            literal(now),
+            func.concat('Pengadaan #', procurement_id, ' - ', quantity, ' unit'),
+            literal(procurement_id, Integer),
+            literal(now),
+            literal(now)
+        ).where(
+            ProcurementItem.procurement_id == procurement_id
+        ).order_by(ProcurementItem.id)
+    ))
+
+
+def summarize_outcomes(outcomes, limit=5):
+    """Short Indonesian summary of skipped serials for flash messages"""
+    skipped = [o for o in outcomes if o['status'] != CREATED]
+    if not skipped:
+        return ''
+    listed = ', '.join(f"{o['serial_number']} ({OUTCOME_LABELS[o['status']]})" for o in skipped[:limit])
+    more = f' dan {len(skipped) - limit} lainnya' if len(skipped) > limit else ''
+    return f'{len(skipped)} unit dilewati: {listed}{more}.'
@@ -0,0 +1,543 @@
+"""
+Annual recap PDF (stock.recap_pdf).
+
+Rows are streamed from the database as plain column tuples through a
+server-side cursor instead of loading ORM objects and their lazy
+relationships, and long sections are split into fixed-size tables so
+ReportLab lays them out in linear time. Rendering runs in the report job
+pool (app/services/report_jobs.py); recap_data_version() fingerprints the
+rows the report is built from so finished PDFs can be reused until the
+data changes.
+"""
+
+import hashlib
+import io
+from datetime import datetime
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import landscape, A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from sqlalchemy import func, select
+
+from app import db
+from app.models import (
+    Procurement, ProcurementItem, StockTransaction, Distribution, ReturnBatch,
+    ReturnItem, ItemDetail, Item, Warehouse, Unit
+)
+from app.utils.datetime_helper import period_filter, format_date_indonesian
+
+# Rows fetched per round trip from the server-side cursor
+FETCH_SIZE = 500
+
+# Rows per ReportLab table; one huge table makes layout superlinear
+TABLE_CHUNK_ROWS = 500
+
+
+def _stream(stmt):
+    """Execute stmt with a server-side cursor, yielding rows in batches"""
+    return db.session.execute(
+        stmt.execution_options(stream_results=True, yield_per=FETCH_SIZE)
+    )
+
+
+def _procurement_rows(year):
+    return select(
+        Procurement.completion_date, Procurement.created_at, Procurement.receipt_number,
+        Item.name, Item.item_code, ProcurementItem.quantity, Warehouse.name
+    ).select_from(Procurement).join(
+        ProcurementItem, ProcurementItem.procurement_id == Procurement.id
+    ).outerjoin(
+        Item, Item.id == ProcurementItem.item_id
+    ).outerjoin(
+        Warehouse, Warehouse.id == Procurement.warehouse_id
+    ).where(
+        Procurement.status == 'completed',
+        period_filter(Procurement.completion_date, year)
+    ).order_by(Procurement.id, ProcurementItem.id)
+
+
+def _stock_out_rows(year):
+    return select(
+        StockTransaction.transaction_date, Item.name, Item.item_code,
+        Warehouse.name, StockTransaction.quantity, StockTransaction.note
+    ).select_from(StockTransaction).join(
+        Item, Item.id == StockTransaction.item_id
+    ).outerjoin(
+        Warehouse, Warehouse.id == StockTransaction.warehouse_id
+    ).where(
+        StockTransaction.transaction_type == 'OUT',
+        period_filter(StockTransaction.transaction_date, year)
+    ).order_by(StockTransaction.id)
+
+
+def _distribution_rows(year):
+    # Column select: never loads the verification photo BLOB
+    return select(
+        Distribution.created_at, Item.name, Item.item_code, ItemDetail.serial_number,
+        Warehouse.name, Unit.name
+    ).select_from(Distribution).outerjoin(
+        ItemDetail, ItemDetail.id == Distribution.item_detail_id
+    ).outerjoin(
+        Item, Item.id == ItemDetail.item_id
+    ).outerjoin(
+        Warehouse, Warehouse.id == Distribution.warehouse_id
+    ).outerjoin(
+        Unit, Unit.id == Distribution.unit_id
+    ).where(
+        period_filter(Distribution.created_at, year)
+    ).order_by(Distribution.id)
+
+
+def _return_rows(year):
+    return select(
+        ReturnBatch.confirmed_at, ReturnBatch.created_at, ReturnBatch.batch_code,
+        Item.name, Item.item_code, ItemDetail.serial_unit, Unit.name, Warehouse.name
+    ).select_from(ReturnBatch).join(
+        ReturnItem, ReturnItem.return_batch_id == ReturnBatch.id
+    ).outerjoin(
+        ItemDetail, ItemDetail.id == ReturnItem.item_detail_id
+    ).outerjoin(
+        Item, Item.id == ItemDetail.item_id
+    ).outerjoin(
+        Unit, Unit.id == ReturnItem.unit_id
+    ).outerjoin(
+        Warehouse, Warehouse.id == ReturnBatch.warehouse_id
+    ).where(
+        ReturnBatch.status == 'confirmed',
+        period_filter(ReturnBatch.confirmed_at, year)
+    ).order_by(ReturnBatch.id, ReturnItem.id)
+
+
+def _obname_rows():
+    # Stock opname lists what is in the warehouses now, for any year
+    return select(
+        Item.name, Item.item_code, ItemDetail.serial_number, Warehouse.name, ItemDetail.created_at
+    ).select_from(ItemDetail).join(
+        Item, Item.id == ItemDetail.item_id
+    ).outerjoin(
+        Warehouse, Warehouse.id == ItemDetail.warehouse_id
+    ).where(
+        ItemDetail.status == 'available'
+    ).order_by(ItemDetail.id)
+
+
+def recap_data_version(year):
+    """
+    Fingerprint of the rows the recap of `year` is built from.
+
+    Row counts plus the latest updated_at of every source (and of the
+    item/warehouse/unit names printed in it), in one statement. Any
+    insert, update or delete of those rows changes the version.
+    """
+    def stamp(updated_at):
+        return func.concat(func.count(), '|', func.max(updated_at))
+
+    sources = [
+        select(stamp(func.greatest(Procurement.updated_at, ProcurementItem.updated_at)))
+        .select_from(Procurement)
+        .join(ProcurementItem, ProcurementItem.procurement_id == Procurement.id)
+        .where(Procurement.status == 'completed', period_filter(Procurement.completion_date, year)),
+        select(stamp(StockTransaction.updated_at))
+        .where(StockTransaction.transaction_type == 'OUT',
+               period_filter(StockTransaction.transaction_date, year)),
+        select(stamp(Distribution.updated_at))
+        .where(period_filter(Distribution.created_at, year)),
+        select(stamp(func.greatest(ReturnBatch.updated_at, ReturnItem.updated_at)))
+        .select_from(ReturnBatch)
+        .join(ReturnItem, ReturnItem.return_batch_id == ReturnBatch.id)
+        .where(ReturnBatch.status == 'confirmed', period_filter(ReturnBatch.confirmed_at, year)),
+        select(stamp(ItemDetail.updated_at)).where(ItemDetail.status == 'available'),
+        select(stamp(Item.updated_at)),
+        select(stamp(Warehouse.updated_at)),
+        select(stamp(Unit.updated_at)),
+    ]
+    columns = [source.scalar_subquery() for source in sources]
+    row = db.session.execute(select(*columns)).one()
+    return hashlib.sha1(repr(tuple(row)).encode()).hexdigest()[:16]
+
+
+def _date(value):
+    return value.strftime('%d/%m/%Y') if value else '-'
+
+
+def _section_tables(header, rows, total_row, col_widths, total_bg, total_fg):
+    """Header-repeating tables of at most TABLE_CHUNK_ROWS rows; the last carries the total"""
+    chunks = [rows[i:i + TABLE_CHUNK_ROWS] for i in range(0, len(rows), TABLE_CHUNK_ROWS)] or [[]]
+    tables = []
+    for index, chunk in enumerate(chunks):
+        last = index == len(chunks) - 1
+        body_end = -2 if last else -1
+        style = [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#059669')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 8),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 5),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('GRID', (0, 0), (-1, body_end), 0.5, colors.grey),
+            ('ROWBACKGROUNDS', (0, 1), (-1, body_end), [colors.white, colors.HexColor('#f9fafb')]),
+        ]
+        if last:
+            style += [
+                ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor(total_bg)),
+                ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor(total_fg)),
+                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+                ('LINEABOVE', (0, -1), (-1, -1), 1.5, colors.HexColor(total_fg)),
+            ]
+        table = Table([header] + chunk + ([total_row] if last else []), colWidths=col_widths, repeatRows=1)
+        table.setStyle(TableStyle(style))
+        tables.append(table)
+    return tables
+
+
+def render_recap_pdf(year, author):
+    """Render the annual recap of `year` and return the PDF bytes"""
+    now = datetime.now()
+
+    normal_text_style = ParagraphStyle('NormalText', fontSize=7, leading=9, alignment=1)
+    item_name_style = ParagraphStyle('ItemName', fontSize=7, leading=9)
+    note_style = ParagraphStyle('Note', fontSize=7, leading=9, alignment=0)
+    batch_code_style = ParagraphStyle('BatchCode', fontSize=6, leading=8, alignment=1)
+    total_style = ParagraphStyle('tot', fontSize=8, alignment=1, fontName='Helvetica-Bold')
+
+    # ========== DATA (streamed) ==========
+    proc_rows = []
+    total_procurement = 0
+    for completion_date, created_at, receipt_number, item_name, item_code, quantity, warehouse_name in _stream(_procurement_rows(year)):
+        total_procurement += quantity
+        proc_rows.append([
+            str(len(proc_rows) + 1),
+            _date(completion_date or created_at),
+            receipt_number or '-',
+            Paragraph(f"{item_name or '-'}<br/><font size=6 color='#666'>Kode: {item_code or ''}</font>", item_name_style),
+            str(quantity),
+            Paragraph(warehouse_name or '-', normal_text_style)
+        ])
+
+    out_rows = []
+    total_out = 0
+    for transaction_date, item_name, item_code, warehouse_name, quantity, note in _stream(_stock_out_rows(year)):
+        total_out += quantity
+        out_rows.append([
+            str(len(out_rows) + 1),
+            _date(transaction_date),
+            Paragraph(f"{item_name}<br/><font size=6 color='#666'>Kode: {item_code}</font>", item_name_style),
+            Paragraph(warehouse_name or '-', normal_text_style),
+            Paragraph('-', normal_text_style),
+            str(quantity),
+            Paragraph(note or 'Pengeluaran barang', note_style)
+        ])
+
+    total_distributed = 0
+    for created_at, item_name, item_code, serial_number, warehouse_name, unit_name in _stream(_distribution_rows(year)):
+        total_distributed += 1
+        out_rows.append([
+            str(len(out_rows) + 1),
+            _date(created_at),
+            Paragraph(f"{item_name or '-'}<br/><font size=6 color='#666'>Kode: {item_code or ''}<br/>SN: {serial_number or ''}</font>", item_name_style),
+            Paragraph(warehouse_name or '-', normal_text_style),
+            Paragraph(unit_name or '-', normal_text_style),
+            '1',
+            Paragraph('Distribusi ke unit', note_style)
+        ])
+
+    ret_rows = []
+    for confirmed_at, created_at, batch_code, item_name, item_code, serial_unit, unit_name, warehouse_name in _stream(_return_rows(year)):
+        ret_rows.append([
+            str(len(ret_rows) + 1),
+            _date(confirmed_at or created_at),
+            Paragraph(batch_code, batch_code_style),
+            Paragraph(f"{item_name or '-'}<br/><font size=6 color='#666'>Kode: {item_code or ''}</font>", item_name_style),
+            serial_unit or '',
+            Paragraph(unit_name or '-', normal_text_style),
+            Paragraph(warehouse_name or '-', normal_text_style)
+        ])
+    total_returned = len(ret_rows)
+
+    stock_rows = []
+    for item_name, item_code, serial_number, warehouse_name, created_at in _stream(_obname_rows()):
+        stock_rows.append([
+            str(len(stock_rows) + 1),
+            Paragraph(f"{item_name}<br/><font size=6 color='#666'>Kode: {item_code}</font>", item_name_style),
+            serial_number,
+            Paragraph(warehouse_name or '-', normal_text_style),
+            _date(created_at),
+            '✓ Tersedia'
+        ])
+    total_obname = len(stock_rows)
+
+    # Custom Canvas with Footer
+    class FooterCanvas(canvas.Canvas):
+        def __init__(self, *args, **kwargs):
+            canvas.Canvas.__init__(self, *args, **kwargs)
+            self.pages = []
+
+        def showPage(self):
+            self.pages.append(dict(self.__dict__))
+            self._startPage()
+
+        def save(self):
+            page_count = len(self.pages)
+            for page_num, page in enumerate(self.pages, 1):
+                self.__dict__.update(page)
+                self.draw_footer(page_num, page_count)
+                canvas.Canvas.showPage(self)
+            canvas.Canvas.save(self)
+
+        def draw_footer(self, page_num, page_count):
+            # Garis horizontal
+            self.setStrokeColor(colors.HexColor('#059669'))
+            self.setLineWidth(1)
+            self.line(1*cm, 1*cm, landscape(A4)[0] - 1*cm, 1*cm)
+
+            # Teks footer
+            self.setFont('Helvetica', 8)
+            self.setFillColor(colors.grey)
+
+            # Tanggal dan jam cetak (kiri)
+            footer_left = f"Dicetak pada: {format_date_indonesian(now, '%d %B %Y, %H:%M')} WIB"
+            self.drawString(1*cm, 0.6*cm, footer_left)
+
+            # Nomor halaman (kanan)
+            footer_right = f"Halaman {page_num} dari {page_count}"
+            self.drawRightString(landscape(A4)[0] - 1*cm, 0.6*cm, footer_right)
+
+    # Create PDF buffer
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=landscape(A4),
+        rightMargin=1*cm,
+        leftMargin=1*cm,
+        topMargin=1.5*cm,
+        bottomMargin=1.8*cm  # Lebih besar untuk footer
+    )
+
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        fontSize=20,
+        textColor=colors.HexColor('#0f172a'),
+        alignment=1,
+        spaceAfter=10,
+        fontName='Helvetica-Bold'
+    )
+
+    subtitle_style = ParagraphStyle(
+        'CustomSubtitle',
+        fontSize=11,
+        alignment=1,
+        spaceAfter=15,
+        textColor=colors.HexColor('#64748b')
+    )
+
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        fontSize=13,
+        textColor=colors.white,
+        backColor=colors.HexColor('#059669'),
+        alignment=0,
+        spaceAfter=8,
+        spaceBefore=12,
+        leftIndent=5,
+        borderPadding=5
+    )
+
+    content = []
+
+    # ========== 1. LETTERHEAD (COMPACT) ==========
+    letterhead_data = [[
+        Paragraph('<font size=20 color="white"><b>G</b></font>',
+                  ParagraphStyle('Logo', alignment=1, leading=22)),
+        Paragraph(
+            '<b><font size=13>SAPA Ditsintek</font></b><br/>'
+            '<font size=8 color="#64748b">Direktorat Sistem Informasi dan Pengembangan Teknologi Universitas Sumatera Utara, Jl. Universitas No.9, Padang Bulan, Medan Baru, Medan City, North Sumatra 20155 | Telp: (061) 8222129 </font>',
+            ParagraphStyle('LH', leading=11, leftIndent=5)
+        )
+    ]]
+    # Lebar total 27.7cm
+    letterhead_table = Table(letterhead_data, colWidths=[1.5*cm, 26.2*cm])
+    letterhead_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, 0), colors.HexColor('#059669')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('LINEBELOW', (0, 0), (1, 0), 0.5, colors.HexColor('#e2e8f0')),
+    ]))
+    content.append(letterhead_table)
+    content.append(Spacer(1, 0.4*cm))
+
+    # ========== 2. JUDUL ==========
+    content.append(Paragraph("LAPORAN REKAPITULASI TAHUNAN", title_style))
+    content.append(Paragraph(f"Tahun Anggaran {year} • Dicetak: {now.strftime('%d/%m/%Y %H:%M')}", subtitle_style))
+
+    # ========== 3. SUMMARY CARDS (HORIZONTAL FLOW) ==========
+    def make_card(label, value, color):
+        return Paragraph(
+            f'<para align="center"><font size=8 color="#64748b">{label}</font><br/>'
+            f'<b><font size=14 color="{color}">{value}</font></b></para>',
+            ParagraphStyle('CardInner', leading=16)
+        )
+
+    summary_data = [[
+        make_card("TOTAL PENGADAAN", f"{total_procurement:,}", "#059669"),
+        make_card("TOTAL DISTRIBUSI", f"{total_distributed:,}", "#dc2626"),
+        make_card("TOTAL RETUR", f"{total_returned:,}", "#ea580c"),
+        make_card("SISA GUDANG", f"{total_obname:,}", "#2563eb")
+    ]]
+
+    # 27.7 / 4 = 6.9cm per card
+    summary_table = Table(summary_data, colWidths=[6.9*cm]*4)
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, 0), colors.HexColor('#f0fdf4')),
+        ('BACKGROUND', (1, 0), (1, 0), colors.HexColor('#fef2f2')),
+        ('BACKGROUND', (2, 0), (2, 0), colors.HexColor('#fff7ed')),
+        ('BACKGROUND', (3, 0), (3, 0), colors.HexColor('#eff6ff')),
+        ('BOX', (0, 0), (-1, -1), 0.5, colors.HexColor('#e2e8f0')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ]))
+    content.append(summary_table)
+    content.append(Spacer(1, 0.5*cm))
+
+    # ========== SECTION I: PROCUREMENT ==========
+    if proc_rows:
+        content.append(Paragraph("I. PEROLEHAN BARANG (PENGADAAN)", heading_style))
+        content.append(Spacer(1, 0.3*cm))
+        content.extend(_section_tables(
+            ['No', 'Tanggal', 'Invoice', 'Nama Barang', 'Qty', 'Gudang'],
+            proc_rows,
+            ['', '', '', Paragraph('TOTAL PENGADAAN', total_style), str(total_procurement), ''],
+            [0.8*cm, 2.5*cm, 2.5*cm, 9*cm, 1.2*cm, 3.5*cm],
+            '#d1fae5', '#059669'
+        ))
+
+    # ========== SECTION II: STOCK OUT & DISTRIBUTIONS ==========
+    if out_rows:
+        content.append(PageBreak())
+        content.append(Paragraph("II. BARANG KELUAR", heading_style))
+        content.append(Spacer(1, 0.3*cm))
+        content.extend(_section_tables(
+            ['No', 'Tanggal', 'Nama Barang', 'Gudang Asal', 'Tujuan', 'Qty', 'Keterangan'],
+            out_rows,
+            ['', '', '', '', Paragraph('TOTAL KELUAR', total_style), str(total_out + total_distributed), ''],
+            [0.8*cm, 2.5*cm, 8*cm, 3.5*cm, 3*cm, 1.2*cm, 4.7*cm],
+            '#dbeafe', '#0369a1'
+        ))
+
+    # ========== SECTION III: RETURNS ==========
+    if ret_rows:
+        content.append(PageBreak())
+        content.append(Paragraph("III. RETUR DARI UNIT", heading_style))
+        content.append(Spacer(1, 0.3*cm))
+        content.extend(_section_tables(
+            ['No', 'Tanggal', 'No. Batch', 'Nama Barang', 'Serial Number', 'Unit Asal', 'Gudang'],
+            ret_rows,
+            ['', '', '', '', '', Paragraph('TOTAL RETUR', total_style), str(total_returned)],
+            [0.8*cm, 2.5*cm, 3.5*cm, 7*cm, 2.5*cm, 3*cm, 4.4*cm],
+            '#fef3c7', '#a16207'
+        ))
+
+    # ========== SECTION IV: STOCK OPNAME ==========
+    if stock_rows:
+        content.append(PageBreak())
+        content.append(Paragraph("IV. DAFTAR BARANG DI GUDANG (STOCK OPNAME)", heading_style))
+        content.append(Spacer(1, 0.3*cm))
+        content.extend(_section_tables(
+            ['No', 'Nama Barang', 'Serial Number', 'Gudang', 'Tanggal Masuk', 'Status'],
+            stock_rows,
+            ['', '', '', '', Paragraph('TOTAL BARANG', total_style), str(total_obname)],
+            [0.8*cm, 8*cm, 3*cm, 3.5*cm, 2.8*cm, 4.6*cm],
+            '#ede9fe', '#6b21a8'
+        ))
+
+    # ========== SIGNATURE SECTION ==========
+    content.append(PageBreak())
+    content.append(Paragraph("PENGESAHAN LAPORAN", heading_style))
+    content.append(Spacer(1, 0.5*cm))
+
+    sig_text = (
+        f"Demikian laporan rekapitulasi barang masuk dan keluar untuk tahun anggaran {year} "
+        f"ini dibuat dengan sebenar-benarnya berdasarkan data yang ada dalam sistem. "
+        f"Laporan ini dapat digunakan sebagai bahan evaluasi dan perencanaan untuk periode selanjutnya."
+    )
+    content.append(Paragraph(
+        sig_text,
+        ParagraphStyle('BodyText', fontSize=10, alignment=4, leading=14)
+    ))
+    content.append(Spacer(1, 1.5*cm))
+
+    sig_data = [
+        ['Mengetahui,', '', 'Kepala Gudang,'],
+        [f'{format_date_indonesian(now)}', '', f'{format_date_indonesian(now)}'],
+        ['', '', ''],
+        ['', '', ''],
+        ['', '', ''],
+        ['( .............................. )', '', '( .............................. )'],
+        ['..............................', '', '..............................'],
+        ['NIP. ..............................', '', 'NIP. ....  ..........................'],
+    ]
+
+    sig_table = Table(sig_data, colWidths=[6*cm, 4*cm, 6*cm])
+    sig_table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('TEXTCOLOR', (0, 0), (0, 0), colors.HexColor('#059669')),
+        ('TEXTCOLOR', (2, 0), (2, 0), colors.HexColor('#059669')),
+        ('FONTNAME', (0, 0), (2, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 5), (2, 5), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 6), (-1, 7), 9),
+        ('TEXTCOLOR', (0, 6), (-1, 7), colors.grey),
+    ]))
+    content.append(sig_table)
+    content.append(Spacer(1, 1*cm))
+
+    # ========== NOTE SECTION ==========
+    note_content = [
+        [Paragraph(
+            "<b>Catatan Penting:</b>",
+            ParagraphStyle('NoteTitle', fontSize=10, textColor=colors.HexColor('#059669'), fontName='Helvetica-Bold')
+        )],
+        [Paragraph(
+            "Laporan ini bersifat rahasia dan hanya untuk keperluan internal. "
+            "Mohon untuk tidak menyebarluaskan tanpa izin dari pihak yang berwenang. "
+            "Segala kesalahan dalam laporan ini merupakan tanggung jawab penyusun "
+            "dan dapat dikoreksi berdasarkan data yang valid.",
+            ParagraphStyle('NoteBody', fontSize=9, textColor=colors.HexColor('#065f46'), leading=12)
+        )]
+    ]
+
+    note_table = Table(note_content, colWidths=[26*cm])
+    note_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#d1fae5')),
+        ('BOX', (0, 0), (-1, -1), 2, colors.HexColor('#059669')),
+        ('LEFTPADDING', (0, 0), (-1, -1), 12),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+        ('TOPPADDING', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ]))
+    content.append(note_table)
+
+    # ========== SET PDF METADATA ==========
+    doc.title = f'Laporan Rekap Tahunan - {year}'
+    doc.author = author
+    doc.subject = f'Laporan Rekap Stok Tahun {year}'
+    doc.creator = 'Smart Geo Inventory System'
+
+    # ========== BUILD PDF ==========
+    doc.build(content, canvasmaker=FooterCanvas)
+
+    pdf = buffer.getvalue()
+    buffer.close()
+    return pdf
@@ -0,0 +1,81 @@
+"""
+Notification recipient directory.
+
+Resolves the email addresses of active, opted-in users per role or per
+unit with one indexed query that selects only the address column,
+instead of loading full User objects and filtering
+should_receive_email_notifications() in Python. Results are memoized on
+flask.g and cached under the cache tags of users and user_units
+(app/utils/cache_helpers.py), so any committed write to those tables
+(activation, role changes, unit assignment, ...) invalidates them.
+"""
+
+from flask import g, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from app import db, cache
+from app.models import User, UserUnit
+from app.utils.cache_helpers import tagged_key, invalidate_tags
+
+# Safety net TTL; invalidation is event driven
+RECIPIENTS_TIMEOUT = 3600
+
+RECIPIENT_TAGS = ('users', 'user_units')
+
+
+def _opted_in():
+    """Same rule as User.should_receive_email_notifications()"""
+    return (User.is_active == True, User.email_notifications == True)
+
+
+def invalidate_recipients():
+    """Drop every cached recipient list (only needed after writes outside the ORM session)"""
+    invalidate_tags(*RECIPIENT_TAGS)
+    if has_app_context():
+        g.pop('_recipient_directory', None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _forget_memo_after_commit(session):
+    """A commit may have changed users; the request memo must not outlive it"""
+    if has_app_context():
+        g.pop('_recipient_directory', None)
+
+
+def _lookup(key, stmt):
+    memo = g.setdefault('_recipient_directory', {})
+    if key in memo:
+        return memo[key]
+
+    cache_key = tagged_key('recipients', RECIPIENT_TAGS, key)
+    emails = cache.get(cache_key)
+    if emails is None:
+        emails = tuple(db.session.execute(stmt).scalars())
+        cache.set(cache_key, emails, timeout=RECIPIENTS_TIMEOUT)
+
+    memo[key] = emails
+    return emails
+
+
+def role_recipients(role):
+    """Email addresses of active, opted-in users with the given role"""
+    return _lookup(f'role_{role}', select(User.email).where(
+        User.role == role, *_opted_in()
+    ).order_by(User.id))
+
+
+def unit_recipients(unit_id):
+    """Email addresses of active, opted-in users assigned to a unit"""
+    return _lookup(f'unit_{unit_id}', select(User.email).join(
+        UserUnit, UserUnit.user_id == User.id
+    ).where(
+        UserUnit.unit_id == unit_id, *_opted_in()
+    ).order_by(User.id))
+
+
+def user_recipient(user_id):
+    """Email address of one user, or None if inactive or opted out"""
+    emails = _lookup(f'user_{user_id}', select(User.email).where(
+        User.id == user_id, *_opted_in()
+    ))
+    return emails[0] if emails else None
@@ -0,0 +1,147 @@
+"""
+Background report jobs.
+
+Heavy PDF reports are rendered by a small thread pool instead of inside
+the request, so a download never holds a web worker for longer than a
+status poll. A job id encodes what is rendered and the data version it
+was rendered from (e.g. 'recap-2024-u<user>-<version>'); the finished artifact is
+stored under that id in REPORT_ARTIFACT_FOLDER, so repeat downloads of
+unchanged data are served straight from disk. Job state lives in the
+cache so every web worker can answer status polls.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app import db, cache
+
+logger = logging.getLogger(__name__)
+
+JOB_KEY_PREFIX = 'report_job:'
+
+# Job ids end up in file names
+JOB_ID_PATTERN = re.compile(r'^[a-z]+-\d{1,4}-(u\d+-)?[0-9a-f]{8,40}$')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(app):
+    """Process-wide worker pool, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('REPORT_WORKERS', 2),
+                thread_name_prefix='report'
+            )
+    return _executor
+
+
+def is_valid_job_id(job_id):
+    return bool(JOB_ID_PATTERN.match(job_id or ''))
+
+
+def artifact_path(job_id):
+    """Path of the finished PDF of a job"""
+    if not is_valid_job_id(job_id):
+        raise ValueError(f'Invalid report job id: {job_id}')
+    return os.path.join(current_app.config['REPORT_ARTIFACT_FOLDER'], f'{job_id}.pdf')
+
+
+def _done_state(job_id, **meta):
+    return {'id': job_id, 'status': 'done', **meta}
+
+
+def _update_state(job_id, **changes):
+    timeout = current_app.config.get('REPORT_JOB_TIMEOUT', 3600)
+    state = cache.get(JOB_KEY_PREFIX + job_id) or {'id': job_id}
+    state.update(changes)
+    cache.set(JOB_KEY_PREFIX + job_id, state, timeout=timeout)
+    return state
+
+
+def get_job(job_id):
+    """Current state of a job, or None if it is unknown"""
+    if not is_valid_job_id(job_id):
+        return None
+    state = cache.get(JOB_KEY_PREFIX + job_id)
+    if state is None and os.path.exists(artifact_path(job_id)):
+        # State expired but the artifact is still there
+        return _done_state(job_id)
+    return state
+
+
+def _is_stale(state):
+    """Queued or running for longer than a render may take (worker died)"""
+    stale_after = current_app.config.get('REPORT_JOB_STALE_AFTER', 900)
+    return state['status'] in ('queued', 'running') and time.time() - state['queued_at'] > stale_after
+
+
+def submit_job(job_id, render, args=(), download_name=None, prune_prefix=None):
+    """
+    Render job_id in the background unless it is done or already in flight.
+
+    render(*args) must return the PDF bytes; it runs inside an app context
+    of its own. Once written, older artifacts whose id starts with
+    prune_prefix are removed. Returns the job state.
+    """
+    meta = {'download_name': download_name or f'{job_id}.pdf'}
+    if os.path.exists(artifact_path(job_id)):
+        return _done_state(job_id, **meta)
+
+    key = JOB_KEY_PREFIX + job_id
+    timeout = current_app.config.get('REPORT_JOB_TIMEOUT', 3600)
+    state = {'id': job_id, 'status': 'queued', 'queued_at': time.time(), **meta}
+
+    # cache.add is atomic, so concurrent requests start one render only
+    if not cache.add(key, state, timeout=timeout):
+        existing = cache.get(key)
+        if existing and existing['status'] != 'failed' and not _is_stale(existing):
+            return existing
+        cache.set(key, state, timeout=timeout)
+
+    app = current_app._get_current_object()
+    _get_executor(app).submit(_run_job, app, job_id, render, args, prune_prefix)
+    return state
+
+
+def _run_job(app, job_id, render, args, prune_prefix):
+    with app.app_context():
+        _update_state(job_id, status='running', started_at=time.time())
+        try:
+            pdf = render(*args)
+
+            path = artifact_path(job_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(pdf)
+            os.replace(tmp_path, path)
+
+            if prune_prefix:
+                _prune_artifacts(prune_prefix, keep=job_id)
+
+            _update_state(job_id, status='done', finished_at=time.time(), size=len(pdf))
+            logger.info(f'Report {job_id} rendered ({len(pdf)} bytes)')
+        except Exception as e:
+            logger.exception(f'Report {job_id} failed')
+            db.session.rollback()
+            _update_state(job_id, status='failed', error=str(e))
+        finally:
+            db.session.remove()
+
+
+def _prune_artifacts(prefix, keep):
+    """Remove artifacts of older data versions of the same report"""
+    folder = current_app.config['REPORT_ARTIFACT_FOLDER']
+    for name in os.listdir(folder):
+        if name.startswith(prefix) and name.endswith('.pdf') and name != f'{keep}.pdf':
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass
@@ -0,0 +1,442 @@
+"""
+Stock ledger: one append-only row per stock movement.
+
+Every stock-moving code path ends up flushing one of the six source rows
+the history used to be merged from (stock transactions, confirmed return
+batches, completed procurements, approved distribution batches and
+installed direct distributions). An after_flush hook turns those flushes
+into ledger rows inside the same transaction, so the stock history, the
+recap and the dashboard charts can all be answered by one indexed query
+over stock_ledger.
+
+The same statement that appends ledger rows also folds them into
+stock_daily_rollups (per WIB day, warehouse and item), so chart
+endpoints read one row per day instead of one per movement.
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, literal, case, cast, tuple_, and_, text, Date, inspect as sa_inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app import db
+from app.utils.datetime_helper import wib_extract
+from app.models import (
+    StockLedger, StockDailyRollup, StockTransaction, ReturnBatch, ReturnItem, Procurement,
+    ProcurementItem, DistributionGroup, Distribution, ItemDetail, Item,
+    Warehouse, Unit
+)
+
+# Labels used by the history page and the dashboard
+MOVEMENT_LABELS = {
+    'stock_in': 'Barang Masuk',
+    'stock_out': 'Barang Keluar',
+    'return_batch': 'Retur',
+    'procurement': 'Pengadaan',
+    'distribution_group': 'Distribusi',
+    'direct_distribution': 'Permintaan',
+}
+
+INBOUND_TYPES = ('stock_in', 'return_batch', 'procurement')
+OUTBOUND_TYPES = ('stock_out', 'distribution_group', 'direct_distribution')
+
+HISTORY_PAGE_SIZE = 50
+
+LEDGER_COLUMNS = (
+    'occurred_at', 'movement_type', 'direction', 'quantity', 'warehouse_id',
+    'item_id', 'item_detail_id', 'unit_id', 'source_id', 'source_line_id',
+    'reference', 'note', 'created_at', 'updated_at'
+)
+
+
+def _insert_from(select_stmt):
+    """
+    INSERT INTO stock_ledger ... SELECT ..., ignoring already recorded
+    movements, and add the rows actually inserted to the daily rollups.
+    """
+    ledger = StockLedger.__table__
+    inserted = pg_insert(ledger).from_select(
+        LEDGER_COLUMNS, select_stmt
+    ).on_conflict_do_nothing(
+        constraint='uq_stock_ledger_source'
+    ).returning(
+        ledger.c.occurred_at, ledger.c.warehouse_id, ledger.c.item_id,
+        ledger.c.direction, ledger.c.quantity
+    ).cte('inserted')
+
+    # Data-modifying CTEs must sit at the top level of the statement
+    return _rollup_upsert(inserted).add_cte(inserted)
+
+
+def _wib_day(column):
+    """WIB calendar day of a naive UTC timestamp column"""
+    return cast(column + timedelta(hours=7), Date)
+
+
+def _rollup_upsert(rows):
+    """
+    INSERT INTO stock_daily_rollups ... ON CONFLICT DO UPDATE adding the
+    aggregated quantities of `rows` (ledger-shaped selectable).
+    """
+    rollup = StockDailyRollup.__table__
+    day = _wib_day(rows.c.occurred_at)
+    warehouse_id = func.coalesce(rows.c.warehouse_id, 0)
+    item_id = func.coalesce(rows.c.item_id, 0)
+    now = func.now()
+
+    aggregated = db.select(
+        day, warehouse_id, item_id,
+        func.sum(case((rows.c.direction == 'IN', rows.c.quantity), else_=0)),
+        func.sum(case((rows.c.direction == 'OUT', rows.c.quantity), else_=0)),
+        func.count(),
+        now, now
+    ).select_from(rows).group_by(day, warehouse_id, item_id)
+
+    stmt = pg_insert(rollup).from_select(
+        ('day', 'warehouse_id', 'item_id', 'quantity_in', 'quantity_out',
+         'movement_count', 'created_at', 'updated_at'),
+        aggregated
+    )
+    return stmt.on_conflict_do_update(
+        constraint='uq_stock_daily_rollup',
+        set_={
+            'quantity_in': rollup.c.quantity_in + stmt.excluded.quantity_in,
+            'quantity_out': rollup.c.quantity_out + stmt.excluded.quantity_out,
+            'movement_count': rollup.c.movement_count + stmt.excluded.movement_count,
+            'updated_at': now,
+        }
+    )
+
+
+def rebuild_rollups(session):
+    """
+    Recompute stock_daily_rollups from the whole ledger.
+
+    Locks the rollup table for the rest of the transaction so concurrent
+    ledger writes wait instead of being counted twice.
+    """
+    session.execute(text("LOCK TABLE stock_daily_rollups IN EXCLUSIVE MODE"))
+    session.execute(db.delete(StockDailyRollup))
+    ledger = db.select(
+        StockLedger.occurred_at, StockLedger.warehouse_id, StockLedger.item_id,
+        StockLedger.direction, StockLedger.quantity
+    ).subquery('ledger')
+    session.execute(_rollup_upsert(ledger))
+    return session.query(StockDailyRollup).count()
+
+
+def _ledger_select(occurred_at, movement_type, direction, quantity, warehouse_id,
+                   item_id, item_detail_id, unit_id, source_id, source_line_id,
+                   reference, note):
+    """Build a SELECT whose columns line up with LEDGER_COLUMNS"""
+    if isinstance(movement_type, str):
+        movement_type = literal(movement_type)
+    if isinstance(direction, str):
+        direction = literal(direction)
+    now = func.now()
+    return db.select(
+        occurred_at, movement_type, direction, quantity,
+        warehouse_id, item_id, item_detail_id, unit_id, source_id,
+        source_line_id, reference, note, now, now
+    )
+
+
+def stock_transaction_movements(*criteria):
+    """Manual stock in/out (procurement transactions are recorded per procurement)"""
+    is_in = StockTransaction.transaction_type == 'IN'
+    return _insert_from(_ledger_select(
+        StockTransaction.transaction_date,
+        case((is_in, 'stock_in'), else_='stock_out'),
+        case((is_in, 'IN'), else_='OUT'),
+        StockTransaction.quantity,
+        StockTransaction.warehouse_id, StockTransaction.item_id,
+        literal(None), literal(None),
+        StockTransaction.id, literal(0), literal(None), StockTransaction.note
+    ).where(*criteria))
+
+
+def _not_procurement_transaction():
+    return StockTransaction.procurement_id.is_(None)
+
+
+def return_batch_movements(*criteria):
+    """One IN row per item of a confirmed return batch"""
+    return _insert_from(_ledger_select(
+        func.coalesce(ReturnBatch.confirmed_at, ReturnBatch.created_at),
+        'return_batch', 'IN', literal(1),
+        ReturnBatch.warehouse_id, ItemDetail.item_id,
+        ReturnItem.item_detail_id, ReturnItem.unit_id,
+        ReturnBatch.id, ReturnItem.id, ReturnBatch.batch_code, ReturnItem.return_reason
+    ).select_from(ReturnBatch).join(
+        ReturnItem, ReturnItem.return_batch_id == ReturnBatch.id
+    ).outerjoin(
+        ItemDetail, ReturnItem.item_detail_id == ItemDetail.id
+    ).where(
+        ReturnBatch.status == 'confirmed',
+        *criteria
+    ))
+
+
+def procurement_movements(*criteria):
+    """One IN row per item of a completed procurement"""
+    return _insert_from(_ledger_select(
+        func.coalesce(Procurement.completion_date, Procurement.created_at),
+        'procurement', 'IN',
+        func.coalesce(func.nullif(ProcurementItem.actual_quantity, 0), ProcurementItem.quantity),
+        Procurement.warehouse_id, ProcurementItem.item_id,
+        literal(None), literal(None),
+        Procurement.id, ProcurementItem.id,
+        func.concat('Pengadaan #', Procurement.id), Procurement.receipt_number
+    ).select_from(Procurement).join(
+        ProcurementItem, ProcurementItem.procurement_id == Procurement.id
+    ).where(
+        Procurement.status == 'completed',
+        *criteria
+    ))
+
+
+def distribution_group_movements(*criteria):
+    """One OUT row per distribution of an approved distribution batch"""
+    return _insert_from(_ledger_select(
+        func.coalesce(DistributionGroup.verified_at, DistributionGroup.created_at),
+        'distribution_group', 'OUT', literal(1),
+        DistributionGroup.warehouse_id, ItemDetail.item_id,
+        Distribution.item_detail_id, Distribution.unit_id,
+        DistributionGroup.id, Distribution.id, DistributionGroup.batch_code,
+        DistributionGroup.notes
+    ).select_from(DistributionGroup).join(
+        Distribution, Distribution.distribution_group_id == DistributionGroup.id
+    ).outerjoin(
+        ItemDetail, Distribution.item_detail_id == ItemDetail.id
+    ).where(
+        DistributionGroup.status.in_(['approved', 'distributed']),
+        *criteria
+    ))
+
+
+def direct_distribution_movements(*criteria):
+    """One OUT row per installed distribution outside a distribution batch"""
+    return _insert_from(_ledger_select(
+        func.coalesce(Distribution.updated_at, Distribution.created_at),
+        'direct_distribution', 'OUT', literal(1),
+        Distribution.warehouse_id, ItemDetail.item_id,
+        Distribution.item_detail_id, Distribution.unit_id,
+        Distribution.id, literal(0), literal(None), Distribution.note
+    ).select_from(Distribution).outerjoin(
+        ItemDetail, Distribution.item_detail_id == ItemDetail.id
+    ).where(
+        Distribution.distribution_group_id.is_(None),
+        Distribution.status == 'installed',
+        *criteria
+    ))
+
+
+def backfill_statements():
+    """Statements that record every existing movement (used by the migration)"""
+    return [
+        stock_transaction_movements(_not_procurement_transaction()),
+        return_batch_movements(),
+        procurement_movements(),
+        distribution_group_movements(),
+        direct_distribution_movements(),
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Write path
+# ---------------------------------------------------------------------------
+
+def _entered_status(session, obj, statuses):
+    """True when obj was flushed with a status in `statuses` it did not have before"""
+    if obj.status not in statuses:
+        return False
+    if obj in session.new:
+        return True
+    history = sa_inspect(obj).attrs.status.history
+    return bool(history.added) and not any(s in statuses for s in history.deleted)
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_movements(session, flush_context):
+    """Append ledger rows for the movements written by this flush"""
+    stock_tx_ids = []
+    return_batch_ids = []
+    procurement_ids = []
+    group_ids = []
+    distribution_ids = []
+
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, StockTransaction):
+            if obj in session.new and obj.procurement_id is None:
+                stock_tx_ids.append(obj.id)
+        elif isinstance(obj, ReturnBatch):
+            if _entered_status(session, obj, ('confirmed',)):
+                return_batch_ids.append(obj.id)
+        elif isinstance(obj, Procurement):
+            if _entered_status(session, obj, ('completed',)):
+                procurement_ids.append(obj.id)
+        elif isinstance(obj, DistributionGroup):
+            if _entered_status(session, obj, ('approved', 'distributed')):
+                group_ids.append(obj.id)
+        elif isinstance(obj, Distribution):
+            if obj.distribution_group_id is None and _entered_status(session, obj, ('installed',)):
+                distribution_ids.append(obj.id)
+
+    statements = []
+    if stock_tx_ids:
+        statements.append(stock_transaction_movements(StockTransaction.id.in_(stock_tx_ids)))
+    if return_batch_ids:
+        statements.append(return_batch_movements(ReturnBatch.id.in_(return_batch_ids)))
+    if procurement_ids:
+        statements.append(procurement_movements(Procurement.id.in_(procurement_ids)))
+    if group_ids:
+        statements.append(distribution_group_movements(DistributionGroup.id.in_(group_ids)))
+    if distribution_ids:
+        statements.append(direct_distribution_movements(Distribution.id.in_(distribution_ids)))
+
+    if statements:
+        connection = session.connection()
+        for stmt in statements:
+            connection.execute(stmt)
+
+
+# ---------------------------------------------------------------------------
+# Read path
+# ---------------------------------------------------------------------------
+
+def ledger_filters(warehouse_ids=None, start=None, end=None, movement_types=None):
+    """WHERE criteria shared by the history, recap and chart queries"""
+    criteria = []
+    if warehouse_ids is not None:
+        criteria.append(StockLedger.warehouse_id.in_(warehouse_ids))
+    if start is not None:
+        criteria.append(StockLedger.occurred_at >= start)
+    if end is not None:
+        criteria.append(StockLedger.occurred_at < end)
+    if movement_types:
+        criteria.append(StockLedger.movement_type.in_(movement_types))
+    return criteria
+
+
+def history_query(*criteria):
+    """Ledger rows with item, warehouse, unit and serial details, newest first"""
+    return db.select(
+        StockLedger.id,
+        StockLedger.occurred_at,
+        StockLedger.movement_type,
+        StockLedger.direction,
+        StockLedger.quantity,
+        StockLedger.source_id,
+        StockLedger.source_line_id,
+        StockLedger.reference,
+        StockLedger.note,
+        Item.name.label('item_name'),
+        Item.item_code,
+        Warehouse.name.label('warehouse_name'),
+        Unit.name.label('unit_name'),
+        ItemDetail.serial_number,
+        ItemDetail.serial_unit,
+        Distribution.asset_request_id,
+    ).select_from(StockLedger).outerjoin(
+        Item, StockLedger.item_id == Item.id
+    ).outerjoin(
+        Warehouse, StockLedger.warehouse_id == Warehouse.id
+    ).outerjoin(
+        Unit, StockLedger.unit_id == Unit.id
+    ).outerjoin(
+        ItemDetail, StockLedger.item_detail_id == ItemDetail.id
+    ).outerjoin(
+        Distribution, and_(StockLedger.movement_type == 'direct_distribution',
+                           Distribution.id == StockLedger.source_id)
+    ).where(
+        *criteria
+    ).order_by(
+        StockLedger.occurred_at.desc(), StockLedger.id.desc()
+    )
+
+
+def encode_cursor(row):
+    """Keyset cursor pointing just after `row`"""
+    return f"{row.occurred_at.isoformat()}_{row.id}"
+
+
+def decode_cursor(value):
+    """Parse a cursor from encode_cursor; returns None for missing/invalid values"""
+    if not value:
+        return None
+    try:
+        timestamp, row_id = value.rsplit('_', 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError:
+        return None
+
+
+def history_page(*criteria, cursor=None, per_page=HISTORY_PAGE_SIZE):
+    """
+    One keyset-paginated page of the stock history.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    stmt = history_query(*criteria)
+    position = decode_cursor(cursor)
+    if position is not None:
+        stmt = stmt.where(tuple_(StockLedger.occurred_at, StockLedger.id) < tuple_(*position))
+
+    rows = db.session.execute(stmt.limit(per_page + 1)).all()
+    next_cursor = encode_cursor(rows[per_page - 1]) if len(rows) > per_page else None
+    return rows[:per_page], next_cursor
+
+
+def totals_by_type(*criteria):
+    """{movement_type: total quantity} for the filtered ledger"""
+    rows = db.session.execute(
+        db.select(StockLedger.movement_type, func.sum(StockLedger.quantity))
+        .where(*criteria)
+        .group_by(StockLedger.movement_type)
+    ).all()
+    return {movement_type: int(total or 0) for movement_type, total in rows}
+
+
+def totals_by_warehouse(*criteria):
+    """{(direction, warehouse name): total quantity} for the filtered ledger"""
+    rows = db.session.execute(
+        db.select(StockLedger.direction, Warehouse.name, func.sum(StockLedger.quantity))
+        .select_from(StockLedger)
+        .outerjoin(Warehouse, StockLedger.warehouse_id == Warehouse.id)
+        .where(*criteria)
+        .group_by(StockLedger.direction, Warehouse.name)
+    ).all()
+    return {(direction, name or 'Unknown'): int(total or 0) for direction, name, total in rows}
+
+
+def series_by_bucket(bucket, start_day, end_day, warehouse_ids=None):
+    """
+    IN/OUT quantities between WIB days [start_day, end_day) grouped by
+    `bucket` ('day' or 'month'), read from the daily rollups.
+
+    Returns {bucket number: {'IN': qty, 'OUT': qty}}.
+    """
+    part = func.extract(bucket, StockDailyRollup.day)
+    stmt = db.select(
+        part,
+        func.sum(StockDailyRollup.quantity_in),
+        func.sum(StockDailyRollup.quantity_out)
+    ).where(
+        StockDailyRollup.day >= start_day,
+        StockDailyRollup.day < end_day
+    ).group_by(part)
+    if warehouse_ids is not None:
+        stmt = stmt.where(StockDailyRollup.warehouse_id.in_(warehouse_ids))
+
+    return {
+        int(number): {'IN': int(total_in or 0), 'OUT': int(total_out or 0)}
+        for number, total_in, total_out in db.session.execute(stmt).all()
+    }
+
+
+def available_years():
+    """Years that have at least one ledger row, newest first"""
+    year = wib_extract('year', StockLedger.occurred_at)
+    rows = db.session.execute(
+        db.select(year).distinct().order_by(year.desc())
+    ).scalars().all()
+    return [int(y) for y in rows if y]
@@ -0,0 +1,295 @@
+"""
+Atomic stock mutations.
+
+Stock quantities used to be changed read-modify-write in Python
+(stock.quantity += n; save()), so two concurrent OUT transactions could
+both pass the "enough stock" check and oversell, and concurrent INs could
+lose updates. Here every change is one statement evaluated by PostgreSQL
+against the current row:
+
+- IN: INSERT ... ON CONFLICT (item_id, warehouse_id) DO UPDATE
+  SET quantity = stocks.quantity + excluded.quantity, which also creates
+  missing stock rows;
+- OUT: UPDATE stocks SET quantity = quantity - :q
+  WHERE item_id = ... AND warehouse_id = ... AND quantity >= :q.
+
+Both return the new quantity. apply_stock_transaction() writes the
+StockTransaction (and through it the stock ledger row) in the same
+transaction.
+
+apply_stock_batch() applies many movements at once: it locks the stock
+rows involved, checks every line against the running balance, then
+writes all stock changes with one upsert and all transactions (plus
+their ledger rows) with one insert each. Arrays are passed to unnest()
+so the statements stay the same size for 10 or 10,000 lines.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import and_, any_, bindparam, func, insert, literal, select, update, Integer, String, Text
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from app import db
+from app.models import Item, Stock, StockTransaction, Warehouse
+
+TRANSACTION_TYPES = ('IN', 'OUT')
+
+
+def add_stock(item_id, warehouse_id, quantity):
+    """Add quantity to a stock row (creating it if needed); returns the new quantity"""
+    now = datetime.utcnow()
+    stmt = pg_insert(Stock).values(
+        item_id=item_id, warehouse_id=warehouse_id, quantity=quantity,
+        created_at=now, updated_at=now
+    )
+    return db.session.execute(stmt.on_conflict_do_update(
+        constraint='unique_item_warehouse',
+        set_={'quantity': Stock.quantity + stmt.excluded.quantity, 'updated_at': now}
+    ).returning(Stock.quantity)).scalar_one()
+
+
+def remove_stock(item_id, warehouse_id, quantity):
+    """
+    Take quantity from a stock row if enough is left.
+
+    Returns the new quantity, or None when the row is missing or holds
+    less than quantity (nothing is changed then).
+    """
+    return db.session.execute(
+        update(Stock).where(
+            Stock.item_id == item_id,
+            Stock.warehouse_id == warehouse_id,
+            Stock.quantity >= quantity
+        ).values(
+            quantity=Stock.quantity - quantity, updated_at=datetime.utcnow()
+        ).returning(Stock.quantity).execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+
+
+def stock_exists(item_id, warehouse_id):
+    return db.session.execute(
+        select(Stock.id).where(Stock.item_id == item_id, Stock.warehouse_id == warehouse_id)
+    ).first() is not None
+
+
+def _begin(commit):
+    """SAVEPOINT when the caller owns the transaction (commit=False), else None"""
+    return None if commit else db.session.begin_nested()
+
+
+def _rollback(savepoint):
+    """Undo a failed mutation: only its savepoint, or the whole session"""
+    if savepoint is not None:
+        savepoint.rollback()
+    else:
+        db.session.rollback()
+
+
+def apply_stock_transaction(item_id, warehouse_id, transaction_type, quantity, note=None, commit=True):
+    """
+    Change stock and log the StockTransaction in one transaction.
+
+    Returns (success, message, new_quantity). On failure nothing is
+    written: the session is rolled back, or with commit=False only this
+    call's savepoint, leaving the caller's pending work alone.
+    """
+    if transaction_type not in TRANSACTION_TYPES:
+        return False, 'Jenis transaksi tidak valid', None
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+        return False, 'Jumlah harus berupa angka lebih dari 0', None
+
+    savepoint = _begin(commit)
+    try:
+        if transaction_type == 'IN':
+            new_quantity = add_stock(item_id, warehouse_id, quantity)
+        else:
+            new_quantity = remove_stock(item_id, warehouse_id, quantity)
+            if new_quantity is None:
+                message = 'Stok tidak mencukupi' if stock_exists(item_id, warehouse_id) else 'Stok tidak ditemukan'
+                _rollback(savepoint)
+                return False, message, None
+
+        db.session.add(StockTransaction(
+            item_id=item_id,
+            warehouse_id=warehouse_id,
+            transaction_type=transaction_type,
+            quantity=quantity,
+            note=note
+        ))
+        if commit:
+            db.session.commit()
+        else:
+            savepoint.commit()
+    except Exception:
+        _rollback(savepoint)
+        raise
+
+    return True, 'Transaksi stok berhasil', new_quantity
+
+
+def _array(name, values, item_type):
+    return bindparam(name, list(values), type_=ARRAY(item_type))
+
+
+def _unnest(columns):
+    """
+    Derived table over parallel arrays:
+    unnest(:a, :b, ...) AS rows(a, b, ...). columns maps name -> (values, type).
+    """
+    return func.unnest(*[
+        _array(name, values, item_type) for name, (values, item_type) in columns.items()
+    ]).table_valued(*columns).render_derived()
+
+
+def _parse_movement(line, default_note):
+    """(item_id, warehouse_id, transaction_type, quantity, note) or an error message"""
+    if not isinstance(line, dict):
+        return 'Format baris tidak valid'
+    values = []
+    for field in ('item_id', 'warehouse_id', 'quantity'):
+        value = line.get(field)
+        if not isinstance(value, int) or isinstance(value, bool):
+            return f'{field} harus berupa angka'
+        values.append(value)
+    item_id, warehouse_id, quantity = values
+    if quantity <= 0:
+        return 'Jumlah harus lebih dari 0'
+    transaction_type = line.get('transaction_type')
+    if transaction_type not in TRANSACTION_TYPES:
+        return 'Jenis transaksi tidak valid'
+    note = line.get('note', default_note)
+    return item_id, warehouse_id, transaction_type, quantity, note if note is None else str(note)
+
+
+def _existing_ids(model, ids):
+    return set(db.session.execute(
+        select(model.id).where(model.id == any_(_array('ids', ids, Integer)))
+    ).scalars())
+
+
+def apply_stock_batch(movements, allowed_warehouse_ids=None, note=None, commit=True):
+    """
+    Validate and apply a list of stock movements in one transaction.
+
+    movements: [{'item_id', 'warehouse_id', 'transaction_type', 'quantity',
+    'note' (optional)}, ...], applied in order, so an OUT may use stock
+    brought in by an earlier line. allowed_warehouse_ids restricts the
+    warehouses (None: all).
+
+    All or nothing: returns (success, results) with one result per line
+    ({'line', 'success', 'message', 'balance'}); when any line fails,
+    nothing is written. With commit=False only this call's savepoint is
+    rolled back on failure.
+    """
+    results = []
+    parsed = []
+    for number, line in enumerate(movements):
+        movement = _parse_movement(line, note)
+        if isinstance(movement, str):
+            results.append({'line': number, 'success': False, 'message': movement, 'balance': None})
+            parsed.append(None)
+            continue
+        if allowed_warehouse_ids is not None and movement[1] not in allowed_warehouse_ids:
+            results.append({'line': number, 'success': False,
+                            'message': 'Tidak memiliki akses ke gudang ini', 'balance': None})
+            parsed.append(None)
+            continue
+        results.append({'line': number, 'success': True, 'message': 'OK', 'balance': None})
+        parsed.append(movement)
+
+    valid = [m for m in parsed if m is not None]
+    items = _existing_ids(Item, {m[0] for m in valid}) if valid else set()
+    warehouses = _existing_ids(Warehouse, {m[1] for m in valid}) if valid else set()
+
+    keys = sorted({(m[0], m[1]) for m in valid if m[0] in items and m[1] in warehouses})
+    balances = defaultdict(int)
+    savepoint = _begin(commit)
+    try:
+        if keys:
+            # Lock the stock rows involved (in id order) until commit/rollback
+            requested = _unnest({
+                'item_id': ([k[0] for k in keys], Integer),
+                'warehouse_id': ([k[1] for k in keys], Integer),
+            })
+            for row in db.session.execute(
+                select(Stock.item_id, Stock.warehouse_id, Stock.quantity).join(
+                    requested, and_(
+                        Stock.item_id == requested.c.item_id,
+                        Stock.warehouse_id == requested.c.warehouse_id
+                    )
+                ).order_by(Stock.id).with_for_update(of=Stock)
+            ):
+                balances[(row.item_id, row.warehouse_id)] = row.quantity
+
+        deltas = defaultdict(int)
+        for result, movement in zip(results, parsed):
+            if movement is None:
+                continue
+            item_id, warehouse_id, transaction_type, quantity, _ = movement
+            if item_id not in items:
+                result.update(success=False, message='Barang tidak ditemukan')
+                continue
+            if warehouse_id not in warehouses:
+                result.update(success=False, message='Gudang tidak ditemukan')
+                continue
+            key = (item_id, warehouse_id)
+            if transaction_type == 'OUT' and balances[key] < quantity:
+                result.update(success=False, message=f'Stok tidak mencukupi (tersisa {balances[key]})',
+                              balance=balances[key])
+                continue
+            change = quantity if transaction_type == 'IN' else -quantity
+            balances[key] += change
+            deltas[key] += change
+            result['balance'] = balances[key]
+
+        if not all(result['success'] for result in results):
+            _rollback(savepoint)
+            return False, results
+
+        now = datetime.utcnow()
+        changed = [(key, delta) for key, delta in deltas.items() if delta]
+        if changed:
+            rows = _unnest({
+                'item_id': ([k[0] for k, _ in changed], Integer),
+                'warehouse_id': ([k[1] for k, _ in changed], Integer),
+                'delta': ([d for _, d in changed], Integer),
+            })
+            stmt = pg_insert(Stock).from_select(
+                ['item_id', 'warehouse_id', 'quantity', 'created_at', 'updated_at'],
+                select(rows.c.item_id, rows.c.warehouse_id, rows.c.delta, literal(now), literal(now))
+            )
+            db.session.execute(stmt.on_conflict_do_update(
+                constraint='unique_item_warehouse',
+                set_={'quantity': Stock.quantity + stmt.excluded.quantity, 'updated_at': now}
+            ))
+
+        lines = _unnest({
+            'item_id': ([m[0] for m in valid], Integer),
+            'warehouse_id': ([m[1] for m in valid], Integer),
+            'transaction_type': ([m[2] for m in valid], String),
+            'quantity': ([m[3] for m in valid], Integer),
+            'note': ([m[4] for m in valid], Text),
+        })
+        inserted = db.session.execute(insert(StockTransaction).from_select(
+            ['item_id', 'warehouse_id', 'transaction_type', 'quantity', 'note',
+             'transaction_date', 'created_at', 'updated_at'],
+            select(lines.c.item_id, lines.c.warehouse_id, lines.c.transaction_type, lines.c.quantity,
+                   lines.c.note, literal(now), literal(now), literal(now))
+        ).returning(StockTransaction.id)).scalars().all()
+
+        # Core inserts bypass the ledger's after_flush hook. These rows never
+        # belong to a procurement, so all of them are ledger movements.
+        from app.services.stock_ledger import stock_transaction_movements
+        if inserted:
+            db.session.execute(stock_transaction_movements(
+                StockTransaction.id == any_(_array('transaction_ids', inserted, Integer))
+            ))
+
+        if commit:
+            db.session.commit()
+        else:
+            savepoint.commit()
+    except Exception:
+        _rollback(savepoint)
+        raise
+
+    return True, results
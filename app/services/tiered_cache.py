@@ -0,0 +1,317 @@
+"""
+Two-tier cache for expensive aggregates.
+
+Dashboard statistics and chart data used to live only in the shared
+cache with a short TTL. With SimpleCache every gunicorn worker held its
+own copy, and when an entry expired every concurrent request recomputed
+the same aggregates at once.
+
+get_or_compute() reads through two tiers:
+
+- an in-process LRU, bounded by entry count and total bytes, holding
+  pickled values for a few seconds (LOCAL_CACHE_TTL);
+- the shared Flask-Caching backend (Redis in production; SimpleCache
+  stands in for it in development and tests).
+
+Each shared entry records when it stops being fresh and is kept for
+TIERED_CACHE_STALE_TTL seconds longer. A stale entry is served at once
+while one background refresh recomputes it. A missing entry is
+computed by one caller only (single flight): threads of a worker queue
+on a per-key lock, and workers coordinate through an atomic cache.add()
+lock. The others wait for the result instead of recomputing it.
+
+Hit, miss, stale and compute-latency counters are kept per key family
+and per process; see cache_metrics().
+"""
+
+import logging
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app import cache
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY_PREFIX = 'tiered_lock:'
+WAIT_INTERVAL = 0.05  # Seconds between polls while another worker computes
+
+_MISSING = object()
+
+
+class LocalLRU:
+    """Thread-safe LRU of pickled values, bounded by entries and bytes"""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (expires_at, fresh_until, data)
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        """(value, fresh_until), or _MISSING if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, fresh_until, data = entry
+            if expires_at <= now:
+                self._pop(key)
+                return _MISSING
+            self._entries.move_to_end(key)
+        return pickle.loads(data), fresh_until
+
+    def set(self, key, value, fresh_until, expires_at):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (expires_at, fresh_until, data)
+            self.size += len(data)
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[2])
+
+
+class FamilyMetrics:
+    """Counters of one key family (per process)"""
+    __slots__ = ('local_hits', 'shared_hits', 'stale_hits', 'misses', 'waits',
+                 'computes', 'refreshes', 'errors', 'compute_ms_total', 'compute_ms_max')
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in self.__slots__}
+        lookups = self.local_hits + self.shared_hits + self.stale_hits + self.misses
+        data['hit_ratio'] = round((lookups - self.misses) / lookups, 4) if lookups else None
+        data['compute_ms_avg'] = round(self.compute_ms_total / self.computes, 2) if self.computes else None
+        data['compute_ms_total'] = round(self.compute_ms_total, 2)
+        data['compute_ms_max'] = round(self.compute_ms_max, 2)
+        return data
+
+
+_local = None
+_local_lock = threading.Lock()
+_metrics = {}
+_metrics_lock = threading.Lock()
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+_refreshing = set()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _local_tier(app):
+    """Process-wide LRU, created on first use"""
+    global _local
+    with _local_lock:
+        if _local is None:
+            _local = LocalLRU(app.config.get('LOCAL_CACHE_MAX_ENTRIES', 512),
+                              app.config.get('LOCAL_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    return _local
+
+
+def _get_executor(app):
+    """Background refresh threads, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config.get('TIERED_CACHE_REFRESH_WORKERS', 2),
+                                           thread_name_prefix='cache-refresh')
+    return _executor
+
+
+def _record(family, **counts):
+    with _metrics_lock:
+        metrics = _metrics.get(family)
+        if metrics is None:
+            metrics = _metrics[family] = FamilyMetrics()
+        for name, value in counts.items():
+            if name == 'compute_ms':
+                metrics.compute_ms_total += value
+                metrics.compute_ms_max = max(metrics.compute_ms_max, value)
+            else:
+                setattr(metrics, name, getattr(metrics, name) + value)
+
+
+def _key_lock(key):
+    """Per-key lock for the threads of this process"""
+    with _key_locks_guard:
+        lock = _key_locks.get(key)
+        if lock is None:
+            lock = _key_locks[key] = threading.Lock()
+        return lock
+
+
+def _release_key_lock(key, lock):
+    with _key_locks_guard:
+        if _key_locks.get(key) is lock and not lock.locked():
+            del _key_locks[key]
+
+
+def _read(app, key, now):
+    """(value, fresh_until, tier) from the first tier that has the key"""
+    local = _local_tier(app)
+    entry = local.get(key, now)
+    if entry is not _MISSING and entry[1] > now:
+        return entry[0], entry[1], 'local'
+
+    envelope = cache.get(key)
+    if envelope is None:
+        return _MISSING, None, None
+    value, fresh_until = envelope
+    if fresh_until > now:
+        local_ttl = app.config.get('LOCAL_CACHE_TTL', 5)
+        local.set(key, value, fresh_until, min(fresh_until, now + local_ttl))
+    return value, fresh_until, 'shared'
+
+
+def _compute_and_store(app, family, key, compute, ttl):
+    start = time.perf_counter()
+    try:
+        value = compute()
+    except Exception:
+        _record(family, errors=1)
+        raise
+    _record(family, computes=1, compute_ms=(time.perf_counter() - start) * 1000)
+
+    now = time.time()
+    fresh_until = now + ttl
+    stale_ttl = app.config.get('TIERED_CACHE_STALE_TTL', 300)
+    cache.set(key, (value, fresh_until), timeout=int(ttl + stale_ttl))
+    _local_tier(app).set(key, value, fresh_until, min(fresh_until, now + app.config.get('LOCAL_CACHE_TTL', 5)))
+    return value
+
+
+def _acquire_shared_lock(app, key):
+    """Cross-worker lock (atomic cache.add); returns a token or None"""
+    token = uuid.uuid4().hex
+    timeout = app.config.get('TIERED_CACHE_LOCK_TIMEOUT', 30)
+    return token if cache.add(LOCK_KEY_PREFIX + key, token, timeout=timeout) else None
+
+
+def _release_shared_lock(key, token):
+    if cache.get(LOCK_KEY_PREFIX + key) == token:
+        cache.delete(LOCK_KEY_PREFIX + key)
+
+
+def _refresh(app, family, key, compute, ttl):
+    """Recompute a stale entry (runs in a refresh thread)"""
+    try:
+        with app.app_context():
+            token = _acquire_shared_lock(app, key)
+            if token is None:
+                return  # Another worker is refreshing it
+            try:
+                _compute_and_store(app, family, key, compute, ttl)
+                _record(family, refreshes=1)
+            finally:
+                _release_shared_lock(key, token)
+    except Exception as e:
+        logger.error(f'Cache refresh of {key} failed: {e}')
+    finally:
+        with _key_locks_guard:
+            _refreshing.discard(key)
+
+
+def _schedule_refresh(app, family, key, compute, ttl):
+    with _key_locks_guard:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    _get_executor(app).submit(_refresh, app, family, key, compute, ttl)
+
+
+def get_or_compute(family, key, compute, ttl=None):
+    """
+    Cached value of compute() under `key` (see module docstring).
+
+    `family` groups keys for metrics (e.g. 'dashboard_stats'); ttl is how
+    long a value stays fresh, default CACHE_DEFAULT_TIMEOUT. compute must
+    not depend on the request: stale entries are refreshed in a
+    background thread with only an app context.
+    """
+    app = current_app._get_current_object()
+    ttl = ttl or app.config['CACHE_DEFAULT_TIMEOUT']
+
+    now = time.time()
+    value, fresh_until, tier = _read(app, key, now)
+    if value is not _MISSING:
+        if fresh_until > now:
+            _record(family, **{f'{tier}_hits': 1})
+        else:
+            _record(family, stale_hits=1)
+            _schedule_refresh(app, family, key, compute, ttl)
+        return value
+
+    _record(family, misses=1)
+    lock = _key_lock(key)
+    try:
+        with lock:
+            # Another thread of this worker may have filled it meanwhile
+            value, _, _ = _read(app, key, time.time())
+            if value is not _MISSING:
+                return value
+
+            deadline = time.time() + app.config.get('TIERED_CACHE_LOCK_TIMEOUT', 30)
+            waited = False
+            while True:
+                token = _acquire_shared_lock(app, key)
+                if token is not None:
+                    try:
+                        return _compute_and_store(app, family, key, compute, ttl)
+                    finally:
+                        _release_shared_lock(key, token)
+
+                # Another worker is computing it: wait for its result
+                if not waited:
+                    _record(family, waits=1)
+                    waited = True
+                time.sleep(WAIT_INTERVAL)
+                value, _, _ = _read(app, key, time.time())
+                if value is not _MISSING:
+                    return value
+                if time.time() >= deadline:
+                    # Lock holder died or is too slow: compute without it
+                    return _compute_and_store(app, family, key, compute, ttl)
+    finally:
+        _release_key_lock(key, lock)
+
+
+def cache_metrics():
+    """Per-family counters of this process, plus the local tier's size"""
+    with _metrics_lock:
+        families = {family: metrics.to_dict() for family, metrics in sorted(_metrics.items())}
+    local = _local
+    return {
+        'families': families,
+        'local_entries': len(local) if local is not None else 0,
+        'local_bytes': local.size if local is not None else 0,
+    }
+
+
+def reset_local_cache():
+    """Empty this process's local tier and metrics (benchmarks, tests)"""
+    if _local is not None:
+        _local.clear()
+    with _metrics_lock:
+        _metrics.clear()
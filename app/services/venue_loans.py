@@ -0,0 +1,104 @@
+"""
+Venue loan status transitions.
+
+Starting a venue loan marks every item installed in the room as loaned
+(noting the borrowing unit in specification_notes); completing it
+restores them to used. This used to load each Distribution of the room
+and commit its ItemDetail one at a time, and the scheduler repeated that
+loan by loan. Here a transition is one
+UPDATE item_details ... FROM distributions, venue_loans for all loans
+involved, and a scheduler tick is a handful of statements in one
+transaction.
+
+The tick takes a transaction-scoped advisory lock first, so when every
+gunicorn worker runs the scheduler only one of them does the work.
+"""
+
+from sqlalchemy import any_, bindparam, case, func, select, update, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from app import db
+from app.models import Distribution, ItemDetail, Unit, VenueLoan
+
+# Arbitrary application-wide key of the scheduler's advisory lock
+SCHEDULER_LOCK_KEY = 72_010_001
+
+
+def set_room_items_status(loan_ids, new_status, note_prefix=None):
+    """
+    Set the status of every item installed in the rooms of the given loans.
+
+    With note_prefix, '<note_prefix><borrower unit name>' is appended to
+    specification_notes (' | ' separated). Nothing is committed.
+    """
+    loan_ids = list(loan_ids)
+    if not loan_ids:
+        return 0
+
+    values = {'status': new_status}
+    criteria = [
+        Distribution.item_detail_id == ItemDetail.id,
+        Distribution.unit_detail_id == VenueLoan.unit_detail_id,
+        VenueLoan.id == any_(bindparam('loan_ids', loan_ids, type_=ARRAY(Integer))),
+    ]
+    if note_prefix:
+        note = note_prefix + Unit.name
+        values['specification_notes'] = case(
+            (func.coalesce(ItemDetail.specification_notes, '') == '', note),
+            else_=ItemDetail.specification_notes + ' | ' + note
+        )
+        criteria.append(Unit.id == VenueLoan.borrower_unit_id)
+
+    return db.session.execute(
+        update(ItemDetail).where(*criteria).values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def complete_due_loans(now):
+    """Complete active loans whose end time has passed; returns their ids"""
+    loan_ids = db.session.execute(
+        update(VenueLoan).where(
+            VenueLoan.status == 'active',
+            VenueLoan.end_datetime < now
+        ).values(status='completed', completed_at=now)
+        .returning(VenueLoan.id).execution_options(synchronize_session=False)
+    ).scalars().all()
+    set_room_items_status(loan_ids, 'used')
+    return loan_ids
+
+
+def start_due_loans(now):
+    """Start approved loans whose start time has been reached; returns their ids"""
+    loan_ids = db.session.execute(
+        update(VenueLoan).where(
+            VenueLoan.status == 'approved',
+            VenueLoan.start_datetime <= now
+        ).values(status='active')
+        .returning(VenueLoan.id).execution_options(synchronize_session=False)
+    ).scalars().all()
+    set_room_items_status(loan_ids, 'loaned', note_prefix='Dipinjam - ')
+    return loan_ids
+
+
+def process_due_loans(now):
+    """
+    Run one scheduler tick in a single transaction.
+
+    Loans are completed before others are started, so a room handed from
+    one loan straight to the next ends up loaned. Returns
+    (started_ids, completed_ids), or None when another process holds the
+    scheduler lock.
+    """
+    try:
+        if not db.session.execute(select(func.pg_try_advisory_xact_lock(SCHEDULER_LOCK_KEY))).scalar():
+            db.session.rollback()
+            return None
+
+        completed = complete_due_loans(now)
+        started = start_due_loans(now)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return started, completed
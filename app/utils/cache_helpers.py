@@ -1,127 +1,190 @@
 """
 Cache helper utilities for frequently accessed data.
 Reduces database queries and improves performance.
+
+Cached entries are invalidated through tags instead of by key. A tag is
+a table name ('items', 'stocks', 'distributions', ...) with a version
+token in the cache; every cache key embeds the versions of the tags its
+value was computed from. Any committed write to a table replaces that
+tag's version (see the Session hooks at the bottom), so invalidation is
+one cache write per tag and entries built from older data are simply
+never looked up again. Keys are namespaced by the function that
+produced them; the namespace is also the metrics family of the
+two-tier cache (app/services/tiered_cache.py) the values are read
+through.
 """
 
+import hashlib
+import time
 from functools import wraps
-from flask import current_app
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 from app import cache
 
+TAG_VERSION_PREFIX = 'tag_version_'
 
-def cache_frequently_accessed(timeout=None):
-    """
-    Decorator to cache frequently accessed data.
-    Default timeout is 5 minutes (300 seconds).
-    """
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            # Generate cache key
-            cache_key = f"{f.__name__}_{str(args)}_{str(kwargs)}"
 
-            # Try to get from cache
-            cached_value = cache.get(cache_key)
-            if cached_value is not None:
-                return cached_value
+def _tag_version_key(tag):
+    return f"{TAG_VERSION_PREFIX}{tag}"
 
-            # Execute function and cache result
-            result = f(*args, **kwargs)
-            cache_timeout = timeout or current_app.config['CACHE_DEFAULT_TIMEOUT']
-            cache.set(cache_key, result, timeout=cache_timeout)
 
-            return result
-        return decorated_function
-    return decorator
+def get_tag_versions(tags):
+    """Current version tokens of tags (one cache round trip)"""
+    tags = sorted(set(tags))
+    if not tags:
+        return {}
+    versions = dict(zip(tags, cache.get_many(*[_tag_version_key(t) for t in tags])))
+    missing = [tag for tag, version in versions.items() if version is None]
+    if missing:
+        # Unknown (evicted or first use): start fresh versions so that
+        # entries cached under older tokens can never be served again
+        versions.update(invalidate_tags(*missing))
+    return versions
+
+
+def invalidate_tags(*tags):
+    """Replace the version of each tag, invalidating every entry built from it"""
+    version = str(time.time_ns())
+    versions = {tag: version for tag in tags}
+    if versions:
+        cache.set_many({_tag_version_key(t): v for t, v in versions.items()}, timeout=0)
+    return versions
 
 
-def clear_cache_pattern(pattern):
+def tagged_key(namespace, tags, *parts):
+    """Cache key for `namespace` that changes whenever one of `tags` is invalidated"""
+    versions = get_tag_versions(tags)
+    token = hashlib.sha1(repr((sorted(versions.items()), parts)).encode('utf-8')).hexdigest()
+    return f"{namespace}:{token}"
+
+
+def get_or_set_tagged(namespace, tags, compute, *parts, timeout=None):
     """
-    Clear all cache keys matching a pattern.
-    Useful when data is updated.
+    Cached value of compute() under tagged_key(namespace, tags, *parts).
+    Default timeout is CACHE_DEFAULT_TIMEOUT; after it the value is served
+    stale while it is refreshed (see tiered_cache.get_or_compute).
     """
-    # Note: This requires Redis backend to work efficiently
-    # For SimpleCache, we'll just clear everything
-    try:
-        cache.clear()
-    except Exception:
-        pass
+    from app.services.tiered_cache import get_or_compute
+    return get_or_compute(namespace, tagged_key(namespace, tags, *parts), compute, ttl=timeout)
 
 
-def get_user_warehouse_ids(user):
+def cache_frequently_accessed(timeout=None, tags=(), per_user=False):
     """
-    Get user warehouse IDs with caching.
-    This is one of the most frequently accessed patterns.
+    Decorator to cache frequently accessed data.
+    Default timeout is CACHE_DEFAULT_TIMEOUT.
+
+    The key is namespaced by the function and includes its arguments,
+    the versions of `tags` and, with per_user=True, the current user.
+    Cache plain data (dicts, lists, tuples), not responses or ORM objects,
+    and do not read the request in f: stale values are refreshed in the
+    background.
     """
-    cache_key = f"user_warehouses_{user.id}"
+    def decorator(f):
+        namespace = f"{f.__module__}.{f.__qualname__}"
 
-    cached_ids = cache.get(cache_key)
-    if cached_ids is not None:
-        return cached_ids
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            parts = (args, sorted(kwargs.items()))
+            if per_user:
+                parts += (current_user.get_id(),)
+            return get_or_set_tagged(namespace, tags, lambda: f(*args, **kwargs), *parts, timeout=timeout)
+        return decorated_function
+    return decorator
 
-    warehouse_ids = [uw.warehouse_id for uw in user.user_warehouses.all()]
-    cache.set(cache_key, warehouse_ids, timeout=300)
 
-    return warehouse_ids
+def get_user_warehouse_ids(user):
+    """
+    Get user warehouse IDs with caching.
+    This is one of the most frequently accessed patterns, so it is
+    answered from the user's access scope (app/services/access_scope.py).
+    """
+    from app.services.access_scope import get_access_scope
+    return list(get_access_scope(user).warehouse_ids)
 
 
 def invalidate_user_warehouses(user_id):
     """Invalidate cached warehouse IDs for a user."""
-    cache.delete(f"user_warehouses_{user_id}")
+    from app.services.access_scope import invalidate_access_scope
+    invalidate_access_scope(user_id)
 
 
+@cache_frequently_accessed(timeout=300, tags=('items', 'categories'))
 def get_form_choices():
     """
     Get common form choices with caching.
     Reduces repetitive queries for items, categories, suppliers.
     """
-    cache_key = "form_choices_all"
-
-    cached_choices = cache.get(cache_key)
-    if cached_choices is not None:
-        return cached_choices
-
     from app.models import Item, Category
 
-    choices = {
+    return {
         'items': [(i.id, f"{i.item_code} - {i.name}") for i in Item.query.all()],
         'categories': [(c.id, c.name) for c in Category.query.all()],
     }
 
-    cache.set(cache_key, choices, timeout=300)
-
-    return choices
-
 
 def invalidate_form_choices():
     """Invalidate cached form choices."""
-    cache.delete("form_choices_all")
+    invalidate_tags('items', 'categories')
 
 
+@cache_frequently_accessed(timeout=60, tags=('items', 'warehouses', 'procurements', 'distributions'))
 def get_dashboard_stats():
     """
     Get dashboard statistics with caching.
     Dashboard is accessed frequently but data changes slowly.
     """
-    cache_key = "dashboard_stats"
-
-    cached_stats = cache.get(cache_key)
-    if cached_stats is not None:
-        return cached_stats
-
     from app.models import Item, Warehouse, Procurement, Distribution
 
-    stats = {
+    return {
         'total_items': Item.query.count(),
         'total_warehouses': Warehouse.query.count(),
         'pending_procurements': Procurement.query.filter_by(status='pending').count(),
         'active_distributions': Distribution.query.filter_by(status='in_transit').count(),
     }
 
-    cache.set(cache_key, stats, timeout=60)  # Cache for 1 minute
-
-    return stats
-
 
 def invalidate_dashboard_stats():
     """Invalidate cached dashboard statistics."""
-    cache.delete("dashboard_stats")
+    invalidate_tags('items', 'warehouses', 'procurements', 'distributions')
+
+
+# Tag invalidation: record the tables written by a transaction and bump
+# their tags once it has committed, so a concurrent request cannot cache
+# pre-commit data under the new version.
+def _mark_tags(session, tables):
+    session.info.setdefault('cache_tags_dirty', set()).update(tables)
+
+
+@event.listens_for(Session, 'after_flush')
+def _tag_flushed_tables(session, flush_context):
+    """Tables of the rows inserted, updated or deleted by this flush"""
+    tables = {obj.__table__.name for obj in session.new}
+    tables.update(obj.__table__.name for obj in session.deleted)
+    tables.update(obj.__table__.name for obj in session.dirty
+                  if session.is_modified(obj, include_collections=False))
+    if tables:
+        _mark_tags(session, tables)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _tag_bulk_statements(orm_execute_state):
+    """Bulk INSERT/UPDATE/DELETE statements run through the session"""
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            _mark_tags(orm_execute_state.session, {table.name})
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_tags_after_commit(session):
+    """Bump the tags of a committed transaction"""
+    tables = session.info.pop('cache_tags_dirty', None)
+    if tables:
+        invalidate_tags(*tables)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _clear_tags_after_rollback(session):
+    """Rolled back writes never invalidate anything"""
+    session.info.pop('cache_tags_dirty', None)
@@ -2,6 +2,7 @@
 Datetime helper functions for timezone handling
 """
 from datetime import datetime, timezone, timedelta
+from sqlalchemy import and_, func
 
 
 # GMT+7 timezone (WIB - Waktu Indonesia Barat)
@@ -51,3 +52,82 @@ def format_wib_datetime(dt, format_str='%d/%m/%Y %H:%M'):
 
     # Return as naive datetime string (without timezone info)
     return wib_dt.replace(tzinfo=None).strftime(format_str)
+
+
+def wib_period_range(year, month=None, day=None):
+    """
+    Convert a WIB calendar period into a half-open [start, end) range
+    of naive UTC datetimes, matching how timestamps are stored.
+
+    Pass only a year for the whole year, year+month for a month and
+    year+month+day for a single day.
+    """
+    if day is not None:
+        start = datetime(year, month, day)
+        end = start + timedelta(days=1)
+    elif month is not None:
+        start = datetime(year, month, 1)
+        end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    else:
+        start = datetime(year, 1, 1)
+        end = datetime(year + 1, 1, 1)
+
+    # WIB midnight is 17:00 UTC of the previous day
+    offset = timedelta(hours=7)
+    return start - offset, end - offset
+
+
+# Years whose WIB range, shifted to UTC, still fits in a datetime
+MIN_PERIOD_YEAR = 2
+MAX_PERIOD_YEAR = 9998
+
+
+def clamp_period(year, month=None):
+    """
+    Clamp a year/month taken from query parameters into the range
+    wib_period_range() accepts, so a bad URL shows an empty period
+    instead of raising.
+    """
+    year = min(max(year, MIN_PERIOD_YEAR), MAX_PERIOD_YEAR)
+    if month is not None:
+        month = min(max(month, 1), 12)
+    return year, month
+
+
+def period_filter(column, year, month=None, day=None):
+    """
+    Sargable WHERE clause selecting a WIB calendar period on a UTC column.
+
+    Use this instead of extract('year'/'month', column) == ... so that
+    indexes on the column can be used.
+    """
+    start, end = wib_period_range(year, month, day)
+    return and_(column >= start, column < end)
+
+
+def wib_extract(field, column):
+    """extract(field) of a UTC column, evaluated on the WIB calendar (for GROUP BY)"""
+    return func.extract(field, column + timedelta(hours=7))
+
+
+def format_date_indonesian(date_obj, format_str='%d %B %Y'):
+    """Format date to Indonesian locale"""
+    month_mapping = {
+        'January': 'Januari',
+        'February': 'Februari',
+        'March': 'Maret',
+        'April': 'April',
+        'May': 'Mei',
+        'June': 'Juni',
+        'July': 'Juli',
+        'August': 'Agustus',
+        'September': 'September',
+        'October': 'Oktober',
+        'November': 'November',
+        'December': 'Desember'
+    }
+
+    formatted = date_obj.strftime(format_str)
+    for eng, indo in month_mapping.items():
+        formatted = formatted.replace(eng, indo)
+    return formatted
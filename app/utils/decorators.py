@@ -31,8 +31,8 @@ def warehouse_access_required(f):
 
         if current_user.is_warehouse_staff():
             # Check if user has any warehouse assignments via UserWarehouse
-            user_warehouse_count = current_user.user_warehouses.count()
-            if user_warehouse_count == 0:
+            from app.services.access_scope import get_access_scope
+            if not get_access_scope().warehouse_ids:
                 flash('Anda belum ditugaskan ke gudang manapun.', 'danger')
                 return redirect(url_for('dashboard.index'))
 
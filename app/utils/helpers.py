@@ -83,21 +83,30 @@ def get_low_stock_items(threshold=10):
 
 def get_user_warehouse_id(user):
     """Helper function to get warehouse_id from UserWarehouse relationship"""
-    from app.models.user import UserWarehouse
+    from app.services.access_scope import get_access_scope
 
     if not user or not user.is_authenticated:
         return None
 
-    if user.is_admin():
-        return None  # Admin can access all warehouses
+    # None for admins: they can access all warehouses
+    return get_access_scope(user).warehouse_id
 
-    # For warehouse_staff, get their assigned warehouse
-    user_warehouse = UserWarehouse.query.filter_by(user_id=user.id).first()
-    return user_warehouse.warehouse_id if user_warehouse else None
+
+# Tables the dashboard statistics are computed from (cache tags, see cache_helpers)
+DASHBOARD_STATS_TAGS = ('items', 'item_details', 'stocks', 'warehouses', 'units', 'distributions')
+WAREHOUSE_DASHBOARD_STATS_TAGS = ('items', 'stocks')
+UNIT_DASHBOARD_STATS_TAGS = ('items', 'item_details', 'distributions')
+DIVISION_STATS_TAGS = ('units', 'item_details', 'distributions')
 
 
 def get_dashboard_stats(warehouse_id=None):
-    """Get dashboard statistics"""
+    """Get dashboard statistics (cached until one of DASHBOARD_STATS_TAGS changes)"""
+    from app.utils.cache_helpers import get_or_set_tagged
+    return get_or_set_tagged('dashboard_stats', DASHBOARD_STATS_TAGS,
+                             lambda: _compute_dashboard_stats(warehouse_id), warehouse_id)
+
+
+def _compute_dashboard_stats(warehouse_id=None):
     from app.models import Item, ItemDetail, Stock, Warehouse, Unit, Distribution
     from app import db
 
@@ -149,7 +158,12 @@ def get_dashboard_stats(warehouse_id=None):
     if warehouse_id:
         low_stock_query = low_stock_query.filter(Stock.warehouse_id == warehouse_id)
     stats['low_stock_count'] = low_stock_query.count()
-    stats['low_stock_items'] = low_stock_query.order_by(Stock.quantity.asc()).all()
+    stats['low_stock_items'] = [
+        {'item_id': s.item_id, 'warehouse_id': s.warehouse_id, 'quantity': s.quantity}
+        for s in low_stock_query.order_by(Stock.quantity.asc()).with_entities(
+            Stock.item_id, Stock.warehouse_id, Stock.quantity
+        )
+    ]
 
     # Item details by status
     item_detail_query = ItemDetail.query
@@ -169,7 +183,7 @@ def get_dashboard_stats(warehouse_id=None):
 
 
 def get_warehouse_dashboard_stats(warehouse_id):
-    """Get warehouse dashboard statistics for specific warehouse
+    """Get warehouse dashboard statistics for specific warehouse (cached)
 
     Args:
         warehouse_id: Warehouse ID to get stats for
@@ -177,6 +191,12 @@ def get_warehouse_dashboard_stats(warehouse_id):
     Returns:
         dict: Statistics including keyword-based item counts for that warehouse
     """
+    from app.utils.cache_helpers import get_or_set_tagged
+    return get_or_set_tagged('warehouse_dashboard_stats', WAREHOUSE_DASHBOARD_STATS_TAGS,
+                             lambda: _compute_warehouse_dashboard_stats(warehouse_id), warehouse_id)
+
+
+def _compute_warehouse_dashboard_stats(warehouse_id):
     from app.models import Item, ItemDetail, Stock
     from app import db
 
@@ -218,7 +238,7 @@ def get_warehouse_dashboard_stats(warehouse_id):
 
 
 def get_unit_dashboard_stats(unit_ids):
-    """Get unit dashboard statistics for specific units
+    """Get unit dashboard statistics for specific units (cached)
 
     Args:
         unit_ids: List of unit IDs to get stats for
@@ -226,6 +246,13 @@ def get_unit_dashboard_stats(unit_ids):
     Returns:
         dict: Statistics including keyword-based item counts for those units
     """
+    from app.utils.cache_helpers import get_or_set_tagged
+    unit_ids = sorted(unit_ids)
+    return get_or_set_tagged('unit_dashboard_stats', UNIT_DASHBOARD_STATS_TAGS,
+                             lambda: _compute_unit_dashboard_stats(unit_ids), unit_ids)
+
+
+def _compute_unit_dashboard_stats(unit_ids):
     from app.models import Item, ItemDetail, Distribution, UnitDetail
     from app import db
 
@@ -270,13 +297,18 @@ def get_unit_dashboard_stats(unit_ids):
 
 
 def get_admin_division_stats():
-    """Get division statistics for admin dashboard
+    """Get division statistics for admin dashboard (cached)
 
     Returns stats for the 4 main divisions: Jaringan, Server, Sistem Informasi, Perlengkapan Umum
 
     Returns:
         list: List of dicts containing unit info and item counts
     """
+    from app.utils.cache_helpers import get_or_set_tagged
+    return get_or_set_tagged('admin_division_stats', DIVISION_STATS_TAGS, _compute_admin_division_stats)
+
+
+def _compute_admin_division_stats():
     from app.models import Unit, Item, ItemDetail, Distribution
     from app import db
 
@@ -325,128 +357,19 @@ def get_admin_division_stats():
             'icon': division['icon'],
             'color': division['color'],
             'count': item_count,
-            'units': units  # List of all units in this division
+            'units': [{'id': u.id, 'name': u.name} for u in units]  # All units in this division
         })
 
     return result
 
 
 def notification_counts():
-    """Context processor to provide notification counts to templates"""
-    from flask_login import current_user
-    # Check if current_user exists and is authenticated
-    if not current_user or not current_user.is_authenticated:
-        return {
-            'pending_request_count': 0,
-            'verified_request_count': 0,
-            'draft_distribution_count': 0,
-            'pending_distribution_count': 0,
-            'pending_procurement_count': 0
-        }
-
-    from app.models import AssetRequest, UserUnit, Distribution, DistributionGroup, Procurement
-
-    counts = {
-        'pending_request_count': 0,
-        'verified_request_count': 0,
-        'draft_distribution_count': 0,
-        'pending_distribution_count': 0,
-        'pending_procurement_count': 0
-    }
+    """Context processor to provide notification counts to templates
 
-    try:
-        if current_user.is_admin():
-            # ADMIN NOTIFICATIONS
-
-            # 1. Permohonan Unit: Status 'pending' (menunggu verifikasi admin)
-            counts['pending_request_count'] = AssetRequest.query.filter_by(status='pending').count()
-
-            # 2. Procurement: Status 'pending' (menunggu persetujuan admin)
-            pending_proc = Procurement.query.filter_by(status='pending').count()
-            counts['pending_procurement_count'] = pending_proc
-            print(f"DEBUG Admin {current_user.name}: pending_procurement_count={pending_proc}")
-
-            # 3. Distribusi Langsung: Draft batch yang is_draft=True (menunggu verifikasi admin)
-            counts['draft_distribution_count'] = DistributionGroup.query.filter_by(is_draft=True).count()
-
-            # Admin tidak butuh notifikasi 'verified_request_count' dan 'pending_distribution_count'
-            counts['verified_request_count'] = 0
-            counts['pending_distribution_count'] = 0
-
-        elif current_user.is_warehouse_staff():
-            # WAREHOUSE STAFF NOTIFICATIONS
-            from app.models.user import UserWarehouse
-
-            # Get warehouse from UserWarehouse relationship
-            user_warehouse = UserWarehouse.query.filter_by(user_id=current_user.id).first()
-
-            if user_warehouse:
-                # Warehouse staff hanya melihat:
-                # 1. Distribusi Langsung: Draft batch dari warehouse mereka (is_draft=True)
-                counts['draft_distribution_count'] = DistributionGroup.query.filter_by(
-                    warehouse_id=user_warehouse.warehouse_id,
-                    is_draft=True
-                ).count()
-
-                # 2. Procurement: Status 'approved' (siap diterima)
-                approved_procurements = Procurement.query.filter_by(status='approved').count()
-                counts['pending_procurement_count'] = approved_procurements
-                print(f"DEBUG Warehouse Staff {current_user.name}: approved_procurement_count={approved_procurements}")
-            else:
-                # If no warehouse assigned, no notifications
-                counts['draft_distribution_count'] = 0
-                counts['pending_procurement_count'] = 0
-
-            # Warehouse staff tidak butuh notifikasi lain
-            counts['pending_request_count'] = 0
-            counts['verified_request_count'] = 0
-            counts['pending_distribution_count'] = 0
-
-        elif current_user.is_unit_staff():
-            # UNIT STAFF NOTIFICATIONS
-
-            # Get user's assigned units
-            user_unit_ids = [uu.unit_id for uu in UserUnit.query.filter_by(user_id=current_user.id).all()]
-
-            if user_unit_ids:
-                # 1. Permohonan Unit: Status 'pending' (menunggu verifikasi admin) - untuk sidebar "Daftar Permohonan"
-                pending_reqs = AssetRequest.query.filter(
-                    AssetRequest.unit_id.in_(user_unit_ids),
-                    AssetRequest.status == 'pending'
-                ).all()
-                counts['pending_request_count'] = len(pending_reqs)
-
-                # Debug: print hasil
-                print(f"DEBUG Unit Staff {current_user.name}: unit_ids={user_unit_ids}, pending_count={counts['pending_request_count']}")
-
-                # 2. Permohonan Unit: Status 'verified' (siap didistribusikan warehouse)
-                counts['verified_request_count'] = AssetRequest.query.filter(
-                    AssetRequest.unit_id.in_(user_unit_ids),
-                    AssetRequest.status == 'verified'
-                ).count()
-
-                # 3. Terima Distribusi: Batch approved yang siap diterima
-                # (verification_status='pending', status in 'installing'/'in_transit')
-                counts['pending_distribution_count'] = DistributionGroup.query.filter(
-                    DistributionGroup.is_draft == False,
-                    DistributionGroup.status == 'approved'
-                ).join(Distribution).filter(
-                    Distribution.unit_id.in_(user_unit_ids),
-                    Distribution.verification_status == 'pending',
-                    Distribution.status.in_(['installing', 'in_transit'])
-                ).distinct().count()
-
-            # Unit staff tidak butuh notifikasi draft_distribution_count dan pending_procurement_count
-            counts['draft_distribution_count'] = 0
-            counts['pending_procurement_count'] = 0
+    Counts are computed once per request and cached per user, see
+    app/services/notification_counts.py.
+    """
+    from flask_login import current_user
+    from app.services.notification_counts import get_notification_counts
 
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        counts['pending_request_count'] = 0
-        counts['verified_request_count'] = 0
-        counts['draft_distribution_count'] = 0
-        counts['pending_distribution_count'] = 0
-        counts['pending_procurement_count'] = 0
-
-    return counts
+    return get_notification_counts(current_user)
@@ -26,6 +26,45 @@ class Connection:
                 pass
 
 
+def open_smtp_connection(config):
+    """
+    Open an authenticated SMTP connection using the MAIL_* settings.
+
+    Plain SMTP + STARTTLS or implicit SSL depending on MAIL_USE_TLS /
+    MAIL_USE_SSL. The caller is responsible for quitting it.
+    """
+    host = config.get('MAIL_SERVER', 'smtp.gmail.com')
+    port = config.get('MAIL_PORT', 587)
+    use_tls = config.get('MAIL_USE_TLS', True)
+    use_ssl = config.get('MAIL_USE_SSL', False)
+    username = config.get('MAIL_USERNAME')
+    password = config.get('MAIL_PASSWORD')
+    timeout = config.get('MAIL_TIMEOUT', 30)
+
+    conn = None
+    try:
+        if use_ssl:
+            conn = smtplib.SMTP_SSL(host, port, timeout=timeout)
+        else:
+            conn = smtplib.SMTP(host, port, timeout=timeout)
+
+        if use_tls and not use_ssl:
+            conn.starttls()
+
+        if username and password:
+            conn.login(username, password)
+
+        return conn
+
+    except Exception:
+        if conn:
+            try:
+                conn.quit()
+            except:
+                pass
+        raise
+
+
 class SSLMail(Mail):
     """
     Custom Mail class that supports both TLS and SSL connections
@@ -34,40 +73,11 @@ class SSLMail(Mail):
     @contextmanager
     def connect(self):
         """Override connect to support SSL connection"""
-        host = current_app.config.get('MAIL_SERVER', 'smtp.gmail.com')
-        port = current_app.config.get('MAIL_PORT', 587)
-        use_tls = current_app.config.get('MAIL_USE_TLS', True)
-        use_ssl = current_app.config.get('MAIL_USE_SSL', False)
-        username = current_app.config.get('MAIL_USERNAME')
-        password = current_app.config.get('MAIL_PASSWORD')
-        timeout = current_app.config.get('MAIL_TIMEOUT', 30)
-
-        conn = None
+        conn = open_smtp_connection(current_app.config)
         try:
-            if use_ssl:
-                conn = smtplib.SMTP_SSL(host, port, timeout=timeout)
-            else:
-                conn = smtplib.SMTP(host, port, timeout=timeout)
-
-            if use_tls and not use_ssl:
-                conn.starttls()
-
-            if username and password:
-                conn.login(username, password)
-
             yield Connection(conn)
-
-        except Exception:
-            if conn:
-                try:
-                    conn.quit()
-                except:
-                    pass
-            raise
-
         finally:
-            if conn:
-                try:
-                    conn.quit()
-                except:
-                    pass
+            try:
+                conn.quit()
+            except:
+                pass
@@ -71,7 +71,7 @@ class PaginatedResponse:
         return self.paginate()
 
 
-def paginated_response(query, serializer=None, max_per_page=100):
+def paginated_response(query, serializer=None, max_per_page=100, batch_loader=None):
     """
     Decorator/function to create paginated API responses
 
@@ -79,6 +79,8 @@ def paginated_response(query, serializer=None, max_per_page=100):
         query: SQLAlchemy query object
         serializer: Optional serializer function (uses to_dict() if not provided)
         max_per_page: Maximum items per page
+        batch_loader: Optional function called once with the page items
+            before serializing (e.g. to load per-row counts in one query)
 
     Returns:
         dict: Paginated response
@@ -101,6 +103,9 @@ def paginated_response(query, serializer=None, max_per_page=100):
         error_out=False
     )
 
+    if batch_loader:
+        batch_loader(pagination.items)
+
     # Serialize data
     if serializer:
         data = [serializer(item) for item in pagination.items]
@@ -6,6 +6,7 @@ Centralizes common query patterns across the application
 from flask_login import current_user
 from app import db
 from app.models import Item, Category, UserWarehouse, UserUnit
+from app.services.access_scope import get_access_scope
 
 
 def get_user_warehouse_query(model_class):
@@ -26,7 +27,7 @@ def get_user_warehouse_query(model_class):
         if hasattr(model_class, 'warehouse_id'):
             # Model has warehouse_id column
             if current_user.is_warehouse_staff():
-                user_warehouse_ids = [uw.warehouse_id for uw in current_user.user_warehouses.all()]
+                user_warehouse_ids = list(get_access_scope().warehouse_ids)
                 if user_warehouse_ids:
                     query = query.filter(model_class.warehouse_id.in_(user_warehouse_ids))
                 else:
@@ -53,7 +54,7 @@ def get_user_unit_query(model_class):
     if current_user.is_authenticated and current_user.is_unit_staff():
         if hasattr(model_class, 'unit_id'):
             # Model has unit_id column
-            user_unit_ids = [uu.unit_id for uu in current_user.user_units.all()]
+            user_unit_ids = list(get_access_scope().unit_ids)
             if user_unit_ids:
                 query = query.filter(model_class.unit_id.in_(user_unit_ids))
             else:
@@ -131,25 +132,15 @@ def get_dashboard_statistics_cached():
 def invalidate_related_caches(model_instance):
     """
     Invalidate caches related to a model instance
-    Call this after creating/updating/deleting records
+    Committed writes already do this (see cache_helpers); call it only
+    after changing rows outside the ORM session, e.g. with raw SQL
 
     Args:
         model_instance: Model instance that was modified
     """
-    from app.utils.cache_helpers import (
-        invalidate_form_choices,
-        invalidate_dashboard_stats
-    )
-
-    model_name = model_instance.__class__.__name__
-
-    # Invalidate form choices cache
-    if model_name in ['Item', 'Category']:
-        invalidate_form_choices()
+    from app.utils.cache_helpers import invalidate_tags
 
-    # Invalidate dashboard stats
-    if model_name in ['Item', 'Stock', 'Procurement', 'Distribution', 'Warehouse']:
-        invalidate_dashboard_stats()
+    invalidate_tags(model_instance.__table__.name)
 
 
 def get_user_warehouse_ids_cached(user):
@@ -178,9 +169,7 @@ def get_user_unit_ids_cached(user):
     Returns:
         list: List of unit IDs
     """
-    # Similar to get_user_warehouse_ids_cached
-    # Can be added to cache_helpers.py
-    return [uu.unit_id for uu in user.user_units.all()]
+    return list(get_access_scope(user).unit_ids)
 
 
 def with_eager_loading(query, *relations):
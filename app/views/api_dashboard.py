@@ -49,3 +49,16 @@ def api_admin_stats():
         'success': True,
         'stats': stats
     })
+
+
+@bp.route('/cache-metrics')
+@login_required
+@role_required('admin')
+def api_cache_metrics():
+    """Two-tier cache hit/miss/latency counters of the worker serving this request"""
+    from app.services.tiered_cache import cache_metrics
+
+    return jsonify({
+        'success': True,
+        'metrics': cache_metrics()
+    })
@@ -1,9 +1,10 @@
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
-from app.models import Item, ItemDetail, Category
+from app.models import Item, Category
 from app import db
 from app.utils.pagination_helpers import paginated_response
 from app.utils.cache_helpers import cache_frequently_accessed
+from app.services.item_counts import load_item_counts, serialize_item
 
 bp = Blueprint('api_items', __name__)
 
@@ -35,48 +36,73 @@ def api_list():
     # Apply eager loading for better performance
     query = query.options(db.joinedload(Item.category))
 
-    # Return paginated response
-    return jsonify(paginated_response(query, max_per_page=100))
+    # Return paginated response; counts for the whole page come from one query
+    return jsonify(paginated_response(
+        query, serializer=serialize_item, max_per_page=100, batch_loader=load_item_counts
+    ))
 
 
 @bp.route('/categories')
 @login_required
-@cache_frequently_accessed(timeout=300)  # Cache for 5 minutes
 def api_categories():
-    """Get all categories (cached)"""
-    categories = Category.query.all()
+    """Get all categories (cached until a category changes)"""
     return jsonify({
         'success': True,
-        'categories': [cat.to_dict() for cat in categories]
+        'categories': _category_list()
     })
 
 
+@cache_frequently_accessed(tags=('categories',))
+def _category_list():
+    return [cat.to_dict() for cat in Category.query.all()]
+
+
 @bp.route('/<int:id>')
 @login_required
 def api_detail(id):
     """Get item detail"""
     item = Item.query.options(db.joinedload(Item.category)).get_or_404(id)
+    load_item_counts([item])
     return jsonify({
         'success': True,
-        'item': item.to_dict()
+        'item': serialize_item(item)
     })
 
 
 @bp.route('/<int:id>/item-details')
 @login_required
 def api_item_details(id):
-    """Get item details (serial numbers) for item with pagination"""
-    # Get base query
-    query = ItemDetail.query.filter_by(item_id=id)
-
-    # Apply eager loading
-    query = query.options(
-        db.joinedload(ItemDetail.item),
-        db.joinedload(ItemDetail.warehouse)
+    """
+    Get item details (serial numbers) for item with keyset pagination
+
+    Query params: status, location (warehouse:<id> | unit:<id>), search,
+    after (id cursor from pagination.next_after), per_page.
+    """
+    from app.services.item_details import (
+        item_details_query, item_details_page, serialize_item_detail
+    )
+    from app.utils.pagination_helpers import get_pagination_params
+
+    _, per_page = get_pagination_params(default_per_page=50, max_per_page=100)
+    query = item_details_query(
+        id,
+        status=request.args.get('status', ''),
+        location=request.args.get('location', ''),
+        search=request.args.get('search', '').strip()
+    )
+    details, next_after = item_details_page(
+        query, after=request.args.get('after', None, type=int), per_page=per_page
     )
 
-    # Return paginated response
-    return jsonify(paginated_response(query, max_per_page=100))
+    return jsonify({
+        'success': True,
+        'data': [serialize_item_detail(detail) for detail in details],
+        'pagination': {
+            'per_page': per_page,
+            'has_next': next_after is not None,
+            'next_after': next_after,
+        }
+    })
 
 
 @bp.route('/search')
@@ -100,5 +126,7 @@ def api_search():
         )
     ).options(db.joinedload(Item.category))
 
-    # Return paginated response
-    return jsonify(paginated_response(query, max_per_page=100))
+    # Return paginated response; counts for the whole page come from one query
+    return jsonify(paginated_response(
+        query, serializer=serialize_item, max_per_page=100, batch_loader=load_item_counts
+    ))
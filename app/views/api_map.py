@@ -1,280 +1,148 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, stream_with_context
 from flask_login import login_required, current_user
-from sqlalchemy import func
-from geoalchemy2.functions import ST_AsGeoJSON
-from app import db
-from app.models import Warehouse, Unit, Distribution, ItemDetail, Building
-from app.utils.helpers import get_user_warehouse_id
+from app.models import Building
+from app.services.map_features import (
+    warehouse_features_query,
+    unit_features_query,
+    distribution_features_query,
+    stream_feature_collection,
+    tile_bounds,
+    parse_bbox,
+    make_envelope,
+    nearby_features
+)
+from app.services.map_tiles import render_tile
 
 bp = Blueprint('api_map', __name__)
 
 
+def _viewport_from_request():
+    """
+    Read the optional viewport from query parameters.
+
+    Accepts either ``bbox=min_lng,min_lat,max_lng,max_lat`` (with an optional
+    ``zoom``) or XYZ tile coordinates ``z``, ``x`` and ``y``. Returns a dict
+    with ``envelope`` and ``zoom`` (both None when no viewport was given).
+    Raises ValueError for malformed parameters.
+    """
+    z = request.args.get('z', type=int)
+    x = request.args.get('x', type=int)
+    y = request.args.get('y', type=int)
+    bbox = request.args.get('bbox')
+
+    if z is not None or x is not None or y is not None:
+        if z is None or x is None or y is None:
+            raise ValueError('Tile requests need z, x and y')
+        return {'envelope': make_envelope(tile_bounds(z, x, y)), 'zoom': z}
+
+    if bbox:
+        return {
+            'envelope': make_envelope(parse_bbox(bbox)),
+            'zoom': request.args.get('zoom', type=int)
+        }
+
+    return {'envelope': None, 'zoom': None}
+
+
+def _feature_collection_response(*statements):
+    """Stream a FeatureCollection response built from feature statements"""
+    return Response(
+        stream_with_context(stream_feature_collection(*statements)),
+        mimetype='application/json'
+    )
+
+
+def _invalid_viewport(e):
+    """Build the 400 response for malformed viewport parameters"""
+    return jsonify({'success': False, 'message': f'Invalid viewport: {e}'}), 400
+
+
 @bp.route('/warehouses')
 @login_required
 def api_warehouses():
     """Get all warehouses as GeoJSON"""
-    # Query warehouses with geometry
-    warehouses = Warehouse.query.all()
+    try:
+        viewport = _viewport_from_request()
+    except ValueError as e:
+        return _invalid_viewport(e)
 
-    features = []
-    for warehouse in warehouses:
-        if warehouse.geom:
-            # Convert geometry to GeoJSON
-            geojson = db.session.query(
-                ST_AsGeoJSON(Warehouse.geom)
-            ).filter(Warehouse.id == warehouse.id).scalar()
-
-            coords = db.session.execute(
-                db.select(func.ST_X(warehouse.geom), func.ST_Y(warehouse.geom))
-            ).first()
-
-            features.append({
-                'type': 'Feature',
-                'geometry': eval(geojson) if geojson else None,
-                'properties': {
-                    'id': warehouse.id,
-                    'name': warehouse.name,
-                    'address': warehouse.address,
-                    'type': 'warehouse',
-                    'latitude': float(coords[1]) if coords else None,
-                    'longitude': float(coords[0]) if coords else None
-                }
-            })
-
-    return jsonify({
-        'type': 'FeatureCollection',
-        'features': features
-    })
+    return _feature_collection_response(warehouse_features_query(**viewport))
 
 
 @bp.route('/units')
 @login_required
 def api_units():
     """Get all units as GeoJSON"""
-    units = Unit.query.all()
-
-    features = []
-    for unit in units:
-        if unit.geom:
-            geojson = db.session.query(
-                ST_AsGeoJSON(Unit.geom)
-            ).filter(Unit.id == unit.id).scalar()
-
-            coords = db.session.execute(
-                db.select(func.ST_X(unit.geom), func.ST_Y(unit.geom))
-            ).first()
-
-            features.append({
-                'type': 'Feature',
-                'geometry': eval(geojson) if geojson else None,
-                'properties': {
-                    'id': unit.id,
-                    'name': unit.name,
-                    'address': unit.address,
-                    'type': 'unit',
-                    'latitude': float(coords[1]) if coords else None,
-                    'longitude': float(coords[0]) if coords else None
-                }
-            })
+    try:
+        viewport = _viewport_from_request()
+    except ValueError as e:
+        return _invalid_viewport(e)
 
-    return jsonify({
-        'type': 'FeatureCollection',
-        'features': features
-    })
+    return _feature_collection_response(unit_features_query(**viewport))
 
 
 @bp.route('/distributions')
 @login_required
 def api_distributions():
     """Get all distributions as GeoJSON"""
-    # Filter by user role
-    if current_user.is_warehouse_staff():
-        distributions = Distribution.query.filter(
-            Distribution.warehouse_id == get_user_warehouse_id(current_user)
-        ).all()
-    elif current_user.is_field_staff():
-        distributions = Distribution.query.filter(
-            Distribution.field_staff_id == current_user.id
-        ).all()
-    else:  # admin
-        distributions = Distribution.query.all()
+    try:
+        viewport = _viewport_from_request()
+    except ValueError as e:
+        return _invalid_viewport(e)
 
-    features = []
-    for distribution in distributions:
-        if distribution.geom:
-            geojson = db.session.query(
-                ST_AsGeoJSON(Distribution.geom)
-            ).filter(Distribution.id == distribution.id).scalar()
-
-            coords = db.session.execute(
-                db.select(func.ST_X(distribution.geom), func.ST_Y(distribution.geom))
-            ).first()
-
-            features.append({
-                'type': 'Feature',
-                'geometry': eval(geojson) if geojson else None,
-                'properties': {
-                    'id': distribution.id,
-                    'serial_number': distribution.item_detail.serial_number if distribution.item_detail else None,
-                    'item_name': distribution.item_detail.item.name if distribution.item_detail else None,
-                    'status': distribution.status,
-                    'address': distribution.address,
-                    'type': 'distribution',
-                    'latitude': float(coords[1]) if coords else None,
-                    'longitude': float(coords[0]) if coords else None
-                }
-            })
-
-    return jsonify({
-        'type': 'FeatureCollection',
-        'features': features
-    })
+    # Filtered by user role inside the query
+    return _feature_collection_response(distribution_features_query(current_user, **viewport))
 
 
 @bp.route('/all')
 @login_required
 def api_all():
     """Get all features (warehouses, units, distributions) as GeoJSON"""
-    # Get warehouse features
-    warehouse_features = []
-    warehouses = Warehouse.query.all()
-    for warehouse in warehouses:
-        if warehouse.geom:
-            geojson = db.session.query(
-                ST_AsGeoJSON(Warehouse.geom)
-            ).filter(Warehouse.id == warehouse.id).scalar()
-
-            coords = db.session.execute(
-                db.select(func.ST_X(warehouse.geom), func.ST_Y(warehouse.geom))
-            ).first()
-
-            warehouse_features.append({
-                'type': 'Feature',
-                'geometry': eval(geojson) if geojson else None,
-                'properties': {
-                    'id': warehouse.id,
-                    'name': warehouse.name,
-                    'address': warehouse.address,
-                    'layer': 'warehouse',
-                    'latitude': float(coords[1]) if coords else None,
-                    'longitude': float(coords[0]) if coords else None
-                }
-            })
-
-    # Get unit features
-    unit_features = []
-    units = Unit.query.all()
-    for unit in units:
-        if unit.geom:
-            geojson = db.session.query(
-                ST_AsGeoJSON(Unit.geom)
-            ).filter(Unit.id == unit.id).scalar()
-
-            coords = db.session.execute(
-                db.select(func.ST_X(unit.geom), func.ST_Y(unit.geom))
-            ).first()
-
-            unit_features.append({
-                'type': 'Feature',
-                'geometry': eval(geojson) if geojson else None,
-                'properties': {
-                    'id': unit.id,
-                    'name': unit.name,
-                    'address': unit.address,
-                    'layer': 'unit',
-                    'latitude': float(coords[1]) if coords else None,
-                    'longitude': float(coords[0]) if coords else None
-                }
-            })
-
-    # Get distribution features
-    distribution_features = []
-    if current_user.is_admin():
-        distributions = Distribution.query.all()
-    elif current_user.is_warehouse_staff():
-        distributions = Distribution.query.filter(
-            Distribution.warehouse_id == get_user_warehouse_id(current_user)
-        ).all()
-    else:
-        distributions = Distribution.query.filter(
-            Distribution.field_staff_id == current_user.id
-        ).all()
-
-    for distribution in distributions:
-        if distribution.geom:
-            geojson = db.session.query(
-                ST_AsGeoJSON(Distribution.geom)
-            ).filter(Distribution.id == distribution.id).scalar()
-
-            coords = db.session.execute(
-                db.select(func.ST_X(distribution.geom), func.ST_Y(distribution.geom))
-            ).first()
-
-            distribution_features.append({
-                'type': 'Feature',
-                'geometry': eval(geojson) if geojson else None,
-                'properties': {
-                    'id': distribution.id,
-                    'serial_number': distribution.item_detail.serial_number if distribution.item_detail else None,
-                    'item_name': distribution.item_detail.item.name if distribution.item_detail else None,
-                    'status': distribution.status,
-                    'address': distribution.address,
-                    'layer': 'distribution',
-                    'latitude': float(coords[1]) if coords else None,
-                    'longitude': float(coords[0]) if coords else None
-                }
-            })
-
-    # Combine all features
-    all_features = warehouse_features + unit_features + distribution_features
+    try:
+        viewport = _viewport_from_request()
+    except ValueError as e:
+        return _invalid_viewport(e)
 
-    return jsonify({
-        'type': 'FeatureCollection',
-        'features': all_features
-    })
+    return _feature_collection_response(
+        warehouse_features_query(layer_key='layer', **viewport),
+        unit_features_query(layer_key='layer', **viewport),
+        distribution_features_query(current_user, layer_key='layer', **viewport)
+    )
+
+
+@bp.route('/tiles/<layer>/<int:z>/<int:x>/<int:y>.pbf')
+@login_required
+def api_tile(layer, z, x, y):
+    """Get one Mapbox Vector Tile (warehouses, units, distributions or buildings)"""
+    try:
+        data, version, scope = render_tile(layer, z, x, y, current_user)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    response = Response(data, mimetype='application/vnd.mapbox-vector-tile')
+    # The scope is part of the ETag: tiles differ per role/warehouse
+    response.set_etag(f"{layer}-{scope}-{version}-{z}-{x}-{y}")
+    response.headers['Cache-Control'] = 'private, max-age=60'
+    return response.make_conditional(request)
 
 
 @bp.route('/nearby', methods=['GET'])
 @login_required
 def api_nearby():
-    """Get nearby features within radius"""
+    """Get nearby features within radius, nearest first"""
     latitude = request.args.get('lat', type=float)
     longitude = request.args.get('lng', type=float)
     radius_km = request.args.get('radius', 5, type=float)  # Default 5km
+    limit = request.args.get('limit', 20, type=int)
 
-    if not latitude or not longitude:
+    if latitude is None or longitude is None:
         return jsonify({'success': False, 'message': 'Latitude and longitude required'}), 400
 
-    from geoalchemy2.functions import ST_Distance_Sphere, ST_MakePoint, ST_SetSRID
-    from sqlalchemy import cast, Float
-
-    # Create point from coordinates
-    point = ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
-
-    # Get nearby warehouses
-    nearby_warehouses = db.session.query(
-        Warehouse,
-        cast(ST_Distance_Sphere(Warehouse.geom, point) / 1000, Float).label('distance')
-    ).filter(
-        ST_Distance_Sphere(Warehouse.geom, point) <= radius_km * 1000
-    ).all()
-
-    warehouse_data = [{'id': w.id, 'name': w.name, 'distance_km': distance} for w, distance in nearby_warehouses]
-
-    # Get nearby units
-    nearby_units = db.session.query(
-        Unit,
-        cast(ST_Distance_Sphere(Unit.geom, point) / 1000, Float).label('distance')
-    ).filter(
-        ST_Distance_Sphere(Unit.geom, point) <= radius_km * 1000
-    ).all()
-
-    unit_data = [{'id': u.id, 'name': u.name, 'distance_km': distance} for u, distance in nearby_units]
+    results = nearby_features(latitude, longitude, radius_km, limit, current_user)
 
     return jsonify({
         'success': True,
-        'warehouses': warehouse_data,
-        'units': unit_data
+        **results
     })
 
 
@@ -282,7 +150,21 @@ def api_nearby():
 @login_required
 def api_buildings():
     """Get all buildings with their zones and unit details (rooms) as GeoJSON"""
-    buildings = Building.query.all()
+    try:
+        viewport = _viewport_from_request()
+    except ValueError as e:
+        return _invalid_viewport(e)
+
+    query = Building.query
+    if viewport['envelope'] is not None:
+        from sqlalchemy import func, or_, and_
+        envelope = viewport['envelope']
+        # Written as an OR of plain column tests so each branch can use its GiST index
+        query = query.filter(or_(
+            func.ST_Intersects(Building.zone_geom, envelope),
+            and_(Building.zone_geom.is_(None), func.ST_Intersects(Building.geom, envelope))
+        ))
+    buildings = query.all()
 
     features = []
     for building in buildings:
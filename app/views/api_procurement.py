@@ -1,39 +1,14 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from app import db
-from app.models import Procurement, Item, User, Warehouse, Category
+from app.models import Procurement, Item, User, Warehouse
 from app.utils.decorators import role_required
+from app.services.code_sequences import generate_item_code
 from datetime import datetime
 
 bp = Blueprint('api_procurement', __name__)
 
 
-def generate_item_code(category_id):
-    """Generate item code based on category code"""
-    category = Category.query.get(category_id)
-    if not category or not category.code:
-        # Fallback if category has no code
-        return f"NEW-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-
-    prefix = category.code.upper()
-
-    # Find the last item code with this prefix
-    last_item = Item.query.filter(Item.item_code.like(f'{prefix}-%')).order_by(Item.item_code.desc()).first()
-
-    if last_item and last_item.item_code:
-        # Extract the number from the last item code (e.g., JAR-001 -> 001)
-        try:
-            last_number = int(last_item.item_code.split('-')[1])
-            new_number = last_number + 1
-        except (IndexError, ValueError):
-            new_number = 1
-    else:
-        new_number = 1
-
-    # Format: PREFIX-001 (3 digits)
-    return f"{prefix}-{new_number:03d}"
-
-
 @bp.route('/procurements', methods=['GET'])
 @login_required
 @role_required('admin', 'warehouse_staff')
@@ -237,7 +212,7 @@ def receive_goods(id):
             'message': 'Hanya pengadaan yang sudah disetujui yang bisa menerima barang'
         }), 400
 
-    required_fields = ['receipt_number', 'actual_quantity', 'unit_type']
+    required_fields = ['receipt_number', 'items']
     for field in required_fields:
         if field not in data:
             return jsonify({
@@ -246,25 +221,28 @@ def receive_goods(id):
             }), 400
 
     try:
+        # items: [{'procurement_item_id', 'quantity_received', 'serial_numbers', 'serial_units'}, ...]
         success, message = procurement.receive_goods(
             user_id=current_user.id,
             receipt_number=data['receipt_number'],
-            actual_quantity=data['actual_quantity'],
-            barcode=data.get('barcode'),
-            unit_type=data['unit_type'],
-            other_unit=data.get('other_unit') if data['unit_type'] == 'lainnya' else None
+            items_data=data['items']
         )
 
+        # Per-serial outcomes: created / duplicate_serial_number / duplicate_serial_unit / duplicate_in_delivery
+        outcomes = {str(item_id): serials for item_id, serials in (procurement.receipt_outcomes or {}).items()}
+
         if success:
             return jsonify({
                 'success': True,
                 'message': message,
-                'data': procurement.to_dict()
+                'data': procurement.to_dict(),
+                'outcomes': outcomes
             })
         else:
             return jsonify({
                 'success': False,
-                'message': message
+                'message': message,
+                'outcomes': outcomes
             }), 400
 
     except Exception as e:
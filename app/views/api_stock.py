@@ -1,10 +1,11 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.models import Stock, StockTransaction, Item
 from app.utils.decorators import role_required
 from app.utils.pagination_helpers import paginated_response
 from app.utils.cache_helpers import get_user_warehouse_ids
+from app.services.stock_mutations import apply_stock_transaction, apply_stock_batch
 
 bp = Blueprint('api_stock', __name__)
 
@@ -39,39 +40,28 @@ def api_list():
 @role_required('warehouse_staff', 'admin')
 def api_transaction():
     """Create stock transaction"""
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
 
-    try:
-        # Get or create stock
-        stock = Stock.query.filter_by(
-            item_id=data['item_id'],
-            warehouse_id=data['warehouse_id']
-        ).first()
-
-        if not stock:
-            stock = Stock(
-                item_id=data['item_id'],
-                warehouse_id=data['warehouse_id'],
-                quantity=0
-            )
-            stock.save()
-
-        # Process transaction
-        if data['transaction_type'] == 'IN':
-            stock.add_stock(data['quantity'])
-        else:
-            if not stock.remove_stock(data['quantity']):
-                return jsonify({'success': False, 'message': 'Insufficient stock'}), 400
+    for field in ('item_id', 'warehouse_id', 'transaction_type', 'quantity'):
+        if field not in data:
+            return jsonify({'success': False, 'message': f'Field {field} is required'}), 400
 
-        # Create transaction record
-        transaction = StockTransaction(
+    try:
+        # Stock change and transaction log in one transaction, no read-modify-write
+        success, message, quantity = apply_stock_transaction(
             item_id=data['item_id'],
             warehouse_id=data['warehouse_id'],
             transaction_type=data['transaction_type'],
             quantity=data['quantity'],
             note=data.get('note', '')
         )
-        transaction.save()
+        if not success:
+            return jsonify({'success': False, 'message': message}), 400
+
+        stock = Stock.query.filter_by(
+            item_id=data['item_id'],
+            warehouse_id=data['warehouse_id']
+        ).first()
 
         return jsonify({
             'success': True,
@@ -84,6 +74,55 @@ def api_transaction():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+@bp.route('/transactions/batch', methods=['POST'])
+@login_required
+@role_required('warehouse_staff', 'admin')
+def api_transaction_batch():
+    """
+    Apply many stock movements at once (stock count, bulk intake).
+
+    Body: {"movements": [{"item_id", "warehouse_id", "transaction_type",
+    "quantity", "note"?}, ...], "note"?: default note}. Lines are applied
+    in order in one transaction; if any line fails nothing is applied.
+    """
+    data = request.get_json(silent=True) or {}
+    movements = data.get('movements')
+
+    if not isinstance(movements, list) or not movements:
+        return jsonify({'success': False, 'message': 'Field movements is required'}), 400
+
+    max_lines = current_app.config.get('STOCK_BATCH_MAX_LINES', 10000)
+    if len(movements) > max_lines:
+        return jsonify({
+            'success': False,
+            'message': f'Maksimal {max_lines} baris per batch'
+        }), 400
+
+    allowed_warehouse_ids = None
+    if current_user.is_warehouse_staff():
+        allowed_warehouse_ids = set(get_user_warehouse_ids(current_user) or [])
+
+    try:
+        success, results = apply_stock_batch(
+            movements,
+            allowed_warehouse_ids=allowed_warehouse_ids,
+            note=data.get('note')
+        )
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+    failed = [result for result in results if not result['success']]
+    return jsonify({
+        'success': success,
+        'message': f'{len(results)} baris diterapkan' if success
+                   else f'{len(failed)} dari {len(results)} baris gagal, tidak ada yang diterapkan',
+        'applied': len(results) if success else 0,
+        'failed': len(failed),
+        'results': results
+    }), 200 if success else 400
+
+
 @bp.route('/low-stock')
 @login_required
 def api_low_stock():
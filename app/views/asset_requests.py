@@ -4,6 +4,15 @@ from app import db
 from app.models import AssetRequest, AssetRequestItem, Item, Unit, UnitDetail, User
 from app.forms import AssetRequestForm, AssetVerificationForm
 from app.utils.decorators import role_required
+from app.services.access_scope import get_access_scope
+from app.services.image_pipeline import (
+    UploadError,
+    spool_photo,
+    process_photo,
+    photo_status,
+    photo_variant_response,
+    placeholder_response
+)
 from app.services.notifications import (
     notify_asset_request_created,
     notify_asset_request_verified,
@@ -22,8 +31,6 @@ bp = Blueprint('asset_requests', __name__, url_prefix='/asset-requests')
 @role_required('unit_staff', 'admin', 'warehouse_staff')
 def index():
     """List all asset requests"""
-    from app.models import UserUnit
-
     status_filter = request.args.get('status', '')
     page = request.args.get('page', 1, type=int)
     per_page = 10
@@ -31,13 +38,11 @@ def index():
     # Filter based on role
     if current_user.is_unit_staff():
         # Unit staff can only see requests for their units
-        user_units = UserUnit.query.filter_by(user_id=current_user.id).all()
-        if not user_units:
+        unit_ids = list(get_access_scope().unit_ids)
+        if not unit_ids:
             flash('Anda belum terassign ke unit manapun.', 'danger')
             return redirect(url_for('dashboard.index'))
 
-        # Get unit IDs from user_units
-        unit_ids = [uu.unit_id for uu in user_units]
         query = AssetRequest.query.filter(AssetRequest.unit_id.in_(unit_ids))
     elif current_user.is_warehouse_staff():
         # Warehouse staff can see requests that need processing or are being processed
@@ -105,17 +110,13 @@ def index():
 @role_required('unit_staff')
 def create():
     """Create new asset request"""
-    from app.models import UserUnit
-
-    # Get user's units
-    user_units = UserUnit.query.filter_by(user_id=current_user.id).all()
-    if not user_units:
-        flash('Anda belum terassign ke unit manapun.', 'danger')
-        return redirect(url_for('asset_requests.index'))
-
     # For now, just use the first assigned unit
     # TODO: Allow user to select which unit to request for
-    user_unit = user_units[0]
+    unit_id = get_access_scope().unit_id
+    if unit_id is None:
+        flash('Anda belum terassign ke unit manapun.', 'danger')
+        return redirect(url_for('asset_requests.index'))
+    unit = Unit.query.get(unit_id)
 
     form = AssetRequestForm()
 
@@ -127,7 +128,7 @@ def create():
 
             if not items_data or len(items_data) == 0:
                 flash('Minimal harus ada satu aset yang diminta!', 'danger')
-                return render_template('asset_requests/create.html', form=form, unit=user_unit.unit)
+                return render_template('asset_requests/create.html', form=form, unit=unit)
 
             # Validate and process items
             import json
@@ -138,12 +139,12 @@ def create():
                 # Validate
                 if not item_data.get('item_id') or item_data.get('item_id') == 0:
                     flash('Harap pilih aset dari daftar!', 'danger')
-                    return render_template('asset_requests/create.html', form=form, unit=user_unit.unit)
+                    return render_template('asset_requests/create.html', form=form, unit=unit)
 
                 quantity = item_data.get('quantity')
                 if not quantity or quantity <= 0:
                     flash('Harap isi jumlah aset dengan benar!', 'danger')
-                    return render_template('asset_requests/create.html', form=form, unit=user_unit.unit)
+                    return render_template('asset_requests/create.html', form=form, unit=unit)
 
                 valid_items.append({
                     'item_id': item_data.get('item_id'),
@@ -154,7 +155,7 @@ def create():
 
             # Create asset request
             asset_request = AssetRequest(
-                unit_id=user_unit.unit_id,
+                unit_id=unit_id,
                 requested_by=current_user.id,
                 request_date=datetime.now(),
                 request_notes=request_notes,
@@ -199,7 +200,7 @@ def create():
                          form=form,
                          items=items,
                          unit_details=unit_details_choices,
-                         unit=user_unit.unit)
+                         unit=unit)
 
 
 @bp.route('/<int:id>')
@@ -210,9 +211,7 @@ def detail(id):
 
     # Check permission based on role
     if current_user.is_unit_staff():
-        from app.models import UserUnit
-        user_units = UserUnit.query.filter_by(user_id=current_user.id).all()
-        unit_ids = [uu.unit_id for uu in user_units]
+        unit_ids = list(get_access_scope().unit_ids)
         if asset_request.unit_id not in unit_ids:
             flash('Anda tidak memiliki izin untuk melihat permohonan ini.', 'danger')
             return redirect(url_for('asset_requests.index'))
@@ -524,65 +523,11 @@ def distribute(id):
 def confirm_receipt(id):
     """Show confirmation page with photo upload for receiving items"""
     from app.models import Distribution
-    from werkzeug.datastructures import FileStorage
-    from io import BytesIO
-    from PIL import Image
-
-    def compress_image(image_bytes, max_size_kb=500, quality=85):
-        """
-        Compress image to reduce file size while maintaining quality
-
-        Args:
-            image_bytes: Original image bytes
-            max_size_kb: Maximum target size in KB (default: 500KB)
-            quality: Initial JPEG quality (1-100, default: 85)
-
-        Returns:
-            Compressed image bytes
-        """
-        img = Image.open(BytesIO(image_bytes))
-
-        # Convert RGBA to RGB if necessary
-        if img.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
-                img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-            img = background
-
-        # Calculate new dimensions if image is too large
-        max_dimension = 1920  # Maximum width or height
-        if max(img.size) > max_dimension:
-            ratio = max_dimension / max(img.size)
-            new_size = tuple(int(dim * ratio) for dim in img.size)
-            img = img.resize(new_size, Image.Resampling.LANCZOS)
-
-        # Start with initial quality
-        output = BytesIO()
-        img.save(output, format='JPEG', quality=quality, optimize=True)
-        compressed_bytes = output.getvalue()
-
-        # If still too large, reduce quality progressively
-        min_quality = 50
-        max_iterations = 10
-        iteration = 0
-        target_size = max_size_kb * 1024
-
-        while len(compressed_bytes) > target_size and quality > min_quality and iteration < max_iterations:
-            quality -= 5
-            output = BytesIO()
-            img.save(output, format='JPEG', quality=quality, optimize=True)
-            compressed_bytes = output.getvalue()
-            iteration += 1
-
-        return compressed_bytes
 
     asset_request = AssetRequest.query.get_or_404(id)
 
     # Check permission
-    from app.models import UserUnit
-    user_units = UserUnit.query.filter_by(user_id=current_user.id).all()
-    unit_ids = [uu.unit_id for uu in user_units]
+    unit_ids = list(get_access_scope().unit_ids)
     if asset_request.unit_id not in unit_ids:
         flash('Anda tidak memiliki izin untuk mengakses halaman ini.', 'danger')
         return redirect(url_for('asset_requests.detail', id=id))
@@ -596,41 +541,12 @@ def confirm_receipt(id):
 
     if request.method == 'POST':
         try:
-            # Get uploaded photo
-            photo_file = request.files.get('proof_photo')
-
-            if not photo_file:
-                flash('Harap upload foto sebagai bukti penerimaan.', 'warning')
-                return redirect(url_for('asset_requests.confirm_receipt', id=id))
-
-            # Validate file type
-            allowed_extensions = {'jpg', 'jpeg', 'png', 'gif', 'webp'}
-            filename = photo_file.filename.lower()
-            if not any(filename.endswith('.' + ext) for ext in allowed_extensions):
-                flash('Format file tidak didukung. Gunakan JPG, PNG, GIF, atau WebP.', 'danger')
-                return redirect(url_for('asset_requests.confirm_receipt', id=id))
-
-            # Read file as bytes
-            original_bytes = photo_file.read()
-
-            if len(original_bytes) > 10 * 1024 * 1024:  # 10MB limit
-                flash('Ukuran file terlalu besar. Maksimal 10MB.', 'danger')
-                return redirect(url_for('asset_requests.confirm_receipt', id=id))
-
-            # Compress image
+            # Store the uploaded photo; compression and thumbnails run in the background
             try:
-                compressed_photo = compress_image(original_bytes, max_size_kb=500)
-                original_size_kb = len(original_bytes) / 1024
-                compressed_size_kb = len(compressed_photo) / 1024
-                compression_ratio = (1 - compressed_size_kb / original_size_kb) * 100
-
-                import logging
-                logging.info(f'Image compressed: {original_size_kb:.2f}KB -> {compressed_size_kb:.2f}KB ({compression_ratio:.1f}% reduction)')
-            except Exception as e:
-                import logging
-                logging.error(f'Image compression failed: {str(e)}')
-                # Use original if compression fails
-                compressed_photo = original_bytes
+                photo_sha256 = spool_photo(request.files.get('proof_photo'))
+            except UploadError as e:
+                flash(str(e), 'warning')
+                return redirect(url_for('asset_requests.confirm_receipt', id=id))
 
             # Get distribution_id from form
             distribution_id = request.form.get('distribution_id', type=int)
@@ -638,8 +554,10 @@ def confirm_receipt(id):
                 distribution_id = asset_request.distribution_id
 
             # Save photo to AssetRequest (one photo for the entire request)
-            asset_request.verification_photo = compressed_photo
+            asset_request.verification_photo_sha256 = photo_sha256
+            asset_request.verification_photo_size = None  # Recorded once the photo is processed
             asset_request.save()
+            process_photo(photo_sha256)
 
             # Update all distributions with verification status (but NOT the photo)
             for dist in distributions:
@@ -656,7 +574,7 @@ def confirm_receipt(id):
             if success:
                 # Send email notification to admin and warehouse staff
                 notify_asset_request_completed(asset_request, asset_request.distributed_by)
-                flash(f'{message} (Foto: {compressed_size_kb:.1f}KB)', 'success')
+                flash(f'{message} Foto sedang diproses.', 'success')
             else:
                 flash(message, 'danger')
 
@@ -676,34 +594,17 @@ def confirm_receipt(id):
 @bp.route('/<int:id>/proof-photo')
 @login_required
 def proof_photo(id):
-    """Display proof photo for asset request"""
-    from flask import send_file
-    from io import BytesIO
-
+    """Display proof photo for asset request (?size=sm|md for thumbnails)"""
     asset_request = AssetRequest.query.get_or_404(id)
 
-    # Check if asset request has verification photo
-    if not asset_request or not asset_request.verification_photo:
-        # Return placeholder image
-        # Create a simple placeholder SVG
-        placeholder_svg = '''<?xml version="1.0" encoding="UTF-8"?>
-<svg width="400" height="300" xmlns="http://www.w3.org/2000/svg">
-    <rect width="400" height="300" fill="#f3f4f6"/>
-    <text x="200" y="140" font-family="Arial, sans-serif" font-size="16" fill="#9ca3af" text-anchor="middle">
-        <tspan x="200" dy="0">Foto tidak tersedia</tspan>
-        <tspan x="200" dy="25" font-size="14">No proof photo uploaded</tspan>
-    </text>
-    <rect x="150" y="160" width="100" height="100" fill="none" stroke="#d1d5db" stroke-width="2" rx="8"/>
-    <text x="200" y="220" font-family="Arial, sans-serif" font-size="40" fill="#d1d5db" text-anchor="middle">📷</text>
-</svg>'''
-        return send_file(BytesIO(placeholder_svg.encode('utf-8')),
-                         mimetype='image/svg+xml',
-                         as_attachment=False)
-
-    # Return the photo from asset_request
-    return send_file(BytesIO(asset_request.verification_photo),
-                     mimetype='image/jpeg',
-                     as_attachment=False)
+    digest = asset_request.verification_photo_sha256
+    if not digest:
+        return placeholder_response()
+
+    response = photo_variant_response(digest, request.args.get('size', 'full'))
+    if response is None:
+        return placeholder_response(pending=photo_status(digest) == 'pending')
+    return response
 
 
 @bp.route('/<int:id>/complete', methods=['POST'])
@@ -714,9 +615,7 @@ def complete(id):
     asset_request = AssetRequest.query.get_or_404(id)
 
     # Check permission
-    from app.models import UserUnit
-    user_units = UserUnit.query.filter_by(user_id=current_user.id).all()
-    unit_ids = [uu.unit_id for uu in user_units]
+    unit_ids = list(get_access_scope().unit_ids)
     if asset_request.unit_id not in unit_ids:
         flash('Anda tidak memiliki izin untuk menyelesaikan permohonan ini.', 'danger')
         return redirect(url_for('asset_requests.detail', id=id))
@@ -761,9 +660,7 @@ def delete(id):
     asset_request = AssetRequest.query.get_or_404(id)
 
     # Check permission
-    from app.models import UserUnit
-    user_units = UserUnit.query.filter_by(user_id=current_user.id).all()
-    unit_ids = [uu.unit_id for uu in user_units]
+    unit_ids = list(get_access_scope().unit_ids)
     if asset_request.unit_id not in unit_ids:
         flash('Anda tidak memiliki izin untuk menghapus permohonan ini.', 'danger')
         return redirect(url_for('asset_requests.detail', id=id))
@@ -793,21 +690,17 @@ def delete(id):
 @role_required('unit_staff')
 def unit_assets():
     """Show all assets in the unit staff's units"""
-    from app.models import UserUnit
     from app.models.distribution import Distribution
     from app.models.master_data import ItemDetail
     from app.models.asset_request import AssetRequest
     from collections import defaultdict
 
     # Get user's units
-    user_units = UserUnit.query.filter_by(user_id=current_user.id).all()
-    if not user_units:
+    unit_ids = list(get_access_scope().unit_ids)
+    if not unit_ids:
         flash('Anda belum terassign ke unit manapun.', 'danger')
         return redirect(url_for('dashboard.index'))
 
-    # Get all unit IDs
-    unit_ids = [uu.unit_id for uu in user_units]
-
     # Get all distributions to these units (excluding rejected)
     distributions = Distribution.query.filter(
         Distribution.unit_id.in_(unit_ids),
@@ -867,7 +760,7 @@ def unit_assets():
     unit_items = list(items_dict.values())
 
     # Get all units for display
-    units = [uu.unit for uu in user_units]
+    units = sorted(Unit.query.filter(Unit.id.in_(unit_ids)).all(), key=lambda u: unit_ids.index(u.id))
 
     return render_template('asset_requests/unit_assets.html',
                          units=units,
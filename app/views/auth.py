@@ -9,8 +9,9 @@ bp = Blueprint('auth', __name__, url_prefix='/auth')
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Load user by ID for Flask-Login"""
-    return User.query.get(int(user_id))
+    """Load user by ID for Flask-Login (from the cached access scope)"""
+    from app.services.access_scope import load_user as load_scoped_user
+    return load_scoped_user(int(user_id))
 
 
 @bp.route('/login', methods=['GET', 'POST'])
@@ -2,11 +2,21 @@ from flask import Blueprint, render_template, redirect, url_for, jsonify, reques
 from flask_login import login_required, current_user
 from app.utils.decorators import role_required
 from app.utils.helpers import get_dashboard_stats, get_user_warehouse_id, get_admin_division_stats
-from sqlalchemy import func, extract
+from app.utils.datetime_helper import period_filter, wib_extract, clamp_period
+from app.utils.cache_helpers import get_or_set_tagged
+from app.services.access_scope import get_access_scope
+from sqlalchemy import func
 from datetime import datetime
 
 bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 
+# Tables each chart is computed from (cache tags, see cache_helpers)
+# (the stock chart reads stock_daily_rollups, which rebuild_rollups rewrites on its own)
+STOCK_CHART_TAGS = ('stock_daily_rollups', 'stock_transactions', 'return_batches', 'procurements',
+                    'distribution_groups', 'distributions')
+UNIT_RECEIVED_CHART_TAGS = ('distributions', 'distribution_groups')
+WAREHOUSE_COMPARISON_CHART_TAGS = ('procurements', 'procurement_items', 'distributions')
+
 
 @bp.route('/')
 @login_required
@@ -125,430 +135,91 @@ def unit_index():
 @login_required
 @role_required('admin')
 def api_stock_transactions():
-    """API for stock transaction chart data (including all sources like stock page)"""
-    from app.models import (StockTransaction, DistributionGroup, Distribution,
-                           ReturnBatch, Procurement, ProcurementItem)
-    from app import db
-    from sqlalchemy import func, extract
-
+    """API for stock transaction chart data (read from the daily stock rollups, cached)"""
     filter_type = request.args.get('filter', 'month')
     year = request.args.get('year', datetime.now().year, type=int)
     month = request.args.get('month', datetime.now().month, type=int)
+    year, month = clamp_period(year, month)
 
-    # Build all entries list (like stock.py)
-    all_entries = []
-
-    if filter_type == 'month':
-        # 1. StockTransaction IN (excluding procurement)
-        stock_in = StockTransaction.query.filter(
-            StockTransaction.transaction_type == 'IN',
-            ~StockTransaction.note.like('%Pengadaan%'),
-            extract('year', StockTransaction.transaction_date) == year,
-            extract('month', StockTransaction.transaction_date) == month
-        ).all()
-
-        for trans in stock_in:
-            all_entries.append({
-                'type': 'in',
-                'timestamp': trans.transaction_date,
-                'quantity': trans.quantity
-            })
-
-        # 2. StockTransaction OUT (excluding procurement)
-        stock_out = StockTransaction.query.filter(
-            StockTransaction.transaction_type == 'OUT',
-            ~StockTransaction.note.like('%Pengadaan%'),
-            extract('year', StockTransaction.transaction_date) == year,
-            extract('month', StockTransaction.transaction_date) == month
-        ).all()
-
-        for trans in stock_out:
-            all_entries.append({
-                'type': 'out',
-                'timestamp': trans.transaction_date,
-                'quantity': trans.quantity
-            })
-
-        # 3. ReturnBatch (status='confirmed')
-        return_batches = ReturnBatch.query.filter(
-            ReturnBatch.status == 'confirmed',
-            extract('year', ReturnBatch.confirmed_at) == year,
-            extract('month', ReturnBatch.confirmed_at) == month
-        ).all()
-
-        for batch in return_batches:
-            timestamp = batch.confirmed_at if batch.confirmed_at else batch.created_at
-            for item in batch.return_items:
-                all_entries.append({
-                    'type': 'in',
-                    'timestamp': timestamp,
-                    'quantity': 1
-                })
-
-        # 4. Procurement (status='completed')
-        procurements = Procurement.query.filter(
-            Procurement.status == 'completed',
-            extract('year', Procurement.completion_date) == year,
-            extract('month', Procurement.completion_date) == month
-        ).all()
+    data = get_or_set_tagged('stock_transactions_chart', STOCK_CHART_TAGS,
+                             lambda: _stock_transactions_chart(filter_type, year, month),
+                             filter_type, year, month)
+    return jsonify(data)
 
-        for proc in procurements:
-            timestamp = proc.completion_date if proc.completion_date else proc.created_at
-            for item in proc.items:
-                all_entries.append({
-                    'type': 'in',
-                    'timestamp': timestamp,
-                    'quantity': item.quantity
-                })
-
-        # 5. DistributionGroup (barang keluar)
-        distribution_groups = DistributionGroup.query.filter(
-            DistributionGroup.status.in_(['approved', 'distributed']),
-            extract('year', DistributionGroup.verified_at) == year,
-            extract('month', DistributionGroup.verified_at) == month
-        ).all()
 
-        for group in distribution_groups:
-            timestamp = group.verified_at if group.verified_at else group.created_at
-            for dist in group.distributions:
-                all_entries.append({
-                    'type': 'out',
-                    'timestamp': timestamp,
-                    'quantity': 1
-                })
-
-        # 6. Direct Distribution (distribution_group_id=None, status='installed')
-        direct_dists = Distribution.query.filter(
-            Distribution.distribution_group_id == None,
-            Distribution.status == 'installed',
-            extract('year', Distribution.updated_at) == year,
-            extract('month', Distribution.updated_at) == month
-        ).all()
+def _stock_transactions_chart(filter_type, year, month):
+    from app.services.stock_ledger import series_by_bucket
+    from datetime import date
+    import calendar
 
-        for dist in direct_dists:
-            all_entries.append({
-                'type': 'out',
-                'timestamp': dist.updated_at,
-                'quantity': 1
-            })
+    if filter_type == 'month':
+        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        series = series_by_bucket('day', date(year, month, 1), end)
 
         # Aggregate by day
-        import calendar
         days_in_month = calendar.monthrange(year, month)[1]
-        in_by_day = {day: 0 for day in range(1, days_in_month + 1)}
-        out_by_day = {day: 0 for day in range(1, days_in_month + 1)}
-
-        for entry in all_entries:
-            day = entry['timestamp'].day
-            if entry['type'] == 'in':
-                in_by_day[day] += entry['quantity']
-            else:
-                out_by_day[day] += entry['quantity']
-
         data = {'labels': [], 'in': [], 'out': []}
         for day in range(1, days_in_month + 1):
+            totals = series.get(day, {})
             data['labels'].append(f'{day}')
-            data['in'].append(in_by_day[day])
-            data['out'].append(out_by_day[day])
+            data['in'].append(totals.get('IN', 0))
+            data['out'].append(totals.get('OUT', 0))
 
     else:  # year
-        # 1. StockTransaction IN (excluding procurement)
-        stock_in = StockTransaction.query.filter(
-            StockTransaction.transaction_type == 'IN',
-            ~StockTransaction.note.like('%Pengadaan%'),
-            extract('year', StockTransaction.transaction_date) == year
-        ).all()
-
-        for trans in stock_in:
-            all_entries.append({
-                'type': 'in',
-                'timestamp': trans.transaction_date,
-                'quantity': trans.quantity
-            })
-
-        # 2. StockTransaction OUT (excluding procurement)
-        stock_out = StockTransaction.query.filter(
-            StockTransaction.transaction_type == 'OUT',
-            ~StockTransaction.note.like('%Pengadaan%'),
-            extract('year', StockTransaction.transaction_date) == year
-        ).all()
-
-        for trans in stock_out:
-            all_entries.append({
-                'type': 'out',
-                'timestamp': trans.transaction_date,
-                'quantity': trans.quantity
-            })
-
-        # 3. ReturnBatch (status='confirmed')
-        return_batches = ReturnBatch.query.filter(
-            ReturnBatch.status == 'confirmed',
-            extract('year', ReturnBatch.confirmed_at) == year
-        ).all()
-
-        for batch in return_batches:
-            timestamp = batch.confirmed_at if batch.confirmed_at else batch.created_at
-            for item in batch.return_items:
-                all_entries.append({
-                    'type': 'in',
-                    'timestamp': timestamp,
-                    'quantity': 1
-                })
-
-        # 4. Procurement (status='completed')
-        procurements = Procurement.query.filter(
-            Procurement.status == 'completed',
-            extract('year', Procurement.completion_date) == year
-        ).all()
-
-        for proc in procurements:
-            timestamp = proc.completion_date if proc.completion_date else proc.created_at
-            for item in proc.items:
-                all_entries.append({
-                    'type': 'in',
-                    'timestamp': timestamp,
-                    'quantity': item.quantity
-                })
-
-        # 5. DistributionGroup (barang keluar)
-        distribution_groups = DistributionGroup.query.filter(
-            DistributionGroup.status.in_(['approved', 'distributed']),
-            extract('year', DistributionGroup.verified_at) == year
-        ).all()
-
-        for group in distribution_groups:
-            timestamp = group.verified_at if group.verified_at else group.created_at
-            for dist in group.distributions:
-                all_entries.append({
-                    'type': 'out',
-                    'timestamp': timestamp,
-                    'quantity': 1
-                })
-
-        # 6. Direct Distribution (distribution_group_id=None, status='installed')
-        direct_dists = Distribution.query.filter(
-            Distribution.distribution_group_id == None,
-            Distribution.status == 'installed',
-            extract('year', Distribution.updated_at) == year
-        ).all()
-
-        for dist in direct_dists:
-            all_entries.append({
-                'type': 'out',
-                'timestamp': dist.updated_at,
-                'quantity': 1
-            })
+        series = series_by_bucket('month', date(year, 1, 1), date(year + 1, 1, 1))
 
         # Aggregate by month
         month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'Mei', 'Jun',
                       'Jul', 'Agu', 'Sep', 'Okt', 'Nov', 'Des']
-        in_by_month = {i: 0 for i in range(1, 13)}
-        out_by_month = {i: 0 for i in range(1, 13)}
-
-        for entry in all_entries:
-            month_num = entry['timestamp'].month
-            if entry['type'] == 'in':
-                in_by_month[month_num] += entry['quantity']
-            else:
-                out_by_month[month_num] += entry['quantity']
-
         data = {'labels': month_names, 'in': [], 'out': []}
         for month_num in range(1, 13):
-            data['in'].append(in_by_month[month_num])
-            data['out'].append(out_by_month[month_num])
+            totals = series.get(month_num, {})
+            data['in'].append(totals.get('IN', 0))
+            data['out'].append(totals.get('OUT', 0))
 
-    return jsonify(data)
+    return data
 
 
 @bp.route('/api/recent-transactions')
 @login_required
 @role_required('admin')
 def api_recent_transactions():
-    """API for recent stock transactions with distribution progress (like stock page)"""
-    from app.models import (StockTransaction, DistributionGroup, Distribution,
-                           ReturnBatch, Procurement, Item, Warehouse, Unit)
-    from app import db
-    from sqlalchemy import func
-
-    all_entries = []
-
-    # 1. StockTransaction IN (excluding procurement)
-    trans_in = StockTransaction.query.filter(
-        StockTransaction.transaction_type == 'IN',
-        ~StockTransaction.note.like('%Pengadaan%')
-    ).order_by(
-        StockTransaction.transaction_date.desc()
-    ).limit(10).all()
-
-    for trans in trans_in:
-        all_entries.append({
-            'type': 'stock_in',
-            'timestamp': trans.transaction_date,
-            'data': trans
-        })
-
-    # 2. ReturnBatch - per item
-    return_batches = ReturnBatch.query.filter(
-        ReturnBatch.status == 'confirmed'
-    ).order_by(
-        ReturnBatch.confirmed_at.desc()
-    ).limit(10).all()
-
-    for batch in return_batches:
-        timestamp = batch.confirmed_at if batch.confirmed_at else batch.created_at
-        for item in batch.return_items:
-            all_entries.append({
-                'type': 'return_batch',
-                'timestamp': timestamp,
-                'data': (batch, item)
-            })
-
-    # 3. Procurement - per item
-    procurements = Procurement.query.filter(
-        Procurement.status == 'completed'
-    ).order_by(
-        Procurement.completion_date.desc()
-    ).limit(10).all()
-
-    for proc in procurements:
-        timestamp = proc.completion_date if proc.completion_date else proc.created_at
-        for item in proc.items:
-            all_entries.append({
-                'type': 'procurement',
-                'timestamp': timestamp,
-                'data': (proc, item)
-            })
-
-    # 4. DistributionGroup - per item (Barang Keluar)
-    distribution_groups = DistributionGroup.query.filter(
-        DistributionGroup.status.in_(['approved', 'distributed'])
-    ).order_by(
-        DistributionGroup.verified_at.desc()
-    ).limit(10).all()
-
-    for group in distribution_groups:
-        timestamp = group.verified_at if group.verified_at else group.created_at
-        for dist in group.distributions:
-            all_entries.append({
-                'type': 'distribution_group',
-                'timestamp': timestamp,
-                'data': (group, dist)
-            })
+    """API for the latest stock movements (one keyset-ordered query over the stock ledger)"""
+    from app.services.stock_ledger import ledger_filters, history_page
+
+    # Manual stock-out transactions were never part of this widget
+    movement_types = ('stock_in', 'return_batch', 'procurement',
+                      'distribution_group', 'direct_distribution')
+    entries, _ = history_page(*ledger_filters(movement_types=movement_types), per_page=10)
+
+    fixed_notes = {
+        'return_batch': 'Kembali',
+        'distribution_group': 'Distribusi',
+        'direct_distribution': 'Permintaan',
+    }
 
-    # 5. Direct Distribution - per item (distribution_group_id=None, status='installed')
-    direct_dists = Distribution.query.filter(
-        Distribution.distribution_group_id == None,
-        Distribution.status == 'installed'
-    ).order_by(
-        Distribution.updated_at.desc()
-    ).limit(10).all()
-
-    for dist in direct_dists:
-        timestamp = dist.updated_at
-        all_entries.append({
-            'type': 'direct_distribution',
-            'timestamp': timestamp,
-            'data': dist
-        })
-
-    # Sort by timestamp
-    all_entries.sort(key=lambda x: x['timestamp'], reverse=True)
-
-    # Build response data (first 10)
     data = []
-
-    for entry in all_entries[:10]:
-        if entry['type'] == 'stock_in':
-            # StockTransaction IN
-            trans = entry['data']
-            item = Item.query.get(trans.item_id)
-            warehouse = Warehouse.query.get(trans.warehouse_id)
-
-            data.append({
-                'id': f'stin_{trans.id}',
-                'type': 'IN',
-                'item_name': item.name if item else 'Unknown',
-                'item_code': item.item_code if item else '',
-                'quantity': trans.quantity,
-                'date': trans.transaction_date.strftime('%d/%m/%Y %H:%M'),
-                'warehouse_name': warehouse.name if warehouse else 'Unknown',
-                'note': trans.note or ''
-            })
-
-        elif entry['type'] == 'return_batch':
-            # ReturnBatch
-            batch, item = entry['data']
-            item_detail = item.item_detail
-            item_obj = item_detail.item if item_detail else None
-            warehouse = batch.warehouse
-
-            data.append({
-                'id': f'ret_{batch.id}_{item.id}',
-                'type': 'IN',
-                'item_name': item_obj.name if item_obj else 'Unknown',
-                'item_code': item_obj.item_code if item_obj else '',
-                'quantity': 1,
-                'date': (batch.confirmed_at if batch.confirmed_at else batch.created_at).strftime('%d/%m/%Y %H:%M'),
-                'warehouse_name': warehouse.name if warehouse else 'Unknown',
-                'note': 'Kembali'
-            })
-
-        elif entry['type'] == 'procurement':
-            # Procurement
-            proc, item = entry['data']
-            item_obj = item.item if item else None
-            warehouse = proc.warehouse
-
-            data.append({
-                'id': f'proc_{proc.id}_{item.id}',
-                'type': 'IN',
-                'item_name': item_obj.name if item_obj else 'Unknown',
-                'item_code': item_obj.item_code if item_obj else '',
-                'quantity': item.quantity,
-                'date': (proc.completion_date if proc.completion_date else proc.created_at).strftime('%d/%m/%Y %H:%M'),
-                'warehouse_name': warehouse.name if warehouse else 'Unknown',
-                'note': f'Pengadaan #{proc.id}'
-            })
-
-        elif entry['type'] == 'distribution_group':
-            # DistributionGroup (Barang Keluar)
-            group, dist = entry['data']
-            item_detail = dist.item_detail
-            item_obj = item_detail.item if item_detail else None
-            warehouse = group.warehouse
-            unit = dist.unit if hasattr(dist, 'unit') else None
-
-            data.append({
-                'id': f'dist_{group.id}_{dist.id}',
-                'type': 'OUT',
-                'item_name': item_obj.name if item_obj else 'Unknown',
-                'item_code': item_obj.item_code if item_obj else '',
-                'quantity': 1,
-                'date': (group.verified_at if group.verified_at else group.created_at).strftime('%d/%m/%Y %H:%M'),
-                'warehouse_name': warehouse.name if warehouse else 'Unknown',
-                'unit_name': unit.name if unit else '',
-                'note': 'Distribusi'
-            })
-
-        elif entry['type'] == 'direct_distribution':
-            # Direct Distribution (Barang Keluar - Permintaan)
-            dist = entry['data']
-            item_detail = dist.item_detail
-            item_obj = item_detail.item if item_detail else None
-            warehouse = dist.warehouse if hasattr(dist, 'warehouse') else None
-            unit = dist.unit if hasattr(dist, 'unit') else None
-
-            data.append({
-                'id': f'direct_{dist.id}',
-                'type': 'OUT',
-                'item_name': item_obj.name if item_obj else 'Unknown',
-                'item_code': item_obj.item_code if item_obj else '',
-                'quantity': 1,
-                'date': dist.updated_at.strftime('%d/%m/%Y %H:%M'),
-                'warehouse_name': warehouse.name if warehouse else '-',
-                'unit_name': unit.name if unit else '',
-                'note': 'Permintaan'
-            })
+    for entry in entries:
+        if entry.movement_type == 'stock_in':
+            note = entry.note or ''
+        elif entry.movement_type == 'procurement':
+            note = entry.reference
+        else:
+            note = fixed_notes[entry.movement_type]
+
+        row = {
+            'id': f'{entry.movement_type}_{entry.source_id}_{entry.source_line_id}',
+            'type': entry.direction,
+            'item_name': entry.item_name or 'Unknown',
+            'item_code': entry.item_code or '',
+            'quantity': entry.quantity,
+            'date': entry.occurred_at.strftime('%d/%m/%Y %H:%M'),
+            'warehouse_name': entry.warehouse_name or ('-' if entry.direction == 'OUT' else 'Unknown'),
+            'note': note
+        }
+        if entry.direction == 'OUT':
+            row['unit_name'] = entry.unit_name or ''
+        data.append(row)
 
     return jsonify(data)
 
@@ -630,7 +301,7 @@ def api_unit_received_batches():
                 'warehouse_name': warehouse.name if warehouse else 'Unknown',
                 'total_items': len(batch_distributions),
                 'received_at': group.verification_received_at.strftime('%d/%m/%Y %H:%M') if group.verification_received_at else '',
-                'has_photo': batch_distributions[0].distribution_group.verification_photo is not None if batch_distributions else False,
+                'has_photo': batch_distributions[0].distribution_group.verification_photo_sha256 is not None if batch_distributions else False,
                 'first_dist_id': batch_distributions[0].id if batch_distributions else None
             })
 
@@ -641,22 +312,29 @@ def api_unit_received_batches():
 @login_required
 @role_required('unit_staff')
 def api_unit_received_chart():
-    """API for received items chart data (grafik jumlah penerimaan barang)"""
-    from app.models import Distribution, DistributionGroup
-    from app import db
-    from sqlalchemy import extract
-
+    """API for received items chart data (grafik jumlah penerimaan barang, cached)"""
     # Get user's assigned unit IDs
-    unit_ids = [uu.unit_id for uu in current_user.user_units]
+    unit_ids = sorted(get_access_scope().unit_ids)
 
     filter_type = request.args.get('filter', 'month')
     year = request.args.get('year', datetime.now().year, type=int)
     month = request.args.get('month', datetime.now().month, type=int)
+    year, month = clamp_period(year, month)
+
+    data = get_or_set_tagged('unit_received_chart', UNIT_RECEIVED_CHART_TAGS,
+                             lambda: _unit_received_chart(unit_ids, filter_type, year, month),
+                             unit_ids, filter_type, year, month)
+    return jsonify(data)
+
+
+def _unit_received_chart(unit_ids, filter_type, year, month):
+    from app.models import Distribution, DistributionGroup
+    from app import db
 
     if filter_type == 'month':
         # Get received distributions by day
         received_by_day = db.session.query(
-            extract('day', DistributionGroup.verification_received_at).label('day'),
+            wib_extract('day', DistributionGroup.verification_received_at).label('day'),
             func.count(Distribution.id).label('total')
         ).filter(
             DistributionGroup.is_draft == False,
@@ -667,10 +345,9 @@ def api_unit_received_chart():
         ).filter(
             Distribution.unit_id.in_(unit_ids),
             Distribution.verification_status == 'submitted',
-            extract('year', DistributionGroup.verification_received_at) == year,
-            extract('month', DistributionGroup.verification_received_at) == month
+            period_filter(DistributionGroup.verification_received_at, year, month)
         ).group_by(
-            extract('day', DistributionGroup.verification_received_at)
+            wib_extract('day', DistributionGroup.verification_received_at)
         ).all()
 
         import calendar
@@ -685,7 +362,7 @@ def api_unit_received_chart():
     else:  # year
         # Get received distributions by month
         received_by_month = db.session.query(
-            extract('month', DistributionGroup.verification_received_at).label('month'),
+            wib_extract('month', DistributionGroup.verification_received_at).label('month'),
             func.count(Distribution.id).label('total')
         ).filter(
             DistributionGroup.is_draft == False,
@@ -696,9 +373,9 @@ def api_unit_received_chart():
         ).filter(
             Distribution.unit_id.in_(unit_ids),
             Distribution.verification_status == 'submitted',
-            extract('year', DistributionGroup.verification_received_at) == year
+            period_filter(DistributionGroup.verification_received_at, year)
         ).group_by(
-            extract('month', DistributionGroup.verification_received_at)
+            wib_extract('month', DistributionGroup.verification_received_at)
         ).all()
 
         month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'Mei', 'Jun',
@@ -709,45 +386,51 @@ def api_unit_received_chart():
             qty = next((r.total for r in received_by_month if r.month == month_num), 0)
             data['received'].append(qty or 0)
 
-    return jsonify(data)
+    return data
 
 
 @bp.route('/api/warehouse/comparison-chart')
 @login_required
 @role_required('warehouse_staff')
 def api_warehouse_comparison_chart():
-    """API for procurement vs direct distribution comparison chart"""
-    from app.models import Procurement, ProcurementItem, Distribution
-    from app import db
-    from sqlalchemy import extract
-
+    """API for procurement vs direct distribution comparison chart (cached)"""
     # Get user's warehouse ID
     warehouse_id = get_user_warehouse_id(current_user)
 
     filter_type = request.args.get('filter', 'month')
     year = request.args.get('year', datetime.now().year, type=int)
     month = request.args.get('month', datetime.now().month, type=int)
+    year, month = clamp_period(year, month)
+
+    data = get_or_set_tagged('warehouse_comparison_chart', WAREHOUSE_COMPARISON_CHART_TAGS,
+                             lambda: _warehouse_comparison_chart(warehouse_id, filter_type, year, month),
+                             warehouse_id, filter_type, year, month)
+    return jsonify(data)
+
+
+def _warehouse_comparison_chart(warehouse_id, filter_type, year, month):
+    from app.models import Procurement, ProcurementItem, Distribution
+    from app import db
 
     if filter_type == 'month':
         # Procurement (completed) by day
         procurement_by_day = db.session.query(
-            extract('day', Procurement.completion_date).label('day'),
+            wib_extract('day', Procurement.completion_date).label('day'),
             func.sum(ProcurementItem.quantity).label('total')
         ).filter(
             Procurement.status == 'completed',
             Procurement.warehouse_id == warehouse_id,
-            extract('year', Procurement.completion_date) == year,
-            extract('month', Procurement.completion_date) == month
+            period_filter(Procurement.completion_date, year, month)
         ).join(
             ProcurementItem, Procurement.id == ProcurementItem.procurement_id
         ).group_by(
-            extract('day', Procurement.completion_date)
+            wib_extract('day', Procurement.completion_date)
         ).all()
 
         # Direct Distribution (like active_batches in installations) by day
         # Criteria: is_draft==False, draft_rejected==False, asset_request_id==None, draft_verified_at is not None
         dist_by_day = db.session.query(
-            extract('day', Distribution.draft_verified_at).label('day'),
+            wib_extract('day', Distribution.draft_verified_at).label('day'),
             func.count(Distribution.id).label('total')
         ).filter(
             Distribution.is_draft == False,
@@ -755,10 +438,9 @@ def api_warehouse_comparison_chart():
             Distribution.asset_request_id == None,
             Distribution.draft_verified_at.isnot(None),
             Distribution.warehouse_id == warehouse_id,
-            extract('year', Distribution.draft_verified_at) == year,
-            extract('month', Distribution.draft_verified_at) == month
+            period_filter(Distribution.draft_verified_at, year, month)
         ).group_by(
-            extract('day', Distribution.draft_verified_at)
+            wib_extract('day', Distribution.draft_verified_at)
         ).all()
 
         import calendar
@@ -775,21 +457,21 @@ def api_warehouse_comparison_chart():
     else:  # year
         # Procurement (completed) by month
         procurement_by_month = db.session.query(
-            extract('month', Procurement.completion_date).label('month'),
+            wib_extract('month', Procurement.completion_date).label('month'),
             func.sum(ProcurementItem.quantity).label('total')
         ).filter(
             Procurement.status == 'completed',
             Procurement.warehouse_id == warehouse_id,
-            extract('year', Procurement.completion_date) == year
+            period_filter(Procurement.completion_date, year)
         ).join(
             ProcurementItem, Procurement.id == ProcurementItem.procurement_id
         ).group_by(
-            extract('month', Procurement.completion_date)
+            wib_extract('month', Procurement.completion_date)
         ).all()
 
         # Direct Distribution (like active_batches in installations) by month
         dist_by_month = db.session.query(
-            extract('month', Distribution.draft_verified_at).label('month'),
+            wib_extract('month', Distribution.draft_verified_at).label('month'),
             func.count(Distribution.id).label('total')
         ).filter(
             Distribution.is_draft == False,
@@ -797,9 +479,9 @@ def api_warehouse_comparison_chart():
             Distribution.asset_request_id == None,
             Distribution.draft_verified_at.isnot(None),
             Distribution.warehouse_id == warehouse_id,
-            extract('year', Distribution.draft_verified_at) == year
+            period_filter(Distribution.draft_verified_at, year)
         ).group_by(
-            extract('month', Distribution.draft_verified_at)
+            wib_extract('month', Distribution.draft_verified_at)
         ).all()
 
         month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'Mei', 'Jun',
@@ -812,7 +494,7 @@ def api_warehouse_comparison_chart():
             data['procurement'].append(proc_qty or 0)
             data['distribution'].append(dist_qty or 0)
 
-    return jsonify(data)
+    return data
 
 
 @bp.route('/api/warehouse/recent-requests')
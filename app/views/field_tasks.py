@@ -1,11 +1,9 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from app import db
 from app.models import Distribution
 from app.utils.decorators import role_required
-from werkzeug.utils import secure_filename
-import os
-from datetime import datetime
+from app.services.image_pipeline import UploadError, spool_photo, process_photo
 
 bp = Blueprint('field_tasks', __name__, url_prefix='/field-tasks')
 
@@ -101,25 +99,24 @@ def submit_verification(id):
         photo_file = request.files.get('verification_photo')
         notes = request.form.get('notes', '')
 
-        photo_path = None
+        photo = None
         if photo_file and photo_file.filename:
             if allowed_file(photo_file.filename):
-                # Create uploads directory if it doesn't exist
-                upload_dir = os.path.join(current_app.root_path, 'static', 'uploads', 'verifications')
-                os.makedirs(upload_dir, exist_ok=True)
-
-                # Generate unique filename
-                filename = secure_filename(f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{photo_file.filename}")
-                photo_path = os.path.join('uploads', 'verifications', filename).replace('\\', '/')
-                full_path = os.path.join(current_app.root_path, 'static', photo_path)
-                photo_file.save(full_path)
+                # Compression and thumbnails run in the background
+                try:
+                    photo = spool_photo(photo_file)
+                except UploadError as e:
+                    flash(str(e), 'danger')
+                    return redirect(url_for('field_tasks.submit_verification', id=id))
             else:
                 flash('Format file tidak didukung. Gunakan PNG, JPG, JPEG, GIF, atau WEBP.', 'danger')
                 return redirect(url_for('field_tasks.submit_verification', id=id))
 
         # Submit verification
-        success, message = task.submit_verification(photo_path, notes)
+        success, message = task.submit_verification(photo, notes)
         if success:
+            if photo:
+                process_photo(photo)
             flash(message, 'success')
             return redirect(url_for('field_tasks.detail', id=id))
         else:
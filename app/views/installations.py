@@ -7,6 +7,7 @@ from app.forms import DistributionForm, InstallationForm
 from app.utils.decorators import role_required, warehouse_access_required
 from app.utils.datetime_helper import get_wib_now
 from app.utils.helpers import get_user_warehouse_id
+from app.services.access_scope import get_access_scope
 from app.services.notifications import (
     notify_distribution_created,
     notify_distribution_sent,
@@ -169,14 +170,7 @@ def index():
 
     if current_user.is_warehouse_staff():
         # Get all warehouse IDs this user has access to
-        # Add direct warehouse_id if exists
-        if get_user_warehouse_id(current_user):
-            accessible_warehouse_ids.append(get_user_warehouse_id(current_user))
-
-        # Add warehouses from user_warehouses assignments
-        for uw in current_user.user_warehouses.all():
-            if uw.warehouse_id not in accessible_warehouse_ids:
-                accessible_warehouse_ids.append(uw.warehouse_id)
+        accessible_warehouse_ids = list(get_access_scope().warehouse_ids)
 
         # Filter installations: only direct distributions (not from asset requests) from accessible warehouses
         # Exclude rejected drafts and draft distributions
@@ -594,10 +588,10 @@ def batch_detail(id):
     verified_distributions = []
     for dist in batch_distributions:
         # Check if distribution has individual verification photo
-        if dist.verification_photo is not None:
+        if dist.verification_photo_sha256 is not None:
             verified_distributions.append(dist)
         # Check if distribution belongs to a group with verification photo
-        elif dist.distribution_group and dist.distribution_group.verification_photo is not None:
+        elif dist.distribution_group and dist.distribution_group.verification_photo_sha256 is not None:
             verified_distributions.append(dist)
 
     return render_template('installations/batch_detail.html',
@@ -773,7 +767,9 @@ def distribute_asset_request(request_id):
             db.session.rollback()
             flash(f'Terjadi kesalahan: {str(e)}', 'danger')
 
-    # GET request - show confirmation
+    # GET request - show confirmation (stock totals of all requested items in one query)
+    from app.services.item_counts import load_item_counts
+    load_item_counts([request_item.item for request_item in asset_request.items])
     return render_template('installations/distribute_asset_request.html', asset_request=asset_request)
 
 
@@ -5,6 +5,7 @@ from app.models import Item, ItemDetail, Category
 from app.forms import CategoryForm, ItemForm, ItemDetailForm
 from app.utils.decorators import role_required
 from app.utils.helpers import generate_barcode, get_user_warehouse_id
+from app.services.item_counts import load_item_counts
 import os
 
 bp = Blueprint('items', __name__, url_prefix='/items')
@@ -73,7 +74,7 @@ def index():
         error_out=False
     )
 
-    items = pagination.items
+    items = load_item_counts(pagination.items)
     categories = Category.query.all()
 
     return render_template('items/index.html',
@@ -114,62 +115,40 @@ def create():
 @role_required('admin', 'warehouse_staff')
 def details(id):
     """Show item details and list of item details (serial numbers)"""
-    from app.models import Warehouse, Unit, Distribution, ReturnItem, VenueLoan
+    from app.models import Warehouse, Unit, ReturnItem, VenueLoan
+    from app.services.item_details import item_details_query, item_details_page
 
     item = Item.query.get_or_404(id)
+    # Summary counts for the header in one query
+    load_item_counts([item])
 
     # Get filter parameters
     location_filter = request.args.get('location', '')
     search_filter = request.args.get('search', '').strip()
     status_filter = request.args.get('status', '')
+    after = request.args.get('after', None, type=int)
 
-    # Build query for item details - NO warehouse filter, show all item_details
-    query = ItemDetail.query.filter_by(item_id=id)
-    item_details = query.all()
-
-    # Filter by status
-    if status_filter:
-        if status_filter == 'used_in_unit':
-            # Gabungkan status 'used' dan 'in_unit'
-            item_details = [d for d in item_details if d.status in ['used', 'in_unit']]
-        else:
-            item_details = [d for d in item_details if d.status == status_filter]
-
-    # Filter by location
-    if location_filter:
-        if ':' in location_filter:
-            filter_type, filter_id = location_filter.split(':', 1)
-            filter_id = int(filter_id)
-
-            if filter_type == 'warehouse':
-                # Filter by warehouse from item_details table
-                item_details = [d for d in item_details if d.warehouse_id == filter_id]
-            elif filter_type == 'unit':
-                # Filter by unit from distributions table
-                distributed_detail_ids = db.session.query(Distribution.item_detail_id).filter_by(unit_id=filter_id).all()
-                distributed_detail_ids = [d[0] for d in distributed_detail_ids]
-                item_details = [d for d in item_details if d.id in distributed_detail_ids]
-
-    # Filter by serial number search
-    if search_filter:
-        item_details = [d for d in item_details if search_filter.lower() in d.serial_number.lower()]
+    # All filters are applied in SQL - NO warehouse filter, show all item_details
+    query = item_details_query(id, status=status_filter, location=location_filter,
+                               search=search_filter)
+    item_details, next_after = item_details_page(query, after=after)
 
     # Build combined location list for dropdown - show all warehouses and units
     locations = []
-    for warehouse in Warehouse.query.all():
+    for warehouse_id, warehouse_name in db.session.query(Warehouse.id, Warehouse.name).order_by(Warehouse.name):
         locations.append({
-            'value': f'warehouse:{warehouse.id}',
-            'name': f'Warehouse: {warehouse.name}',
+            'value': f'warehouse:{warehouse_id}',
+            'name': f'Warehouse: {warehouse_name}',
             'type': 'warehouse'
         })
-    for unit in Unit.query.all():
+    for unit_id, unit_name in db.session.query(Unit.id, Unit.name).order_by(Unit.name):
         locations.append({
-            'value': f'unit:{unit.id}',
-            'name': f'Unit: {unit.name}',
+            'value': f'unit:{unit_id}',
+            'name': f'Unit: {unit_name}',
             'type': 'unit'
         })
 
-    # Get ReturnItem data for items with 'returned' status
+    # Get ReturnItem data for items with 'returned' status (current page only)
     return_items_map = {}
     returned_detail_ids = [d.id for d in item_details if d.status == 'returned']
     if returned_detail_ids:
@@ -179,13 +158,16 @@ def details(id):
         ).all()
         return_items_map = {ri.item_detail_id: ri for ri in return_items}
 
-    # Get VenueLoan data for items with 'loaned' status (via specification_notes)
+    # Get VenueLoan data for items with 'loaned' status (current page only)
     venue_loans_map = {}
-    loaned_detail_ids = [d.id for d in item_details if d.status == 'loaned']
-    if loaned_detail_ids:
-        # Get active venue loans
+    loaned_unit_detail_ids = [
+        d.distribution.unit_detail_id for d in item_details
+        if d.status == 'loaned' and d.distribution and d.distribution.unit_detail_id
+    ]
+    if loaned_unit_detail_ids:
         active_venue_loans = VenueLoan.query.filter(
-            VenueLoan.status.in_(['approved', 'active'])
+            VenueLoan.status.in_(['approved', 'active']),
+            VenueLoan.unit_detail_id.in_(loaned_unit_detail_ids)
         ).all()
 
         # Build map of unit_detail_id to venue_loan
@@ -195,6 +177,7 @@ def details(id):
     return render_template('items/details.html', item=item, item_details=item_details,
                           locations=locations, location_filter=location_filter,
                           status_filter=status_filter, search_filter=search_filter,
+                          after=after, next_after=next_after,
                           return_items_map=return_items_map,
                           venue_loans_map=venue_loans_map)
 
@@ -231,22 +214,10 @@ def create_detail():
 
             item_detail.save()
 
-            # Update stock
-            from app.models import Stock
-            stock = Stock.query.filter_by(
-                item_id=form.item_id.data,
-                warehouse_id=form.warehouse_id.data
-            ).first()
-
-            if not stock:
-                stock = Stock(
-                    item_id=form.item_id.data,
-                    warehouse_id=form.warehouse_id.data,
-                    quantity=0
-                )
-                stock.save()
-
-            stock.add_stock(1)
+            # Update stock (atomic upsert, creates the row if needed)
+            from app.services.stock_mutations import add_stock
+            add_stock(form.item_id.data, form.warehouse_id.data, 1)
+            db.session.commit()
 
             flash('Item detail berhasil dibuat!', 'success')
             return redirect(url_for('items.details', id=form.item_id.data))
@@ -11,6 +11,8 @@ from app.forms import (
     ProcurementRejectForm
 )
 from app.utils.decorators import role_required
+from app.services.access_scope import get_access_scope
+from app.services.code_sequences import generate_item_code, allocate_serial_units
 from app.services.notifications import (
     notify_procurement_created,
     notify_procurement_approved,
@@ -37,32 +39,6 @@ def validate_form_token(token):
     return stored_token and stored_token == token
 
 
-def generate_item_code(category_id):
-    """Generate item code based on category code"""
-    category = Category.query.get(category_id)
-    if not category or not category.code:
-        # Fallback if category has no code
-        return f"NEW-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-
-    prefix = category.code.upper()
-
-    # Find the last item code with this prefix
-    last_item = Item.query.filter(Item.item_code.like(f'{prefix}-%')).order_by(Item.item_code.desc()).first()
-
-    if last_item and last_item.item_code:
-        # Extract the number from the last item code (e.g., JAR-001 -> 001)
-        try:
-            last_number = int(last_item.item_code.split('-')[1])
-            new_number = last_number + 1
-        except (IndexError, ValueError):
-            new_number = 1
-    else:
-        new_number = 1
-
-    # Format: PREFIX-001 (3 digits)
-    return f"{prefix}-{new_number:03d}"
-
-
 @bp.route('/')
 @login_required
 @role_required('admin', 'warehouse_staff')
@@ -76,11 +52,10 @@ def index():
 
     # Filter by warehouse for warehouse staff
     if not current_user.is_admin():
-        from app.models.user import UserWarehouse
-        user_warehouse = UserWarehouse.query.filter_by(user_id=current_user.id).first()
+        warehouse_id = get_access_scope().warehouse_id
 
-        if user_warehouse:
-            query = query.filter_by(warehouse_id=user_warehouse.warehouse_id)
+        if warehouse_id:
+            query = query.filter_by(warehouse_id=warehouse_id)
         else:
             # If warehouse staff has no warehouse assigned, show empty list
             query = query.filter(Procurement.id == -1)
@@ -117,15 +92,14 @@ def index():
 
     # Get statistics - also filtered for warehouse staff
     if not current_user.is_admin():
-        from app.models.user import UserWarehouse
-        user_warehouse = UserWarehouse.query.filter_by(user_id=current_user.id).first()
-
-        if user_warehouse:
-            total_procurements = Procurement.query.filter_by(warehouse_id=user_warehouse.warehouse_id).count()
-            pending_count = Procurement.query.filter_by(warehouse_id=user_warehouse.warehouse_id, status='pending').count()
-            approved_count = Procurement.query.filter_by(warehouse_id=user_warehouse.warehouse_id, status='approved').count()
-            received_count = Procurement.query.filter_by(warehouse_id=user_warehouse.warehouse_id, status='received').count()
-            completed_count = Procurement.query.filter_by(warehouse_id=user_warehouse.warehouse_id, status='completed').count()
+        warehouse_id = get_access_scope().warehouse_id
+
+        if warehouse_id:
+            total_procurements = Procurement.query.filter_by(warehouse_id=warehouse_id).count()
+            pending_count = Procurement.query.filter_by(warehouse_id=warehouse_id, status='pending').count()
+            approved_count = Procurement.query.filter_by(warehouse_id=warehouse_id, status='approved').count()
+            received_count = Procurement.query.filter_by(warehouse_id=warehouse_id, status='received').count()
+            completed_count = Procurement.query.filter_by(warehouse_id=warehouse_id, status='completed').count()
         else:
             total_procurements = 0
             pending_count = 0
@@ -266,10 +240,9 @@ def _create_procurement_request(is_admin=False):
             else:
                 # Warehouse staff creates procurement - needs approval
                 # Get warehouse dari user yang login
-                from app.models.user import UserWarehouse
-                user_warehouse = UserWarehouse.query.filter_by(user_id=current_user.id).first()
+                warehouse_id = get_access_scope().warehouse_id
 
-                if not user_warehouse:
+                if not warehouse_id:
                     flash('Anda belum terassign ke warehouse manapun. Hubungi admin.', 'danger')
                     return render_template('procurement/request.html', form=form, items=Item.query.all(), categories=Category.query.all(), warehouses=Warehouse.query.all() if is_admin else [], is_admin=is_admin)
 
@@ -278,7 +251,7 @@ def _create_procurement_request(is_admin=False):
                     status='pending',  # Needs admin approval
                     requested_by=current_user.id,
                     request_date=datetime.now(),
-                    warehouse_id=user_warehouse.warehouse_id  # Otomatis set warehouse dari user
+                    warehouse_id=warehouse_id  # Otomatis set warehouse dari user
                 )
                 procurement.save()
 
@@ -437,24 +410,8 @@ def receive_goods(id):
                 # Auto-generate serial units for ALL items
                 item_code = procurement_item.item.item_code if procurement_item.item else 'ITEM'
 
-                # Get the last serial unit for this item to continue the sequence
-                last_serial_unit = ItemDetail.query.filter(
-                    ItemDetail.serial_unit.like(f'{item_code}-%')
-                ).order_by(ItemDetail.serial_unit.desc()).first()
-
-                start_num = 1
-                if last_serial_unit and last_serial_unit.serial_unit:
-                    try:
-                        last_num = int(last_serial_unit.serial_unit.split('-')[-1])
-                        start_num = last_num + 1
-                    except:
-                        start_num = 1
-
-                # Generate serial units
-                serial_units = []
-                for i in range(quantity_received):
-                    serial_unit = f"{item_code}-{str(start_num + i).zfill(3)}"
-                    serial_units.append(serial_unit)
+                # Reserve the next serial units for this item
+                serial_units = allocate_serial_units(item_code, quantity_received)
 
                 # For items that require serial number: use manual input
                 if require_serial:
@@ -537,8 +494,6 @@ def receive_goods(id):
 @role_required('warehouse_staff')
 def complete(id):
     """Step 6: Complete procurement and add to stock - only if fully received"""
-    from app.models.user import UserWarehouse
-
     procurement = Procurement.query.get_or_404(id)
 
     # Validasi: harus status received dan semua barang sudah diterima
@@ -551,14 +506,12 @@ def complete(id):
         return redirect(url_for('procurement.detail', id=id))
 
     # Get warehouse dari user yang login (warehouse staff)
-    user_warehouse = UserWarehouse.query.filter_by(user_id=current_user.id).first()
+    warehouse_id = get_access_scope().warehouse_id
 
-    if not user_warehouse:
+    if not warehouse_id:
         flash('Anda belum terassign ke warehouse manapun. Hubungi admin.', 'danger')
         return redirect(url_for('procurement.detail', id=id))
 
-    warehouse_id = user_warehouse.warehouse_id
-
     if request.method == 'POST':
         try:
             success, message = procurement.complete(
@@ -579,7 +532,7 @@ def complete(id):
 
     return render_template('procurement/complete.html',
                          procurement=procurement,
-                         warehouse=user_warehouse.warehouse)
+                         warehouse=Warehouse.query.get(warehouse_id))
 
 
 @bp.route('/<int:id>/delete', methods=['POST'])
@@ -1,8 +1,9 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from app import db
-from app.models import ReturnBatch, ReturnItem, Distribution, ItemDetail, UserWarehouse, Warehouse, Unit
+from app.models import ReturnBatch, ReturnItem, Distribution, ItemDetail, Warehouse, Unit
 from app.utils.decorators import role_required
+from app.services.access_scope import get_access_scope
 from datetime import datetime
 import json
 
@@ -11,10 +12,7 @@ bp = Blueprint('returns', __name__, url_prefix='/returns')
 
 def get_user_warehouse_id():
     """Get warehouse ID for current user"""
-    if current_user.is_admin():
-        return None
-    user_warehouse = UserWarehouse.query.filter_by(user_id=current_user.id).first()
-    return user_warehouse.warehouse_id if user_warehouse else None
+    return get_access_scope().warehouse_id
 
 
 @bp.route('/', methods=['GET'])
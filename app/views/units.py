@@ -8,6 +8,7 @@ from app.models import Unit, User, UserUnit, AssetRequest, Building, VenueLoan,
 from app.forms.unit_forms import UnitForm
 from app.forms import VenueLoanForm
 from app.utils.decorators import role_required
+from app.services.access_scope import invalidate_access_scope
 from sqlalchemy import or_
 
 bp = Blueprint('units', __name__, url_prefix='/admin/units')
@@ -363,7 +364,8 @@ def assign_staffs(id):
             # Get selected staff (only unit_staff role)
             selected_staff_ids = request.form.getlist('staff_ids')
 
-            # Remove old assignments
+            # Remove old assignments (previous staff lose access to this unit)
+            affected_user_ids = {uu.user_id for uu in UserUnit.query.filter_by(unit_id=id).all()}
             UserUnit.query.filter_by(unit_id=id).delete()
 
             # Add new assignments
@@ -375,8 +377,11 @@ def assign_staffs(id):
                         assigned_by=current_user.id
                     )
                     db.session.add(user_unit)
+                    affected_user_ids.add(int(staff_id))
 
             db.session.commit()
+            for user_id in affected_user_ids:
+                invalidate_access_scope(user_id)
             flash(f'Staff assignment untuk {unit.name} berhasil diupdate!', 'success')
             return redirect(url_for('units.detail', id=id))
 
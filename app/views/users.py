@@ -4,6 +4,7 @@ from app import db
 from app.models import User, Warehouse, UserWarehouse, Unit, UserUnit
 from app.forms.user_forms import UserForm, UserWarehouseAssignmentForm, UserUnitAssignmentForm
 from app.utils.decorators import role_required
+from app.services.access_scope import invalidate_access_scope
 from sqlalchemy import or_
 
 bp = Blueprint('users', __name__, url_prefix='/admin/users')
@@ -161,6 +162,7 @@ def edit(id):
                 user.set_password(form.password.data)
 
             user.save()
+            invalidate_access_scope(user.id)
             flash(f'User {user.name} berhasil diupdate!', 'success')
             return redirect(url_for('users.detail', id=id))
 
@@ -211,6 +213,7 @@ def assign_warehouses(id):
                     user.warehouse_id = None
 
             db.session.commit()
+            invalidate_access_scope(user.id)
             flash(f'Warehouse assignment untuk {user.name} berhasil diupdate!', 'success')
             return redirect(url_for('users.detail', id=id))
 
@@ -242,6 +245,7 @@ def activate(id):
     try:
         user.is_active = True
         user.save()
+        invalidate_access_scope(user.id)
         flash(f'User {user.name} berhasil diaktifkan!', 'success')
     except Exception as e:
         flash(f'Terjadi kesalahan: {str(e)}', 'danger')
@@ -264,6 +268,7 @@ def deactivate(id):
     try:
         user.is_active = False
         user.save()
+        invalidate_access_scope(user.id)
         flash(f'User {user.name} berhasil dinonaktifkan!', 'success')
     except Exception as e:
         flash(f'Terjadi kesalahan: {str(e)}', 'danger')
@@ -310,6 +315,7 @@ def assign_units(id):
                 db.session.add(user_unit)
 
             db.session.commit()
+            invalidate_access_scope(user.id)
             flash(f'Unit assignment untuk {user.name} berhasil diupdate!', 'success')
             return redirect(url_for('users.detail', id=id))
 
@@ -0,0 +1,179 @@
+"""
+Concurrency check for generated codes: legacy "highest code + 1" vs the
+code sequences service (app/services/code_sequences.py).
+
+N threads each create M items of the benchmark category at the same time,
+taking the item code from the generator and committing the item (as the
+procurement views do). A collision is an item whose code was already
+taken (unique violation). A second phase has the threads reserve serial
+units in blocks through allocate_serial_units() and checks that no unit
+was handed out twice. Throughput is reported per mode.
+
+Rows created by the run (items, code_sequences counters) are committed
+and deleted at the end.
+
+Usage: python benchmark/bench_code_sequences.py [--threads 16] [--ops 50]
+                                                [--block 10]
+"""
+
+import argparse
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from bench_utils import bench_app, seed_base_rows, print_header
+
+PREFIX = 'BENCHSEQ'
+
+
+def legacy_item_code(category_id):
+    """The pre-service generator: highest existing code + 1"""
+    from app.models import Category, Item
+
+    prefix = Category.query.get(category_id).code.upper()
+    last_item = Item.query.filter(Item.item_code.like(f'{prefix}-%')).order_by(Item.item_code.desc()).first()
+    try:
+        new_number = int(last_item.item_code.split('-')[1]) + 1
+    except (AttributeError, IndexError, ValueError):
+        new_number = 1
+    return f"{prefix}-{new_number:03d}"
+
+
+def service_item_code(category_id):
+    from app.services.code_sequences import generate_item_code
+    return generate_item_code(category_id)
+
+
+def run_threads(app, threads, work):
+    """Run work(number) on `threads` threads released together; returns elapsed seconds"""
+    from app import db
+
+    barrier = threading.Barrier(threads)
+
+    def worker(number):
+        with app.app_context():
+            barrier.wait()
+            try:
+                work(number)
+            finally:
+                db.session.remove()
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def create_items(app, base, generator, threads, ops):
+    """Returns (elapsed_s, created, collisions)"""
+    from app import db
+    from app.models import Item
+
+    lock = threading.Lock()
+    totals = {'created': 0, 'collisions': 0}
+
+    def work(number):
+        created = collisions = 0
+        for n in range(ops):
+            db.session.add(Item(
+                category_id=base['category_id'], item_code=generator(base['category_id']),
+                name=f'{PREFIX} item {number}-{n}', unit='unit'
+            ))
+            try:
+                db.session.commit()
+                created += 1
+            except IntegrityError:
+                db.session.rollback()
+                collisions += 1
+        with lock:
+            totals['created'] += created
+            totals['collisions'] += collisions
+
+    elapsed = run_threads(app, threads, work)
+    return elapsed, totals['created'], totals['collisions']
+
+
+def reserve_serial_units(app, item_code, threads, ops, block):
+    """Returns (elapsed_s, units, duplicated units)"""
+    from app.services.code_sequences import allocate_serial_units
+
+    lock = threading.Lock()
+    units = []
+
+    def work(number):
+        reserved = []
+        for _ in range(ops):
+            reserved.extend(allocate_serial_units(item_code, block))
+        with lock:
+            units.extend(reserved)
+
+    elapsed = run_threads(app, threads, work)
+    duplicated = sum(count - 1 for count in Counter(units).values() if count > 1)
+    return elapsed, len(units), duplicated
+
+
+def cleanup(db, base):
+    db.session.rollback()
+    for statement in (
+        "DELETE FROM code_sequences WHERE name LIKE '%' || :prefix || '%'",
+        "DELETE FROM items WHERE category_id = :category_id",
+        "DELETE FROM categories WHERE id = :category_id",
+        "DELETE FROM warehouses WHERE id = :warehouse_id",
+        "DELETE FROM units WHERE id = :unit_id",
+    ):
+        db.session.execute(text(statement), {**base, 'prefix': PREFIX})
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--ops', type=int, default=50, help='Codes per thread')
+    parser.add_argument('--block', type=int, default=10, help='Serial units per reservation')
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        from app import db
+
+        base = seed_base_rows(db.session, prefix=PREFIX)
+        db.session.commit()
+
+        failed = False
+        try:
+            print_header(f"Concurrent item codes ({args.threads} threads x {args.ops} items)")
+            print(f"{'mode':>8} | {'codes/s':>8} | {'created':>7} | {'collisions':>10}")
+            for name, generator in (('legacy', legacy_item_code), ('service', service_item_code)):
+                db.session.execute(text("DELETE FROM items WHERE category_id = :category_id"), base)
+                db.session.execute(text(
+                    "DELETE FROM code_sequences WHERE name LIKE '%' || :prefix || '%'"
+                ), {'prefix': PREFIX})
+                db.session.commit()
+
+                elapsed, created, collisions = create_items(app, base, generator, args.threads, args.ops)
+                if name == 'service' and collisions:
+                    failed = True
+                print(f"{name:>8} | {(created + collisions) / elapsed:>8.0f} | {created:>7} | {collisions:>10}")
+
+            print_header(f"Concurrent serial units ({args.threads} threads x {args.ops} x {args.block})")
+            elapsed, units, duplicated = reserve_serial_units(
+                app, f'{PREFIX}-ITEM', args.threads, args.ops, args.block
+            )
+            failed = failed or bool(duplicated)
+            print(f"{units} units in {elapsed * 1000:.0f} ms "
+                  f"({args.threads * args.ops / elapsed:.0f} reservations/s), {duplicated} duplicated")
+        finally:
+            cleanup(db, base)
+
+        if failed:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
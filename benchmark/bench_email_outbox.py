@@ -0,0 +1,137 @@
+"""
+Benchmark: inline Flask-Mail sends vs the email outbox dispatcher.
+
+Starts a local aiosmtpd server as a stand-in for the real mail server
+(optionally with an artificial per-connection handshake delay), then
+
+1. sends N messages the old way (mail.send per message: one SMTP
+   connect/EHLO/quit each),
+2. enqueues N messages through app/services/email_outbox.enqueue_email
+   and measures the per-call latency a request would see,
+3. drains the outbox with EmailDispatcher and reports delivery time and
+   how many SMTP connections were opened.
+
+With --fail-every K the server answers 451 to every K-th message so the
+retry/backoff path can be checked (those rows end up 'pending' with a
+later next_attempt_at). Outbox rows created by the run are deleted at the
+end.
+
+Requires: pip install aiosmtpd
+Usage: python benchmark/bench_email_outbox.py [--messages 200] [--handshake-ms 150]
+                                              [--fail-every 0]
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+
+from bench_utils import bench_app, print_header
+
+
+class CountingHandler:
+    """aiosmtpd handler counting sessions and accepted messages"""
+
+    def __init__(self, handshake_ms, fail_every):
+        self.handshake_ms = handshake_ms
+        self.fail_every = fail_every
+        self.connections = 0
+        self.received = 0
+        self.seen = 0
+        self._lock = threading.Lock()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        with self._lock:
+            self.connections += 1
+        if self.handshake_ms:
+            # Stand-in for TLS + AUTH round trips to a remote server
+            await asyncio.sleep(self.handshake_ms / 1000)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            self.seen += 1
+            if self.fail_every and self.seen % self.fail_every == 0:
+                return '451 Try again later'
+            self.received += 1
+        return '250 Message accepted for delivery'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--handshake-ms', type=int, default=150)
+    parser.add_argument('--fail-every', type=int, default=0)
+    parser.add_argument('--port', type=int, default=8025)
+    args = parser.parse_args()
+
+    from aiosmtpd.controller import Controller
+
+    handler = CountingHandler(args.handshake_ms, args.fail_every)
+    controller = Controller(handler, hostname='127.0.0.1', port=args.port)
+    controller.start()
+
+    app = bench_app()
+    app.config.update(
+        MAIL_SERVER='127.0.0.1', MAIL_PORT=args.port,
+        MAIL_USE_TLS=False, MAIL_USE_SSL=False,
+        MAIL_USERNAME=None, MAIL_PASSWORD=None,
+    )
+
+    html = '<p>Benchmark notification</p>' * 20
+    recipients = ['bench@example.com']
+
+    try:
+        with app.app_context():
+            from app import db, mail
+            from app.models import EmailOutbox
+            from app.services.email_outbox import enqueue_email, EmailDispatcher
+            from flask_mail import Message
+
+            print_header(f"Email delivery ({args.messages} messages, handshake {args.handshake_ms} ms)")
+
+            # 1. Old path: one connection per message, inside the request
+            handler.connections = handler.received = handler.seen = 0
+            start = time.perf_counter()
+            for n in range(args.messages):
+                mail.send(Message(subject=f'Inline {n}', recipients=recipients, html=html))
+            inline_s = time.perf_counter() - start
+            print(f"inline mail.send      : {inline_s * 1000 / args.messages:8.2f} ms/request, "
+                  f"{inline_s:6.2f} s total, {handler.connections} SMTP connections")
+
+            # 2. Outbox: the request only inserts a row
+            created = []
+            start = time.perf_counter()
+            for n in range(args.messages):
+                created.append(enqueue_email(recipients, f'Outbox {n}', html).id)
+            enqueue_s = time.perf_counter() - start
+            print(f"enqueue_email         : {enqueue_s * 1000 / args.messages:8.2f} ms/request")
+
+            # 3. Dispatcher drains the outbox over pooled connections
+            handler.connections = handler.received = handler.seen = 0
+            dispatcher = EmailDispatcher(app)
+            try:
+                start = time.perf_counter()
+                dispatcher.drain()
+                drain_s = time.perf_counter() - start
+            finally:
+                dispatcher.stop()
+
+            statuses = dict(db.session.execute(
+                db.select(EmailOutbox.status, db.func.count()).where(
+                    EmailOutbox.id.in_(created)
+                ).group_by(EmailOutbox.status)
+            ).all())
+            print(f"dispatcher drain      : {drain_s:6.2f} s total, {handler.connections} SMTP connections "
+                  f"(pool opened {dispatcher.pool.opened})")
+            print(f"outbox rows by status : {statuses}")
+
+            db.session.execute(db.delete(EmailOutbox).where(EmailOutbox.id.in_(created)))
+            db.session.commit()
+    finally:
+        controller.stop()
+
+
+if __name__ == '__main__':
+    main()
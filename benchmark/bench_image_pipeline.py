@@ -0,0 +1,95 @@
+"""
+Benchmark: time a photo upload keeps the request busy, inline compression
+(the old compress_image() in the views) vs the image pipeline
+(app/services/image_pipeline.py), which only spools the upload to the
+blob store and renders the variants in a process pool.
+
+A synthetic camera-sized JPEG is generated with PIL. Blobs are written to
+a temporary BLOB_STORE_FOLDER that is removed at the end.
+
+Usage: python benchmark/bench_image_pipeline.py [--width 4000] [--height 3000]
+                                                [--uploads 8]
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+from io import BytesIO
+
+from bench_utils import bench_app, timed, print_header
+
+
+def synthetic_photo(width, height):
+    """Noisy JPEG that compresses like a real photo"""
+    import os
+    from PIL import Image
+    img = Image.frombytes('RGB', (width, height), os.urandom(width * height * 3))
+    img = img.resize((width // 4, height // 4)).resize((width, height))
+    output = BytesIO()
+    img.save(output, format='JPEG', quality=95)
+    return output.getvalue()
+
+
+def legacy_compress(image_bytes, max_size_kb=500, quality=85):
+    """The pre-pipeline compress_image(), as run inside the request"""
+    from PIL import Image
+    img = Image.open(BytesIO(image_bytes))
+    if max(img.size) > 1920:
+        ratio = 1920 / max(img.size)
+        img = img.resize(tuple(int(dim * ratio) for dim in img.size), Image.Resampling.LANCZOS)
+    output = BytesIO()
+    img.save(output, format='JPEG', quality=quality, optimize=True)
+    while output.tell() > max_size_kb * 1024 and quality > 50:
+        quality -= 5
+        output = BytesIO()
+        img.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def upload(data, number):
+    from werkzeug.datastructures import FileStorage
+    return FileStorage(stream=BytesIO(data + number.to_bytes(4, 'big')), filename='photo.jpg')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    parser.add_argument('--uploads', type=int, default=8)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='bench-blobs-')
+    app = bench_app()
+    app.config['BLOB_STORE_FOLDER'] = folder
+    try:
+        with app.test_request_context():
+            from app.services.image_pipeline import spool_photo, process_photo, photo_status
+
+            data = synthetic_photo(args.width, args.height)
+            print_header(f"Photo upload ({args.width}x{args.height}, {len(data) / 1024:.0f}KB)")
+
+            inline_ms, compressed = timed(legacy_compress, data)
+            print(f"inline compression in request : {inline_ms:8.1f} ms ({len(compressed) / 1024:.0f}KB)")
+
+            counter = iter(range(10 ** 6))
+            spool_ms, (digest, _) = timed(lambda: spool_photo(upload(data, next(counter))))
+            print(f"spool to blob store in request: {spool_ms:8.1f} ms")
+
+            # Render a batch in the pool and wait for it (includes worker start-up)
+            digests = [spool_photo(upload(data, next(counter)))[0] for _ in range(args.uploads)]
+            start = time.perf_counter()
+            for d in digests:
+                process_photo(d)
+            while any(photo_status(d) == 'pending' for d in digests):
+                time.sleep(0.05)
+            elapsed = (time.perf_counter() - start) * 1000
+            ready = sum(photo_status(d) == 'ready' for d in digests)
+            print(f"background variants           : {elapsed / args.uploads:8.1f} ms/photo "
+                  f"({ready}/{args.uploads} ready, off-request)")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
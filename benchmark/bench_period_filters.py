@@ -0,0 +1,150 @@
+"""
+Benchmark: extract('year'/'month') predicates vs sargable [start, end)
+period filters (app/utils/datetime_helper.period_filter).
+
+Seeds several years of stock transactions and stock ledger rows inside a
+transaction (rolled back at the end), creates the period-filter indexes
+from migrations/add_performance_indexes.py and prints, for each report
+query, the execution time and the plan of both predicate styles. The
+range predicates should show Index (Only) Scans where extract() falls
+back to sequential scans.
+
+Usage: python benchmark/bench_period_filters.py [--rows 500000] [--years 5]
+                                                [--year 2024] [--month 6]
+"""
+
+import argparse
+
+from bench_utils import bench_app, seed_base_rows, print_header
+from sqlalchemy import text
+
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_stock_transactions_type_date "
+    "ON stock_transactions(transaction_type, transaction_date) INCLUDE (quantity)",
+    "CREATE INDEX IF NOT EXISTS idx_stock_ledger_occurred_cover "
+    "ON stock_ledger(occurred_at) INCLUDE (direction, quantity, movement_type, warehouse_id)",
+]
+
+
+def seed_history(session, base, rows, years, end_year):
+    """Spread `rows` stock transactions and ledger rows over `years` years"""
+    params = {**base, 'rows': rows, 'years': years, 'end_year': end_year}
+
+    session.execute(text(
+        "INSERT INTO stock_transactions (item_id, warehouse_id, transaction_type, quantity, "
+        "transaction_date, note, created_at) "
+        "SELECT :item_id, :warehouse_id, CASE WHEN g % 2 = 0 THEN 'IN' ELSE 'OUT' END, "
+        "1 + (g % 5), make_timestamp(:end_year - :years + 1, 1, 1, 0, 0, 0) "
+        "+ random() * (interval '1 year' * :years), 'Benchmark', now() "
+        "FROM generate_series(1, :rows) AS g"
+    ), params)
+
+    session.execute(text(
+        "INSERT INTO stock_ledger (occurred_at, movement_type, direction, quantity, warehouse_id, "
+        "item_id, source_id, source_line_id, created_at, updated_at) "
+        "SELECT transaction_date, CASE WHEN transaction_type = 'IN' THEN 'stock_in' ELSE 'stock_out' END, "
+        "transaction_type, quantity, warehouse_id, item_id, id, 0, now(), now() "
+        "FROM stock_transactions WHERE note = 'Benchmark' AND item_id = :item_id"
+    ), params)
+
+    session.execute(text("ANALYZE stock_transactions"))
+    session.execute(text("ANALYZE stock_ledger"))
+
+
+def explain(session, stmt):
+    """Return (execution ms, plan lines) of an EXPLAIN ANALYZE run"""
+    from app import db
+
+    compiled = stmt.compile(db.engine, compile_kwargs={'literal_binds': True})
+    plan = session.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {compiled}")).scalars().all()
+    execution = next((line for line in plan if line.startswith('Execution Time')), '')
+    ms = float(execution.split(':')[1].split('ms')[0]) if execution else float('nan')
+    return ms, plan
+
+
+def scan_types(plan):
+    """Short summary of the scan nodes of a plan"""
+    kinds = ('Index Only Scan', 'Index Scan', 'Bitmap Heap Scan', 'Seq Scan')
+    found = []
+    for line in plan:
+        for kind in kinds:
+            if kind in line and kind not in found:
+                found.append(kind)
+                break
+    return ', '.join(found) or '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--year', type=int, default=2024)
+    parser.add_argument('--month', type=int, default=6)
+    parser.add_argument('--plans', action='store_true', help='Print full query plans')
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        from app import db
+        from app.models import StockTransaction, StockLedger
+        from app.utils.datetime_helper import period_filter, wib_extract
+        from sqlalchemy import func, extract
+
+        session = db.session
+        try:
+            for sql in INDEXES:
+                session.execute(text(sql))
+            base = seed_base_rows(session)
+            seed_history(session, base, args.rows, args.years, args.year)
+
+            year, month = args.year, args.month
+            cases = [
+                ('stock tx IN, one month',
+                 db.select(func.sum(StockTransaction.quantity)).where(
+                     StockTransaction.transaction_type == 'IN',
+                     extract('year', StockTransaction.transaction_date) == year,
+                     extract('month', StockTransaction.transaction_date) == month),
+                 db.select(func.sum(StockTransaction.quantity)).where(
+                     StockTransaction.transaction_type == 'IN',
+                     period_filter(StockTransaction.transaction_date, year, month))),
+                ('ledger daily chart',
+                 db.select(extract('day', StockLedger.occurred_at), StockLedger.direction,
+                           func.sum(StockLedger.quantity)).where(
+                     extract('year', StockLedger.occurred_at) == year,
+                     extract('month', StockLedger.occurred_at) == month
+                 ).group_by(extract('day', StockLedger.occurred_at), StockLedger.direction),
+                 db.select(wib_extract('day', StockLedger.occurred_at), StockLedger.direction,
+                           func.sum(StockLedger.quantity)).where(
+                     period_filter(StockLedger.occurred_at, year, month)
+                 ).group_by(wib_extract('day', StockLedger.occurred_at), StockLedger.direction)),
+                ('ledger yearly totals',
+                 db.select(StockLedger.movement_type, func.sum(StockLedger.quantity)).where(
+                     extract('year', StockLedger.occurred_at) == year
+                 ).group_by(StockLedger.movement_type),
+                 db.select(StockLedger.movement_type, func.sum(StockLedger.quantity)).where(
+                     period_filter(StockLedger.occurred_at, year)
+                 ).group_by(StockLedger.movement_type)),
+            ]
+
+            print_header(f"Period filter benchmark ({args.rows} rows over {args.years} years)")
+            print(f"{'query':<24} | {'extract ms':>10} | {'range ms':>9} | plans (extract -> range)")
+            for name, legacy, sargable in cases:
+                legacy_ms, legacy_plan = explain(session, legacy)
+                range_ms, range_plan = explain(session, sargable)
+                print(f"{name:<24} | {legacy_ms:>10.2f} | {range_ms:>9.2f} | "
+                      f"{scan_types(legacy_plan)} -> {scan_types(range_plan)}")
+                if args.plans:
+                    print("\n  extract():")
+                    for line in legacy_plan:
+                        print(f"    {line}")
+                    print("  [start, end):")
+                    for line in range_plan:
+                        print(f"    {line}")
+                    print()
+        finally:
+            session.rollback()
+
+
+if __name__ == '__main__':
+    main()
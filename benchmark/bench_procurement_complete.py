@@ -0,0 +1,199 @@
+"""
+Concurrency check and timing for Procurement.complete.
+
+Each round seeds a received procurement (several items, serials received
+through Procurement.receive_goods) and fires two completions at it from
+two threads released by a barrier. Exactly one must succeed, and stock,
+stock transactions, stock ledger rows and item detail warehouses must
+reflect a single completion. The time of the winning completion is
+reported per round.
+
+Procurement.complete really commits, so every row created by the run
+(including ledger and daily rollup rows of the benchmark warehouse) is
+deleted at the end.
+
+Usage: python benchmark/bench_procurement_complete.py [--rounds 5] [--items 3]
+                                                      [--units 200]
+"""
+
+import argparse
+import threading
+import time
+
+from sqlalchemy import text
+
+from bench_utils import bench_app, seed_base_rows, print_header
+
+PREFIX = 'BENCHCMP'
+
+
+def seed_procurement(db, base, user_id, items, units, round_no):
+    """A received procurement with `items` lines of `units` each; returns its id"""
+    from app.models import Procurement, ProcurementItem
+
+    procurement = Procurement(requested_by=user_id, status='approved')
+    db.session.add(procurement)
+    db.session.flush()
+    for _ in range(items):
+        # Same item on every line: completion must aggregate before the upsert
+        db.session.add(ProcurementItem(
+            procurement_id=procurement.id, item_id=base['item_id'], quantity=units
+        ))
+    db.session.commit()
+
+    items_data = []
+    for line, procurement_item in enumerate(procurement.items):
+        serials = [f'{PREFIX}-R{round_no}-L{line}-SN-{n}' for n in range(units)]
+        items_data.append({
+            'procurement_item_id': procurement_item.id,
+            'quantity_received': units,
+            'serial_numbers': serials,
+            'serial_units': [f'{PREFIX}-R{round_no}-L{line}-{n:05d}' for n in range(units)],
+        })
+    success, message = procurement.receive_goods(user_id, f'{PREFIX}-INV-{round_no}', items_data)
+    assert success, message
+    return procurement.id
+
+
+def race(app, procurement_id, user_id, warehouse_id):
+    """Two concurrent completions; returns [(success, message, ms), ...]"""
+    from app import db
+    from app.models import Procurement
+
+    barrier = threading.Barrier(2)
+    results = []
+
+    def worker():
+        with app.app_context():
+            try:
+                procurement = db.session.get(Procurement, procurement_id)
+                procurement.items  # Load outside the timed section
+                barrier.wait()
+                start = time.perf_counter()
+                success, message = procurement.complete(user_id, warehouse_id)
+                results.append((success, message, (time.perf_counter() - start) * 1000))
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def check(db, procurement_id, warehouse_id, expected_quantity, stock_before):
+    """Effects of exactly one completion; returns a list of problems"""
+    problems = []
+    params = {'id': procurement_id, 'warehouse_id': warehouse_id}
+
+    stock = db.session.execute(text(
+        "SELECT COALESCE(SUM(quantity), 0) FROM stocks WHERE warehouse_id = :warehouse_id"
+    ), params).scalar()
+    if stock - stock_before != expected_quantity:
+        problems.append(f'stock grew by {stock - stock_before}, expected {expected_quantity}')
+
+    transactions = db.session.execute(text(
+        "SELECT COUNT(*) FROM stock_transactions WHERE warehouse_id = :warehouse_id "
+        "AND note LIKE 'Pengadaan #' || :id || ' %'"
+    ), params).scalar()
+    lines = db.session.execute(text(
+        "SELECT COUNT(*) FROM procurement_items WHERE procurement_id = :id"
+    ), params).scalar()
+    if transactions != lines:
+        problems.append(f'{transactions} stock transactions, expected {lines}')
+
+    ledger = db.session.execute(text(
+        "SELECT COUNT(*) FROM stock_ledger WHERE movement_type = 'procurement' AND source_id = :id"
+    ), params).scalar()
+    if ledger != lines:
+        problems.append(f'{ledger} ledger rows, expected {lines}')
+
+    unassigned = db.session.execute(text(
+        "SELECT COUNT(*) FROM item_details d JOIN procurement_receipt_serials s "
+        "ON s.serial_number = d.serial_number JOIN procurement_items pi ON pi.id = s.procurement_item_id "
+        "WHERE pi.procurement_id = :id AND d.warehouse_id IS DISTINCT FROM :warehouse_id"
+    ), params).scalar()
+    if unassigned:
+        problems.append(f'{unassigned} item details not in the warehouse')
+    return problems
+
+
+def cleanup(db, base, user_id):
+    params = {**base, 'user_id': user_id}
+    db.session.rollback()
+    for statement in (
+        "DELETE FROM stock_ledger WHERE warehouse_id = :warehouse_id",
+        "DELETE FROM stock_daily_rollups WHERE warehouse_id = :warehouse_id",
+        "DELETE FROM stock_transactions WHERE warehouse_id = :warehouse_id",
+        "DELETE FROM stocks WHERE warehouse_id = :warehouse_id",
+        "DELETE FROM procurement_receipt_serials WHERE procurement_item_id IN "
+        "(SELECT id FROM procurement_items WHERE item_id = :item_id)",
+        "DELETE FROM procurement_receipts WHERE procurement_item_id IN "
+        "(SELECT id FROM procurement_items WHERE item_id = :item_id)",
+        "DELETE FROM procurement_items WHERE item_id = :item_id",
+        "DELETE FROM procurements WHERE requested_by = :user_id",
+        "DELETE FROM item_details WHERE item_id = :item_id",
+        "DELETE FROM users WHERE id = :user_id",
+        "DELETE FROM items WHERE id = :item_id",
+        "DELETE FROM categories WHERE id = :category_id",
+        "DELETE FROM warehouses WHERE id = :warehouse_id",
+        "DELETE FROM units WHERE id = :unit_id",
+    ):
+        db.session.execute(text(statement), params)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--items', type=int, default=3)
+    parser.add_argument('--units', type=int, default=200)
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        from app import db
+
+        base = seed_base_rows(db.session, prefix=PREFIX)
+        user_id = db.session.execute(text(
+            "INSERT INTO users (name, email, password_hash, role, is_active, email_notifications, created_at) "
+            "VALUES ('Benchmark', :email, '-', 'warehouse_staff', true, false, now()) RETURNING id"
+        ), {'email': f'{PREFIX.lower()}@example.invalid'}).scalar()
+        db.session.commit()
+
+        failures = 0
+        try:
+            print_header(f"Concurrent Procurement.complete ({args.items} items x {args.units} units)")
+            print(f"{'round':>5} | {'winners':>7} | {'complete ms':>11} | result")
+
+            for round_no in range(1, args.rounds + 1):
+                procurement_id = seed_procurement(db, base, user_id, args.items, args.units, round_no)
+                stock_before = db.session.execute(text(
+                    "SELECT COALESCE(SUM(quantity), 0) FROM stocks WHERE warehouse_id = :warehouse_id"
+                ), base).scalar()
+                db.session.commit()
+
+                results = race(app, procurement_id, user_id, base['warehouse_id'])
+                db.session.expire_all()
+
+                winners = [r for r in results if r[0]]
+                problems = check(db, procurement_id, base['warehouse_id'],
+                                 args.items * args.units, stock_before)
+                if len(winners) != 1:
+                    problems.insert(0, f'{len(winners)} completions succeeded')
+                failures += bool(problems)
+
+                elapsed = f"{winners[0][2]:.1f}" if winners else '-'
+                print(f"{round_no:>5} | {len(winners):>7} | {elapsed:>11} | {'; '.join(problems) or 'OK'}")
+        finally:
+            cleanup(db, base, user_id)
+
+        print(f"\n{args.rounds - failures}/{args.rounds} rounds consistent")
+        if failures:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: receiving a procurement delivery, legacy per-unit loop vs the
+bulk receive path (app/services/procurement_receiving.py).
+
+For each delivery size the legacy loop (two ItemDetail lookups and one
+commit per unit) and receive_serials() (one duplicate-check query and one
+multi-row INSERT ... ON CONFLICT DO NOTHING, committed once) receive the
+same number of fresh serials. A second bulk run re-receives the same
+serials to show the duplicate path. Both paths really commit, so the rows
+created by the run are deleted at the end.
+
+Usage: python benchmark/bench_procurement_receive.py [--sizes 10 100 1000]
+"""
+
+import argparse
+from collections import Counter
+
+from bench_utils import bench_app, timed, count_queries, seed_base_rows, print_header
+
+
+def legacy_receive(item_id, pairs):
+    """The pre-bulk loop of ProcurementItem.add_receipt_to_history"""
+    from app.models import ItemDetail
+
+    created = 0
+    for serial_number, serial_unit in pairs:
+        if ItemDetail.query.filter_by(serial_number=serial_number).first():
+            continue
+        if ItemDetail.query.filter_by(serial_unit=serial_unit).first():
+            continue
+        ItemDetail(
+            item_id=item_id,
+            serial_number=serial_number,
+            serial_unit=serial_unit,
+            status='available',
+            warehouse_id=None,
+            specification_notes='Diterima melalui procurement #N/A'
+        ).save()
+        created += 1
+    return created
+
+
+def bulk_receive(item_id, pairs):
+    from app import db
+    from app.services.procurement_receiving import receive_serials
+
+    outcomes = receive_serials(item_id, None, pairs)
+    db.session.commit()
+    return Counter(o['status'] for o in outcomes)
+
+
+def cleanup(base):
+    from sqlalchemy import text
+    from app import db
+
+    db.session.rollback()
+    db.session.execute(text("DELETE FROM item_details WHERE item_id = :item_id"), base)
+    db.session.execute(text("DELETE FROM items WHERE id = :item_id"), base)
+    db.session.execute(text("DELETE FROM categories WHERE id = :category_id"), base)
+    db.session.execute(text("DELETE FROM warehouses WHERE id = :warehouse_id"), base)
+    db.session.execute(text("DELETE FROM units WHERE id = :unit_id"), base)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        from app import db
+        counter = count_queries(db.engine)
+
+        base = seed_base_rows(db.session, prefix='BENCHRCV')
+        db.session.commit()
+
+        try:
+            print_header("Procurement receive benchmark")
+            print(f"{'units':>7} | {'legacy ms':>10} | {'legacy q':>9} | {'bulk ms':>9} | {'bulk q':>7} | "
+                  f"{'dup ms':>7} | outcomes")
+
+            for size in args.sizes:
+                legacy_pairs = [(f'BENCHRCV-L{size}-SN-{n}', f'BENCHRCV-L{size}-SU-{n:05d}') for n in range(size)]
+                bulk_pairs = [(f'BENCHRCV-B{size}-SN-{n}', f'BENCHRCV-B{size}-SU-{n:05d}') for n in range(size)]
+
+                counter['count'] = 0
+                legacy_ms, created = timed(legacy_receive, base['item_id'], legacy_pairs, repeat=1)
+                legacy_q = counter['count']
+                assert created == size
+
+                counter['count'] = 0
+                bulk_ms, outcomes = timed(bulk_receive, base['item_id'], bulk_pairs, repeat=1)
+                bulk_q = counter['count']
+                assert outcomes['created'] == size
+
+                # Same serials again: everything is reported as a duplicate
+                dup_ms, dup_outcomes = timed(bulk_receive, base['item_id'], bulk_pairs, repeat=1)
+
+                print(f"{size:>7} | {legacy_ms:>10.1f} | {legacy_q:>9} | {bulk_ms:>9.1f} | {bulk_q:>7} | "
+                      f"{dup_ms:>7.1f} | {dict(dup_outcomes)}")
+        finally:
+            cleanup(base)
+
+
+if __name__ == '__main__':
+    main()
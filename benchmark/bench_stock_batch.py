@@ -0,0 +1,101 @@
+"""
+Benchmark: batch stock movements (app/services/stock_mutations.apply_stock_batch)
+vs one apply_stock_transaction call per line.
+
+Seeds a set of items with stock in one warehouse inside a transaction
+(rolled back at the end) and applies a random IN/OUT mix of 100 / 1k /
+10k lines, reporting wall time and statement count. The per-line path
+is only run up to --single-limit lines.
+
+Usage: python benchmark/bench_stock_batch.py [--sizes 100 1000 10000]
+                                             [--items 200] [--single-limit 1000]
+"""
+
+import argparse
+import random
+
+from sqlalchemy import text
+
+from bench_utils import bench_app, timed, count_queries, seed_base_rows, print_header
+
+
+def seed_items(session, base, count):
+    """`count` extra items of the benchmark category, each with 1000 in stock"""
+    item_ids = list(session.execute(text(
+        "INSERT INTO items (category_id, item_code, name, unit, created_at) "
+        "SELECT :category_id, 'BENCHBATCH-' || g, 'Batch item ' || g, 'unit', now() "
+        "FROM generate_series(1, :count) AS g RETURNING id"
+    ), {**base, 'count': count}).scalars())
+    session.execute(text(
+        "INSERT INTO stocks (item_id, warehouse_id, quantity, created_at, updated_at) "
+        "SELECT id, :warehouse_id, 1000, now(), now() FROM unnest(CAST(:ids AS integer[])) AS id"
+    ), {**base, 'ids': item_ids})
+    return item_ids
+
+
+def movements_for(item_ids, warehouse_id, size, seed=1):
+    rng = random.Random(seed)
+    return [{
+        'item_id': rng.choice(item_ids),
+        'warehouse_id': warehouse_id,
+        'transaction_type': 'IN' if rng.random() < 0.5 else 'OUT',
+        'quantity': rng.randint(1, 5),
+        'note': 'Benchmark batch',
+    } for _ in range(size)]
+
+
+def per_line(movements):
+    from app.services.stock_mutations import apply_stock_transaction
+    for m in movements:
+        apply_stock_transaction(m['item_id'], m['warehouse_id'], m['transaction_type'],
+                                m['quantity'], m['note'], commit=False)
+
+
+def batch(movements):
+    from app.services.stock_mutations import apply_stock_batch
+    success, results = apply_stock_batch(movements, commit=False)
+    assert success, [r for r in results if not r['success']][:3]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--items', type=int, default=200)
+    parser.add_argument('--single-limit', type=int, default=1000)
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        from app import db
+        counter = count_queries(db.engine)
+
+        print_header("Batch stock movements benchmark")
+        print(f"{'lines':>7} | {'per-line ms':>11} | {'per-line q':>10} | {'batch ms':>9} | {'batch q':>7}")
+
+        for size in args.sizes:
+            try:
+                base = seed_base_rows(db.session, prefix='BENCHBATCH')
+                item_ids = seed_items(db.session, base, args.items)
+                movements = movements_for(item_ids, base['warehouse_id'], size)
+
+                single_ms, single_q = '-', '-'
+                if size <= args.single_limit:
+                    db.session.execute(text("SAVEPOINT bench_single"))
+                    counter['count'] = 0
+                    single_ms, _ = timed(per_line, movements, repeat=1)
+                    single_q = counter['count']
+                    single_ms = f"{single_ms:.1f}"
+                    db.session.execute(text("ROLLBACK TO SAVEPOINT bench_single"))
+
+                counter['count'] = 0
+                batch_ms, _ = timed(batch, movements, repeat=1)
+                batch_q = counter['count']
+
+                print(f"{size:>7} | {single_ms:>11} | {single_q:>10} | {batch_ms:>9.1f} | {batch_q:>7}")
+            finally:
+                db.session.rollback()
+
+
+if __name__ == '__main__':
+    main()
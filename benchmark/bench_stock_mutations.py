@@ -0,0 +1,188 @@
+"""
+Stress test: concurrent stock transactions, legacy read-modify-write vs
+the atomic stock mutation service (app/services/stock_mutations.py).
+
+N threads each run M random IN/OUT transactions against the same stock
+row (like several warehouse staff on the threaded gunicorn workers).
+Afterwards the final quantity is compared with
+    initial + successful INs - successful OUTs
+and with the logged stock transactions. Any difference is a lost update;
+a negative balance is an oversell. Throughput is reported per mode.
+
+Rows created by the run are committed (that is what is being tested) and
+deleted at the end.
+
+Usage: python benchmark/bench_stock_mutations.py [--threads 16] [--ops 200]
+                                                 [--initial 100]
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from sqlalchemy import text
+
+from bench_utils import bench_app, seed_base_rows, print_header
+
+PREFIX = 'BENCHSTK'
+
+
+def legacy_transaction(item_id, warehouse_id, transaction_type, quantity):
+    """The pre-service path: get the row, mutate in Python, commit, then log"""
+    from app import db
+    from app.models import Stock, StockTransaction
+
+    stock = Stock.query.filter_by(item_id=item_id, warehouse_id=warehouse_id).first()
+    if transaction_type == 'IN':
+        stock.quantity += quantity
+        db.session.commit()
+    else:
+        if stock.quantity < quantity:
+            db.session.rollback()
+            return False
+        stock.quantity -= quantity
+        db.session.commit()
+    db.session.add(StockTransaction(
+        item_id=item_id, warehouse_id=warehouse_id, transaction_type=transaction_type,
+        quantity=quantity, note=f'{PREFIX} legacy'
+    ))
+    db.session.commit()
+    return True
+
+
+def service_transaction(item_id, warehouse_id, transaction_type, quantity):
+    from app.services.stock_mutations import apply_stock_transaction
+    success, _, _ = apply_stock_transaction(
+        item_id, warehouse_id, transaction_type, quantity, note=f'{PREFIX} service'
+    )
+    return success
+
+
+def run_mode(app, transaction, base, threads, ops, seed):
+    """Run the workload; returns (elapsed_s, applied_in, applied_out, errors)"""
+    from app import db
+
+    barrier = threading.Barrier(threads)
+    lock = threading.Lock()
+    totals = {'in': 0, 'out': 0, 'errors': 0}
+
+    def worker(number):
+        rng = random.Random(seed + number)
+        applied_in = applied_out = errors = 0
+        with app.app_context():
+            barrier.wait()
+            for _ in range(ops):
+                transaction_type = 'IN' if rng.random() < 0.45 else 'OUT'
+                quantity = rng.randint(1, 3)
+                try:
+                    if transaction(base['item_id'], base['warehouse_id'], transaction_type, quantity):
+                        if transaction_type == 'IN':
+                            applied_in += quantity
+                        else:
+                            applied_out += quantity
+                except Exception:
+                    db.session.rollback()
+                    errors += 1
+            db.session.remove()
+        with lock:
+            totals['in'] += applied_in
+            totals['out'] += applied_out
+            totals['errors'] += errors
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start, totals['in'], totals['out'], totals['errors']
+
+
+def reset_stock(db, base, initial):
+    db.session.execute(text(
+        "DELETE FROM stock_transactions WHERE warehouse_id = :warehouse_id"
+    ), base)
+    db.session.execute(text(
+        "INSERT INTO stocks (item_id, warehouse_id, quantity, created_at, updated_at) "
+        "VALUES (:item_id, :warehouse_id, :initial, now(), now()) "
+        "ON CONFLICT (item_id, warehouse_id) DO UPDATE SET quantity = :initial"
+    ), {**base, 'initial': initial})
+    db.session.commit()
+
+
+def cleanup(db, base):
+    db.session.rollback()
+    for statement in (
+        "DELETE FROM stock_ledger WHERE warehouse_id = :warehouse_id",
+        "DELETE FROM stock_daily_rollups WHERE warehouse_id = :warehouse_id",
+        "DELETE FROM stock_transactions WHERE warehouse_id = :warehouse_id",
+        "DELETE FROM stocks WHERE warehouse_id = :warehouse_id",
+        "DELETE FROM items WHERE id = :item_id",
+        "DELETE FROM categories WHERE id = :category_id",
+        "DELETE FROM warehouses WHERE id = :warehouse_id",
+        "DELETE FROM units WHERE id = :unit_id",
+    ):
+        db.session.execute(text(statement), base)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--ops', type=int, default=200, help='Transactions per thread')
+    parser.add_argument('--initial', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        from app import db
+
+        base = seed_base_rows(db.session, prefix=PREFIX)
+        db.session.commit()
+
+        failed = False
+        try:
+            print_header(f"Concurrent stock transactions ({args.threads} threads x {args.ops} ops)")
+            print(f"{'mode':>8} | {'ops/s':>8} | {'final':>6} | {'expected':>8} | {'logged':>7} | "
+                  f"{'errors':>6} | result")
+
+            for name, transaction in (('legacy', legacy_transaction), ('service', service_transaction)):
+                reset_stock(db, base, args.initial)
+                elapsed, applied_in, applied_out, errors = run_mode(
+                    app, transaction, base, args.threads, args.ops, args.seed
+                )
+
+                final = db.session.execute(text(
+                    "SELECT quantity FROM stocks WHERE item_id = :item_id AND warehouse_id = :warehouse_id"
+                ), base).scalar()
+                logged = db.session.execute(text(
+                    "SELECT COALESCE(SUM(CASE WHEN transaction_type = 'IN' THEN quantity ELSE -quantity END), 0) "
+                    "FROM stock_transactions WHERE warehouse_id = :warehouse_id"
+                ), base).scalar()
+                db.session.commit()
+
+                expected = args.initial + applied_in - applied_out
+                problems = []
+                if final != expected:
+                    problems.append(f'{expected - final:+d} lost')
+                if args.initial + logged != final:
+                    problems.append('log differs from stock')
+                if final < 0 or expected < 0:
+                    problems.append('oversold')
+                if name == 'service':
+                    failed = bool(problems)
+
+                ops_per_s = args.threads * args.ops / elapsed
+                print(f"{name:>8} | {ops_per_s:>8.0f} | {final:>6} | {expected:>8} | "
+                      f"{args.initial + logged:>7} | {errors:>6} | {', '.join(problems) or 'OK'}")
+        finally:
+            cleanup(db, base)
+
+        if failed:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
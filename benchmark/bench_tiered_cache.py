@@ -0,0 +1,108 @@
+"""
+Stampede check for expensive aggregates: plain get/set caching vs the
+two-tier cache (app/services/tiered_cache.py).
+
+N threads ask for the same key at the same moment while it is missing,
+as happens when a dashboard entry expires or its tag is bumped. The
+aggregate is simulated by a sleep, so no database is needed. For each
+mode it reports how many times the aggregate was computed and the
+slowest caller's latency. A second phase lets the entry go stale and
+checks that callers are answered immediately while one background
+refresh runs. Per-family metrics are printed at the end.
+
+Uses the configured cache backend (CACHE_TYPE); SimpleCache keeps
+everything inside this process.
+
+Usage: python benchmark/bench_tiered_cache.py [--threads 32] [--compute-ms 200]
+"""
+
+import argparse
+import threading
+import time
+
+from bench_utils import bench_app, print_header
+
+
+def run_threads(app, threads, work):
+    """Run work() on `threads` threads released together; returns per-call latencies in ms"""
+    barrier = threading.Barrier(threads)
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        with app.app_context():
+            barrier.wait()
+            start = time.perf_counter()
+            work()
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--compute-ms', type=int, default=200)
+    args = parser.parse_args()
+
+    app = bench_app()
+
+    from app import cache
+    from app.services.tiered_cache import get_or_compute, cache_metrics, reset_local_cache
+
+    computes = {'count': 0}
+    counter_lock = threading.Lock()
+
+    def aggregate():
+        with counter_lock:
+            computes['count'] += 1
+        time.sleep(args.compute_ms / 1000)
+        return {'total': 42}
+
+    print_header(f"Cache stampede: {args.threads} concurrent misses, {args.compute_ms}ms aggregate")
+
+    with app.app_context():
+        cache.delete('bench_plain')
+        cache.delete('bench_tiered')
+        reset_local_cache()
+
+    def plain():
+        value = cache.get('bench_plain')
+        if value is None:
+            value = aggregate()
+            cache.set('bench_plain', value, timeout=60)
+        return value
+
+    computes['count'] = 0
+    latencies = run_threads(app, args.threads, plain)
+    print(f"{'get/set':<12} computes={computes['count']:<4} slowest={max(latencies):.1f}ms")
+
+    computes['count'] = 0
+    latencies = run_threads(app, args.threads,
+                            lambda: get_or_compute('bench', 'bench_tiered', aggregate, ttl=1))
+    print(f"{'tiered':<12} computes={computes['count']:<4} slowest={max(latencies):.1f}ms")
+
+    # Let the entry go stale: callers get the old value, one refresh runs
+    time.sleep(1.2)
+    computes['count'] = 0
+    latencies = run_threads(app, args.threads,
+                            lambda: get_or_compute('bench', 'bench_tiered', aggregate, ttl=1))
+    time.sleep(args.compute_ms / 1000 + 0.2)
+    print(f"{'stale':<12} computes={computes['count']:<4} slowest={max(latencies):.1f}ms (refreshed in background)")
+
+    with app.app_context():
+        print()
+        for family, metrics in cache_metrics()['families'].items():
+            print(f"{family}: {metrics}")
+        cache.delete('bench_plain')
+        cache.delete('bench_tiered')
+
+
+if __name__ == '__main__':
+    main()
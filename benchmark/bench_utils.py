@@ -0,0 +1,161 @@
+"""
+Shared helpers for the Python benchmark scripts in this directory.
+
+Every benchmark seeds its own synthetic rows inside a transaction and rolls
+it back at the end, so it can be pointed at a development database without
+leaving data behind.
+
+Run from the project root, e.g.: python benchmark/bench_map_features.py
+"""
+
+import os
+import sys
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Never start the venue loan scheduler inside a benchmark process
+os.environ.setdefault('DISABLE_SCHEDULER', '1')
+os.environ.setdefault('DISABLE_EMAIL_DISPATCHER', '1')
+
+from sqlalchemy import text
+
+
+# Center of the synthetic dataset (Universitas Sumatera Utara)
+CENTER_LAT = 3.561676
+CENTER_LNG = 98.6563423
+
+
+def bench_app():
+    """Create the Flask app used by benchmarks (SQL echo disabled)"""
+    from app import create_app
+    app = create_app(os.environ.get('BENCH_CONFIG', 'default'))
+    app.config['SQLALCHEMY_ECHO'] = False
+    return app
+
+
+def timed(fn, *args, repeat=3, **kwargs):
+    """Run fn several times and return (best_ms, last_result)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def count_queries(engine):
+    """
+    Attach a statement counter to the engine.
+
+    Returns a dict whose 'count' key is incremented for every statement.
+    """
+    from sqlalchemy import event
+
+    counter = {'count': 0}
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        counter['count'] += 1
+
+    return counter
+
+
+def seed_base_rows(session, prefix='BENCH'):
+    """
+    Insert one category, item, warehouse and unit for synthetic data.
+
+    Returns a dict with their ids. Rows are only flushed; the caller owns
+    the transaction.
+    """
+    params = {'prefix': prefix, 'lat': CENTER_LAT, 'lng': CENTER_LNG}
+
+    category_id = session.execute(text(
+        "INSERT INTO categories (name, code, require_serial_number, created_at) "
+        "VALUES (:prefix || ' Category', LEFT(:prefix, 10), true, now()) RETURNING id"
+    ), params).scalar()
+
+    item_id = session.execute(text(
+        "INSERT INTO items (category_id, item_code, name, unit, created_at) "
+        "VALUES (:category_id, :prefix || '-ITEM', :prefix || ' Access Point', 'unit', now()) RETURNING id"
+    ), {**params, 'category_id': category_id}).scalar()
+
+    warehouse_id = session.execute(text(
+        "INSERT INTO warehouses (name, address, geom, created_at) "
+        "VALUES (:prefix || ' Warehouse', 'Benchmark', "
+        "ST_SetSRID(ST_MakePoint(:lng, :lat), 4326), now()) RETURNING id"
+    ), params).scalar()
+
+    unit_id = session.execute(text(
+        "INSERT INTO units (name, address, geom, status, created_at) "
+        "VALUES (:prefix || ' Unit', 'Benchmark', "
+        "ST_SetSRID(ST_MakePoint(:lng, :lat), 4326), 'available', now()) RETURNING id"
+    ), params).scalar()
+
+    return {
+        'category_id': category_id,
+        'item_id': item_id,
+        'warehouse_id': warehouse_id,
+        'unit_id': unit_id,
+    }
+
+
+def seed_distributions(session, base, count, prefix='BENCH', spread_deg=0.5):
+    """
+    Insert `count` item details and installed distributions scattered
+    randomly within `spread_deg` degrees around the dataset center.
+    """
+    params = {
+        'prefix': prefix,
+        'count': count,
+        'lat': CENTER_LAT,
+        'lng': CENTER_LNG,
+        'spread': spread_deg,
+        **base,
+    }
+
+    session.execute(text(
+        "INSERT INTO item_details (item_id, serial_number, status, warehouse_id, created_at) "
+        "SELECT :item_id, :prefix || '-SN-' || g, 'used', :warehouse_id, now() "
+        "FROM generate_series(1, :count) AS g"
+    ), params)
+
+    session.execute(text(
+        "INSERT INTO distributions (item_detail_id, warehouse_id, unit_id, address, geom, "
+        "installed_at, status, created_at) "
+        "SELECT d.id, :warehouse_id, :unit_id, 'Benchmark', "
+        "ST_SetSRID(ST_MakePoint(:lng + (random() - 0.5) * :spread, "
+        ":lat + (random() - 0.5) * :spread), 4326), now(), 'installed', now() "
+        "FROM item_details d WHERE d.item_id = :item_id"
+    ), params)
+
+    session.execute(text("ANALYZE item_details"))
+    session.execute(text("ANALYZE distributions"))
+
+
+class BenchAdmin:
+    """Minimal stand-in for an admin current_user"""
+    id = 0
+    role = 'admin'
+    is_authenticated = True
+
+    def is_admin(self):
+        return True
+
+    def is_warehouse_staff(self):
+        return False
+
+    def is_field_staff(self):
+        return False
+
+    def is_unit_staff(self):
+        return False
+
+
+def print_header(title):
+    print("=" * 60)
+    print(title)
+    print("=" * 60)
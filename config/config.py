@@ -35,6 +35,16 @@ class Config:
     CACHE_REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
     CACHE_DEFAULT_TIMEOUT = 300  # 5 minutes default cache timeout
     CACHE_KEY_PREFIX = 'sgi_'    # Prefix for cache keys
+    MAP_TILE_CACHE_TIMEOUT = 3600  # Vector tiles are versioned per layer, so they can live long
+    ACCESS_SCOPE_TIMEOUT = 60  # Cached user/role/warehouse/unit scope (app/services/access_scope.py)
+
+    # Two-tier cache for aggregates (app/services/tiered_cache.py)
+    LOCAL_CACHE_MAX_ENTRIES = 512  # In-process LRU in front of the shared cache
+    LOCAL_CACHE_MAX_BYTES = 32 * 1024 * 1024
+    LOCAL_CACHE_TTL = 5  # Seconds a value is served from process memory
+    TIERED_CACHE_STALE_TTL = 300  # Expired values are served this long while refreshed
+    TIERED_CACHE_LOCK_TIMEOUT = 30  # Single-flight lock; waiters compute themselves after it
+    TIERED_CACHE_REFRESH_WORKERS = 2  # Background refresh threads per process
 
     # Session - Using default Flask client-side signed cookies
     # Flask-Session is DISABLED to avoid FileSystemSession issues
@@ -51,6 +61,26 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'app', 'static', 'uploads')
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx'}
 
+    # Verification/proof photos (app/services/blob_store.py)
+    BLOB_STORE_BACKEND = os.environ.get('BLOB_STORE_BACKEND') or 'local'
+    BLOB_STORE_FOLDER = os.environ.get('BLOB_STORE_FOLDER') or \
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'blobs')
+
+    # Photo compression and thumbnails (app/services/image_pipeline.py)
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS') or 2)  # Worker processes
+    IMAGE_JOB_TIMEOUT = 3600  # How long pending/failed state is kept
+    IMAGE_JOB_STALE_AFTER = 300  # Pending jobs older than this are queued again
+
+    # Background reports (app/services/report_jobs.py)
+    REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS') or 2)
+    REPORT_ARTIFACT_FOLDER = os.environ.get('REPORT_ARTIFACT_FOLDER') or \
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'reports')
+    REPORT_JOB_TIMEOUT = 3600  # How long job state is kept for status polls
+    REPORT_JOB_STALE_AFTER = 900  # Queued/running jobs older than this are restarted
+
+    # Batch stock movements (/api/stock/transactions/batch)
+    STOCK_BATCH_MAX_LINES = 10000
+
     # Pagination
     ITEMS_PER_PAGE = 20
 
@@ -66,6 +96,15 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or 'noreply@ditsintek.usu.ac.id'
 
+    # Email outbox dispatcher (app/services/email_outbox.py)
+    EMAIL_SMTP_POOL_SIZE = int(os.environ.get('EMAIL_SMTP_POOL_SIZE') or 2)  # Concurrent SMTP connections
+    EMAIL_BATCH_SIZE = 50  # Rows claimed per dispatch cycle
+    EMAIL_DISPATCH_INTERVAL = 5  # Seconds between outbox polls (enqueue also wakes the dispatcher)
+    EMAIL_MAX_ATTEMPTS = 6
+    EMAIL_RETRY_BASE_SECONDS = 30  # Backoff: 30s, 60s, 120s, ... capped below
+    EMAIL_RETRY_MAX_SECONDS = 3600
+    MAIL_POOL_IDLE_TIMEOUT = 120  # Close pooled SMTP connections idle this long
+
     # Application Settings
     APP_NAME = 'Smart Geo Inventory'
     APP_VERSION = '1.0.0'
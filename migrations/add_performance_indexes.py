@@ -39,6 +39,12 @@ def upgrade():
         "CREATE INDEX IF NOT EXISTS idx_item_details_warehouse_id ON item_details(warehouse_id);",
         "CREATE INDEX IF NOT EXISTS idx_item_details_status ON item_details(status);",
         "CREATE INDEX IF NOT EXISTS idx_item_details_serial_number ON item_details(serial_number);",
+        "CREATE INDEX IF NOT EXISTS idx_item_details_serial_number_trgm ON item_details USING gin(serial_number gin_trgm_ops);",
+        "CREATE INDEX IF NOT EXISTS idx_item_details_item_status_id ON item_details(item_id, status, id);",
+        # Duplicate check when receiving procurement deliveries; unique so that
+        # concurrent receipts cannot both store a serial unit (fails while
+        # duplicates exist, resolve them first)
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_item_details_serial_unit_unique ON item_details(serial_unit);",
 
         # Indexes for Procurement model
         "CREATE INDEX IF NOT EXISTS idx_procurements_status ON procurements(status);",
@@ -73,10 +79,43 @@ def upgrade():
         "CREATE INDEX IF NOT EXISTS idx_user_units_unit_id ON user_units(unit_id);",
         "CREATE INDEX IF NOT EXISTS idx_user_units_user_unit ON user_units(user_id, unit_id);",
 
+        # Notification recipient directory (active, opted-in users per role)
+        "CREATE INDEX IF NOT EXISTS idx_users_notify_role ON users(role, id) INCLUDE (email) WHERE is_active AND email_notifications;",
+
         # Composite indexes for common query patterns
         "CREATE INDEX IF NOT EXISTS idx_distributions_unit_status ON distributions(unit_id, status);",
+        "CREATE INDEX IF NOT EXISTS idx_distributions_unit_item_detail ON distributions(unit_id, item_detail_id);",
         "CREATE INDEX IF NOT EXISTS idx_stocks_warehouse_quantity ON stocks(warehouse_id, quantity);",
         "CREATE INDEX IF NOT EXISTS idx_item_details_warehouse_status ON item_details(warehouse_id, status);",
+
+        # Spatial (GiST) indexes for viewport/tile map queries
+        "CREATE INDEX IF NOT EXISTS idx_warehouses_geom ON warehouses USING gist(geom);",
+        "CREATE INDEX IF NOT EXISTS idx_units_geom ON units USING gist(geom);",
+        "CREATE INDEX IF NOT EXISTS idx_distributions_geom ON distributions USING gist(geom);",
+        "CREATE INDEX IF NOT EXISTS idx_buildings_geom ON buildings USING gist(geom);",
+        "CREATE INDEX IF NOT EXISTS idx_buildings_zone_geom ON buildings USING gist(zone_geom);",
+
+        # Geography GiST indexes for ST_DWithin radius search and <-> KNN ordering (/api/map/nearby)
+        "CREATE INDEX IF NOT EXISTS idx_warehouses_geog ON warehouses USING gist((geom::geography));",
+        "CREATE INDEX IF NOT EXISTS idx_units_geog ON units USING gist((geom::geography));",
+        "CREATE INDEX IF NOT EXISTS idx_distributions_geog ON distributions USING gist((geom::geography));",
+        "CREATE INDEX IF NOT EXISTS idx_buildings_geog ON buildings USING gist((geom::geography));",
+
+        # Composite indexes for [start, end) period filters used by reports and charts
+        "CREATE INDEX IF NOT EXISTS idx_stock_transactions_type_date ON stock_transactions(transaction_type, transaction_date) INCLUDE (quantity);",
+        "CREATE INDEX IF NOT EXISTS idx_procurements_status_completion ON procurements(status, completion_date);",
+        "CREATE INDEX IF NOT EXISTS idx_procurements_warehouse_status_completion ON procurements(warehouse_id, status, completion_date);",
+        "CREATE INDEX IF NOT EXISTS idx_return_batches_status_confirmed ON return_batches(status, confirmed_at);",
+        "CREATE INDEX IF NOT EXISTS idx_distribution_groups_status_received ON distribution_groups(status, verification_received_at);",
+        "CREATE INDEX IF NOT EXISTS idx_distributions_warehouse_draft_verified ON distributions(warehouse_id, draft_verified_at);",
+        "CREATE INDEX IF NOT EXISTS idx_distributions_created_at ON distributions(created_at);",
+        "CREATE INDEX IF NOT EXISTS idx_item_details_status_created ON item_details(status, created_at);",
+        "CREATE INDEX IF NOT EXISTS idx_stock_ledger_occurred_cover ON stock_ledger(occurred_at) INCLUDE (direction, quantity, movement_type, warehouse_id);",
+
+        # Partial indexes for the venue loan scheduler (due starts / due completions)
+        "CREATE INDEX IF NOT EXISTS idx_venue_loans_approved_start ON venue_loans(start_datetime) WHERE status = 'approved';",
+        "CREATE INDEX IF NOT EXISTS idx_venue_loans_active_end ON venue_loans(end_datetime) WHERE status = 'active';",
+        "CREATE INDEX IF NOT EXISTS idx_distributions_unit_detail_id ON distributions(unit_detail_id);",
     ]
 
     app = create_app()
@@ -98,7 +137,7 @@ def upgrade():
                     db.session.commit()
 
                     # Extract table name for display
-                    table_name = index_sql.split('ON ')[1].split('(')[0].strip()
+                    table_name = index_sql.split('ON ')[1].split('(')[0].split(' USING')[0].strip()
                     print(f"[OK] Created index on: {table_name}")
                     success_count += 1
                 except Exception as e:
@@ -131,6 +170,37 @@ def downgrade():
         "DROP INDEX IF EXISTS idx_items_name;",
         "DROP INDEX IF EXISTS idx_items_item_code;",
         "DROP INDEX IF EXISTS idx_items_category_id;",
+        "DROP INDEX IF EXISTS idx_item_details_serial_number_trgm;",
+        "DROP INDEX IF EXISTS idx_item_details_item_status_id;",
+        "DROP INDEX IF EXISTS idx_item_details_serial_unit;",
+        "DROP INDEX IF EXISTS idx_item_details_serial_unit_unique;",
+        "DROP INDEX IF EXISTS idx_distributions_unit_item_detail;",
+
+        # Spatial indexes
+        "DROP INDEX IF EXISTS idx_warehouses_geom;",
+        "DROP INDEX IF EXISTS idx_units_geom;",
+        "DROP INDEX IF EXISTS idx_distributions_geom;",
+        "DROP INDEX IF EXISTS idx_buildings_geom;",
+        "DROP INDEX IF EXISTS idx_buildings_zone_geom;",
+        "DROP INDEX IF EXISTS idx_warehouses_geog;",
+        "DROP INDEX IF EXISTS idx_units_geog;",
+        "DROP INDEX IF EXISTS idx_distributions_geog;",
+        "DROP INDEX IF EXISTS idx_buildings_geog;",
+
+        # Period filter indexes
+        "DROP INDEX IF EXISTS idx_stock_transactions_type_date;",
+        "DROP INDEX IF EXISTS idx_procurements_status_completion;",
+        "DROP INDEX IF EXISTS idx_procurements_warehouse_status_completion;",
+        "DROP INDEX IF EXISTS idx_return_batches_status_confirmed;",
+        "DROP INDEX IF EXISTS idx_distribution_groups_status_received;",
+        "DROP INDEX IF EXISTS idx_distributions_warehouse_draft_verified;",
+        "DROP INDEX IF EXISTS idx_distributions_created_at;",
+        "DROP INDEX IF EXISTS idx_item_details_status_created;",
+        "DROP INDEX IF EXISTS idx_stock_ledger_occurred_cover;",
+        "DROP INDEX IF EXISTS idx_users_notify_role;",
+        "DROP INDEX IF EXISTS idx_venue_loans_approved_start;",
+        "DROP INDEX IF EXISTS idx_venue_loans_active_end;",
+        "DROP INDEX IF EXISTS idx_distributions_unit_detail_id;",
 
         # Drop all other indexes...
         # ( abbreviated for brevity - in production, list all indexes)
@@ -0,0 +1,102 @@
+"""
+Add procurement_id column to stock_transactions table
+Marks the stock transactions logged by a completed procurement, so the
+stock ledger can skip them without matching words in the note. Existing
+rows are backfilled from their 'Pengadaan #<id> - ...' note, and manual
+movements the old note rule left out of the ledger are recorded.
+Completed procurements (and their ledger rows) are moved to the
+warehouse their stock transactions went to, which may differ from the
+requested one.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from sqlalchemy import text
+
+def upgrade():
+    """Add procurement_id column to stock_transactions table"""
+    from app.models import StockTransaction
+    from app.services.stock_ledger import stock_transaction_movements, rebuild_rollups
+
+    app = create_app()
+
+    with app.app_context():
+        # Check if column already exists
+        from sqlalchemy import inspect
+        inspector = inspect(db.engine)
+        columns = [col['name'] for col in inspector.get_columns('stock_transactions')]
+
+        if 'procurement_id' not in columns:
+            db.session.execute(text("""
+                ALTER TABLE stock_transactions
+                ADD COLUMN procurement_id INTEGER REFERENCES procurements(id)
+            """))
+            print("✅ Column procurement_id added to stock_transactions table")
+        else:
+            print("⚠️  Column procurement_id already exists in stock_transactions table")
+
+        # Rows logged by procurement completion before the column existed
+        result = db.session.execute(text("""
+            UPDATE stock_transactions st
+            SET procurement_id = p.id
+            FROM procurements p
+            WHERE st.procurement_id IS NULL
+              AND st.note ~ '^Pengadaan #[0-9]+ - '
+              AND p.id = substring(st.note from '^Pengadaan #([0-9]+) - ')::integer
+        """))
+        print(f"✅ {result.rowcount} procurement transaction(s) linked")
+
+        # Warehouse that received the goods, where the completing user's
+        # warehouse differed from the requested one
+        result = db.session.execute(text("""
+            UPDATE procurements p
+            SET warehouse_id = st.warehouse_id
+            FROM (SELECT DISTINCT ON (procurement_id) procurement_id, warehouse_id
+                  FROM stock_transactions
+                  WHERE procurement_id IS NOT NULL
+                  ORDER BY procurement_id, id) st
+            WHERE p.id = st.procurement_id
+              AND p.status = 'completed'
+              AND p.warehouse_id IS DISTINCT FROM st.warehouse_id
+        """))
+        print(f"✅ {result.rowcount} procurement warehouse(s) corrected")
+
+        if 'stock_ledger' in inspector.get_table_names():
+            # Manual movements whose note mentioned 'Pengadaan'/'Procurement'
+            # were never recorded; already recorded rows are skipped
+            db.session.execute(stock_transaction_movements(StockTransaction.procurement_id.is_(None)))
+            print("✅ Manual stock transactions recorded in stock_ledger")
+
+            result = db.session.execute(text("""
+                UPDATE stock_ledger l
+                SET warehouse_id = p.warehouse_id
+                FROM procurements p
+                WHERE l.movement_type = 'procurement'
+                  AND l.source_id = p.id
+                  AND l.warehouse_id IS DISTINCT FROM p.warehouse_id
+            """))
+            print(f"✅ {result.rowcount} procurement ledger row(s) moved to the receiving warehouse")
+            if result.rowcount:
+                rebuild_rollups(db.session)
+                print("✅ Daily rollups rebuilt")
+
+        db.session.commit()
+
+def downgrade():
+    """Remove procurement_id column from stock_transactions table"""
+    app = create_app()
+
+    with app.app_context():
+        db.session.execute(text("""
+            ALTER TABLE stock_transactions
+            DROP COLUMN IF EXISTS procurement_id
+        """))
+        db.session.commit()
+
+        print("✅ Column procurement_id removed from stock_transactions table")
+
+if __name__ == '__main__':
+    upgrade()
@@ -0,0 +1,39 @@
+"""
+Migration script to create the code_sequences table
+Item codes, serial units and return batch codes draw their numbers from
+counters in this table (app/services/code_sequences.py). Counters are
+created on first use and continue after the highest existing code, so
+no backfill is needed.
+"""
+
+import sys
+import os
+
+# Add parent directory to path so we can import app module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models.code_sequence import CodeSequence
+
+
+def migrate():
+    """Create code_sequences table"""
+    app = create_app()
+
+    with app.app_context():
+        print("Creating code_sequences table...")
+
+        CodeSequence.__table__.create(db.engine, checkfirst=True)
+
+        inspector = db.inspect(db.engine)
+        if 'code_sequences' not in inspector.get_table_names():
+            print("✗ Failed to create 'code_sequences' table")
+            return False
+
+        print("✓ Table 'code_sequences' is ready")
+        print("Migration completed successfully!")
+        return True
+
+
+if __name__ == '__main__':
+    migrate()
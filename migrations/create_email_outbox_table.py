@@ -0,0 +1,37 @@
+"""
+Migration script to create the email_outbox table
+Notification emails are queued here and delivered by the background
+email dispatcher instead of being sent inside the request.
+"""
+
+import sys
+import os
+
+# Add parent directory to path so we can import app module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models.email_outbox import EmailOutbox
+
+
+def migrate():
+    """Create email_outbox table"""
+    app = create_app()
+
+    with app.app_context():
+        print("Creating email_outbox table...")
+
+        EmailOutbox.__table__.create(db.engine, checkfirst=True)
+
+        inspector = db.inspect(db.engine)
+        if 'email_outbox' not in inspector.get_table_names():
+            print("✗ Failed to create 'email_outbox' table")
+            return False
+
+        print("✓ Table 'email_outbox' is ready")
+        print("Migration completed successfully!")
+        return True
+
+
+if __name__ == '__main__':
+    migrate()
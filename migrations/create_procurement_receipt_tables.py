@@ -0,0 +1,153 @@
+"""
+Migration script to create the procurement_receipts and
+procurement_receipt_serials tables
+Deliveries and received serials used to be JSON text in
+procurement_items.receipt_history and procurement_items.serial_numbers.
+Existing rows are copied into the new tables; items that already have
+receipts are skipped, so running the script again is safe.
+
+Pass --drop-json-columns to drop the old JSON columns afterwards.
+"""
+
+import sys
+import os
+import json
+from datetime import datetime
+
+# Add parent directory to path so we can import app module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models.procurement import ProcurementReceipt, ProcurementReceiptSerial
+
+JSON_COLUMNS = ('serial_numbers', 'receipt_history')
+
+
+def _parse_date(value, fallback):
+    try:
+        return datetime.fromisoformat(value) if value else fallback
+    except (TypeError, ValueError):
+        return fallback
+
+
+def _receipts_for(row):
+    """(receipt values, [(serial_number, serial_unit)]) per delivery of one procurement item"""
+    history = json.loads(row.receipt_history) if row.receipt_history else []
+    serial_numbers = json.loads(row.serial_numbers) if row.serial_numbers else []
+    fallback_date = row.updated_at or row.created_at
+
+    receipts = []
+    covered = set()
+    cumulative = 0
+    for entry in history:
+        serials = entry.get('serials') or []
+        units = entry.get('serial_units') or []
+        quantity = entry.get('quantity') or max(len(serials), len(units))
+        cumulative = entry.get('cumulative_total') or cumulative + quantity
+        pairs = []
+        for i in range(max(len(serials), len(units))):
+            serial_number = serials[i] if i < len(serials) else units[i]
+            serial_unit = units[i] if i < len(units) else None
+            pairs.append((serial_number, serial_unit))
+            covered.add(serial_number)
+        receipts.append(({
+            'quantity': quantity,
+            'cumulative_total': cumulative,
+            'item_details_created': entry.get('item_details_created') or 0,
+            'received_by': entry.get('received_by') or row.procurement_received_by,
+            'received_at': _parse_date(entry.get('date'), fallback_date),
+        }, pairs))
+
+    # Serials stored without a matching history entry (older data)
+    leftover = [(sn, None) for sn in serial_numbers if sn not in covered]
+    if leftover:
+        receipts.append(({
+            'quantity': len(leftover),
+            'cumulative_total': row.actual_quantity or cumulative + len(leftover),
+            'item_details_created': 0,
+            'received_by': row.procurement_received_by,
+            'received_at': fallback_date,
+        }, leftover))
+    return receipts
+
+
+def migrate(drop_json_columns=False):
+    """Create the receipt tables and copy the JSON receipt data into them"""
+    app = create_app()
+
+    with app.app_context():
+        print("Creating procurement receipt tables...")
+
+        ProcurementReceipt.__table__.create(db.engine, checkfirst=True)
+        ProcurementReceiptSerial.__table__.create(db.engine, checkfirst=True)
+
+        inspector = db.inspect(db.engine)
+        tables = inspector.get_table_names()
+        for table in ('procurement_receipts', 'procurement_receipt_serials'):
+            if table not in tables:
+                print(f"✗ Failed to create '{table}' table")
+                return False
+            print(f"✓ Table '{table}' is ready")
+
+        columns = [c['name'] for c in inspector.get_columns('procurement_items')]
+        if not all(column in columns for column in JSON_COLUMNS):
+            print("\nJSON columns already removed - nothing to copy")
+            print("Migration completed successfully!")
+            return True
+
+        print("\nCopying receipt history...")
+        try:
+            rows = db.session.execute(db.text("""
+                SELECT pi.id, pi.serial_numbers, pi.receipt_history, pi.actual_quantity,
+                       pi.created_at, pi.updated_at, p.received_by AS procurement_received_by
+                FROM procurement_items pi
+                JOIN procurements p ON p.id = pi.procurement_id
+                WHERE (pi.serial_numbers IS NOT NULL OR pi.receipt_history IS NOT NULL)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM procurement_receipts r WHERE r.procurement_item_id = pi.id
+                  )
+                ORDER BY pi.id
+            """)).all()
+
+            receipts_copied = serials_copied = 0
+            for row in rows:
+                # Serials are unique per procurement item across deliveries
+                seen = set()
+                for values, pairs in _receipts_for(row):
+                    receipt = ProcurementReceipt(procurement_item_id=row.id, **values)
+                    db.session.add(receipt)
+                    db.session.flush()
+
+                    for position, (serial_number, serial_unit) in enumerate(pairs):
+                        if serial_number in seen:
+                            continue
+                        seen.add(serial_number)
+                        db.session.add(ProcurementReceiptSerial(
+                            receipt_id=receipt.id,
+                            procurement_item_id=row.id,
+                            serial_number=serial_number,
+                            serial_unit=serial_unit,
+                            position=position
+                        ))
+                        serials_copied += 1
+                    receipts_copied += 1
+
+            db.session.commit()
+            print(f"  [OK] {len(rows)} procurement items, {receipts_copied} receipts, {serials_copied} serials")
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Copy failed: {e}")
+            return False
+
+        if drop_json_columns:
+            for column in JSON_COLUMNS:
+                db.session.execute(db.text(f"ALTER TABLE procurement_items DROP COLUMN IF EXISTS {column}"))
+                print(f"  [OK] column procurement_items.{column} dropped")
+            db.session.commit()
+
+        print("Migration completed successfully!")
+        return True
+
+
+if __name__ == '__main__':
+    migrate(drop_json_columns='--drop-json-columns' in sys.argv)
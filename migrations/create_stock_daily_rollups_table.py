@@ -0,0 +1,51 @@
+"""
+Migration script to create the stock_daily_rollups table
+Rollups hold stock movements aggregated per WIB day, warehouse and item
+for the dashboard charts. They are kept up to date by the stock ledger
+writer; this script creates the table and rebuilds it from the ledger
+(same as `flask rebuild-stock-rollups`).
+"""
+
+import sys
+import os
+
+# Add parent directory to path so we can import app module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models.stock_ledger import StockDailyRollup
+
+
+def migrate():
+    """Create stock_daily_rollups table and backfill it from stock_ledger"""
+    from app.services.stock_ledger import rebuild_rollups
+
+    app = create_app()
+
+    with app.app_context():
+        print("Creating stock_daily_rollups table...")
+
+        StockDailyRollup.__table__.create(db.engine, checkfirst=True)
+
+        inspector = db.inspect(db.engine)
+        if 'stock_daily_rollups' not in inspector.get_table_names():
+            print("✗ Failed to create 'stock_daily_rollups' table")
+            return False
+        print("✓ Table 'stock_daily_rollups' is ready")
+
+        print("\nRebuilding rollups from stock_ledger...")
+        try:
+            total = rebuild_rollups(db.session)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Rebuild failed: {e}")
+            return False
+
+        print(f"Rollup rows: {total}")
+        print("Migration completed successfully!")
+        return True
+
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,56 @@
+"""
+Migration script to create the stock_ledger table
+The ledger holds one append-only row per stock movement and replaces the
+six-source merge used by the stock history, recap and dashboard charts.
+Existing movements are backfilled; running the script again is safe.
+Run add_procurement_id_to_stock_transactions.py first on existing databases.
+"""
+
+import sys
+import os
+
+# Add parent directory to path so we can import app module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models.stock_ledger import StockLedger, StockDailyRollup
+
+
+def migrate():
+    """Create stock_ledger table and backfill it from existing movements"""
+    from app.services.stock_ledger import backfill_statements
+
+    app = create_app()
+
+    with app.app_context():
+        print("Creating stock_ledger table...")
+
+        StockLedger.__table__.create(db.engine, checkfirst=True)
+        # Ledger inserts also maintain the daily rollups
+        StockDailyRollup.__table__.create(db.engine, checkfirst=True)
+
+        inspector = db.inspect(db.engine)
+        if 'stock_ledger' not in inspector.get_table_names():
+            print("✗ Failed to create 'stock_ledger' table")
+            return False
+        print("✓ Table 'stock_ledger' is ready")
+
+        print("\nBackfilling movements...")
+        try:
+            for number, stmt in enumerate(backfill_statements(), 1):
+                db.session.execute(stmt)
+                print(f"  [OK] source {number}")
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Backfill failed: {e}")
+            return False
+
+        total = db.session.query(StockLedger).count()
+        print(f"\nLedger rows: {total}")
+        print("Migration completed successfully!")
+        return True
+
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,108 @@
+"""
+Migration script to move verification/proof photos into the blob store
+Photos were BYTEA columns (verification_photo) on distributions,
+distribution_groups and asset_requests. Each photo is written to the
+content-addressed blob store (BLOB_STORE_FOLDER) and the row keeps only
+verification_photo_sha256 and verification_photo_size. Rows that already
+have a digest are skipped, so running the script again is safe.
+
+Field task verifications stored a static file path in the column
+instead of the photo; when that file still exists its content is moved.
+
+Pass --drop-blob-columns to drop the old BYTEA columns afterwards.
+"""
+
+import sys
+import os
+
+# Add parent directory to path so we can import app module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.services.blob_store import get_blob_store
+
+TABLES = ('distributions', 'distribution_groups', 'asset_requests')
+BATCH_SIZE = 100
+
+
+def _photo_bytes(app, value):
+    """Photo content of a legacy column value (bytes, or a path under app/static)"""
+    data = bytes(value)
+    if data.startswith(b'uploads/') and len(data) < 500:
+        path = os.path.join(app.root_path, 'static', data.decode('utf-8', 'replace'))
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+    return data
+
+
+def migrate(drop_blob_columns=False):
+    """Add digest columns and move existing photos into the blob store"""
+    app = create_app()
+
+    with app.app_context():
+        store = get_blob_store(app)
+        inspector = db.inspect(db.engine)
+
+        for table in TABLES:
+            print(f"Moving {table}.verification_photo...")
+            db.session.execute(db.text(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS verification_photo_sha256 VARCHAR(64)"
+            ))
+            db.session.execute(db.text(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS verification_photo_size INTEGER"
+            ))
+            db.session.commit()
+
+            columns = [c['name'] for c in inspector.get_columns(table)]
+            if 'verification_photo' not in columns:
+                print(f"  [SKIP] {table}.verification_photo already removed")
+                continue
+
+            moved = missing = 0
+            last_id = 0
+            try:
+                while True:
+                    rows = db.session.execute(db.text(f"""
+                        SELECT id, verification_photo FROM {table}
+                        WHERE id > :last_id
+                          AND verification_photo IS NOT NULL
+                          AND verification_photo_sha256 IS NULL
+                        ORDER BY id LIMIT :limit
+                    """), {'last_id': last_id, 'limit': BATCH_SIZE}).all()
+                    if not rows:
+                        break
+
+                    for row in rows:
+                        data = _photo_bytes(app, row.verification_photo)
+                        if not data:
+                            missing += 1
+                            continue
+                        db.session.execute(db.text(f"""
+                            UPDATE {table}
+                            SET verification_photo_sha256 = :digest, verification_photo_size = :size
+                            WHERE id = :id
+                        """), {'digest': store.put(data), 'size': len(data), 'id': row.id})
+                        moved += 1
+
+                    last_id = rows[-1].id
+                    db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"✗ Moving {table} photos failed: {e}")
+                return False
+
+            print(f"  [OK] {moved} photos moved" + (f", {missing} missing files skipped" if missing else ""))
+
+            if drop_blob_columns:
+                db.session.execute(db.text(f"ALTER TABLE {table} DROP COLUMN IF EXISTS verification_photo"))
+                db.session.commit()
+                print(f"  [OK] column {table}.verification_photo dropped")
+
+        print("Migration completed successfully!")
+        return True
+
+
+if __name__ == '__main__':
+    migrate(drop_blob_columns='--drop-blob-columns' in sys.argv)
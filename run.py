@@ -105,5 +105,36 @@ def init_db():
     print("Field Staff: field@smartgeo.com / field123")
 
 
+@app.cli.command()
+def rebuild_stock_rollups():
+    """Rebuild the daily stock rollups from the stock ledger"""
+    from app.services.stock_ledger import rebuild_rollups
+
+    print("Rebuilding stock_daily_rollups from stock_ledger...")
+    try:
+        total = rebuild_rollups(db.session)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Rebuild failed: {e}")
+        raise SystemExit(1)
+
+    print(f"Done. {total} rollup rows.")
+
+
+@app.cli.command()
+def send_queued_emails():
+    """Deliver all due emails in email_outbox now"""
+    from app.services.email_outbox import EmailDispatcher
+
+    dispatcher = EmailDispatcher(app)
+    try:
+        total = dispatcher.drain()
+    finally:
+        dispatcher.stop()
+
+    print(f"Done. {total} queued emails processed.")
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)